@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Batch triage throughput at different worker counts.
+
+Generates a synthetic cohort, scores it with claisen_data.batch at each worker
+count, and reports records/sec. Every run's output is checked against plain
+serial assign_profile() calls, and the script fails if any run differs.
+
+    python -m benchmarks.bench_batch_workers --records 5000 --workers 1 2 4 8
+"""
+import sys
+import json
+import time
+import argparse
+from claisen_data.triage_engine import assign_profile
+from claisen_data.batch import triage_batch
+from benchmarks.synthetic import triage_records
+
+def canonical(results):
+    # Round-trip through JSON so tuples and lists compare equal
+    return json.loads(json.dumps(results))
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch triage records/sec by worker count")
+    parser.add_argument('--records', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    records = triage_records(args.records)
+    expected = canonical([{'id': r['id'], **assign_profile(r['answers'], r['notes'])} for r in records])
+
+    results = []
+    ok = True
+    for workers in args.workers:
+        start = time.perf_counter()
+        out = list(triage_batch(records, batch_size=args.batch_size, workers=workers))
+        elapsed = time.perf_counter() - start
+        matches = canonical(out) == expected
+        ok = ok and matches
+        results.append({'workers': workers, 'records': len(records), 'seconds': elapsed,
+                        'records_per_sec': len(records) / elapsed, 'matches_serial': matches})
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for r in results:
+            status = 'OK' if r['matches_serial'] else 'MISMATCH'
+            print(f"workers={r['workers']:<2d} {r['records_per_sec']:10.1f} records/sec  ({r['seconds']:.2f}s)  {status}")
+    sys.exit(0 if ok else 1)
+
+if __name__ == '__main__':
+    main()
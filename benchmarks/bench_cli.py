@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+`add`, `show` and `export` latency as the log grows.
+
+Writes a synthetic multi-year log (benchmarks.synthetic) of each size, with
+its index and rollups already built, then times the real CLI commands in
+fresh interpreters against it: `add` for today (the log is restored after
+each run), `show --last 20`, and JSON Lines exports of one month and of
+everything. `add`, `show` and the one-month export should stay roughly flat
+as the history grows; the full export is expected to grow linearly.
+
+    python -m benchmarks.bench_cli --sizes 1000,100000,1000000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import statistics
+from datetime import date, timedelta
+from claisen_data.storage import open_storage
+from claisen_data.rollups import Rollups
+from claisen_data.validation import SYMPTOMS
+from benchmarks.synthetic import write_log
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_cli(home, argv):
+    env = dict(os.environ, CLAISEN_HOME=home, PYTHONPATH=REPO_ROOT)
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, os.path.join(REPO_ROOT, 'claisen_log.py')] + argv,
+                          env=env, capture_output=True, text=True, stdin=subprocess.DEVNULL)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"{argv[0]} failed:\n{proc.stderr}")
+    return elapsed, proc.stdout
+
+def snapshot(home):
+    """Log length plus the contents of every sidecar file, to undo an `add`."""
+    log = os.path.join(home, 'data.db')
+    sidecars = {}
+    for name in os.listdir(home):
+        path = os.path.join(home, name)
+        if path != log and os.path.isfile(path):
+            with open(path, 'rb') as f:
+                sidecars[path] = f.read()
+    return os.path.getsize(log), sidecars
+
+def restore(home, state):
+    size, sidecars = state
+    os.truncate(os.path.join(home, 'data.db'), size)
+    for path, data in sidecars.items():
+        with open(path, 'wb') as f:
+            f.write(data)
+
+def bench_size(n, runs):
+    with tempfile.TemporaryDirectory() as home:
+        storage = open_storage(os.path.join(home, 'data.db'), 'jsonl')
+        start = time.perf_counter()
+        write_log(storage, n)
+        Rollups(storage.path, SYMPTOMS).sync(storage)
+        generate_s = time.perf_counter() - start
+        state = snapshot(home)
+        month_end = date.today() - timedelta(days=1)
+        month = ['--since', str(month_end - timedelta(days=30)), '--until', str(month_end)]
+        out = os.path.join(home, 'export.jsonl')
+        commands = {
+            'add': ['add', '--symptoms', 'gas', '--severity', '2', '--notes', 'bench'],
+            'show_last_20': ['show', '--last', '20'],
+            'export_month': ['export', '--format', 'jsonl', '--out', out] + month,
+            'export_all': ['export', '--format', 'jsonl', '--out', out],
+        }
+        timings = {}
+        for name, argv in commands.items():
+            samples = []
+            for _ in range(runs):
+                elapsed, stdout = run_cli(home, argv)
+                if name == 'add':
+                    if 'already logged' in stdout:
+                        raise RuntimeError("synthetic log already has an entry for today")
+                    restore(home, state)
+                samples.append(elapsed)
+            timings[name] = statistics.median(samples)
+        return {'entries': n, 'log_mb': state[0] / 1e6, 'generate_s': generate_s, 'median_s': timings}
+
+def main():
+    parser = argparse.ArgumentParser(description="add/show/export latency vs log size")
+    parser.add_argument('--sizes', default='1000,100000,1000000', help='Comma-separated log sizes (entries)')
+    parser.add_argument('--runs', type=int, default=3, help='Runs per command and size (median reported)')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    results = [bench_size(int(n), args.runs) for n in args.sizes.split(',')]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for r in results:
+            cols = '  '.join(f"{name} {s * 1000:8.1f} ms" for name, s in r['median_s'].items())
+            print(f"{r['entries']:>8} entries ({r['log_mb']:7.1f} MB): {cols}")
+
+if __name__ == '__main__':
+    main()
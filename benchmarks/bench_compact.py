@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Compact triage entries: log size and read/write cost, plain vs packed.
+
+Writes the same synthetic log (a triage entry every --triage-every days) to a
+JSON Lines log twice, once with compact encoding off and once on, and
+measures file size, write time, a full load (every record expanded), a
+date/profile scan that leaves packed fields packed (expand=False, as the date
+index and rollups read the log) and a rollups rebuild. Every record read back
+from the compact log must serialise to the same JSON as the one written,
+key order included, and again when the log is read without its
+<log>.schemas cache (a copy of the log file alone).
+
+    python -m benchmarks.bench_compact --entries 100000 --triage-every 1
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+from claisen_data.storage import JsonLinesStorage
+from claisen_data.rollups import Rollups
+from claisen_data.codec import SCHEMAS_SUFFIX
+from claisen_data.validation import SYMPTOMS
+from benchmarks.synthetic import log_entries, write_log
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+def scan(storage):
+    return sum(1 for r in storage.iter_records(expand=False) if r.get('date') and 'profile' in r)
+
+def bench(home, compact, entries, triage_every):
+    storage = JsonLinesStorage(os.path.join(home, f"{'compact' if compact else 'plain'}.db"), compact=compact)
+    write_s, _ = timed(lambda: write_log(storage, entries, triage_every=triage_every))
+    load_s, records = timed(lambda: list(storage.iter_records()))
+    scan_s, _ = timed(lambda: scan(storage))
+    rollups = Rollups(storage.path, SYMPTOMS)
+    rebuild_s, _ = timed(lambda: rollups.rebuild((end, r) for _, end, r in storage.iter_with_offsets(expand=False)))
+    schemas = storage.path + SCHEMAS_SUFFIX
+    size = os.path.getsize(storage.path) + (os.path.getsize(schemas) if os.path.exists(schemas) else 0)
+    result = {'size_mb': size / 1e6, 'write_s': write_s, 'load_s': load_s, 'scan_s': scan_s, 'rollups_rebuild_s': rebuild_s}
+    if os.path.exists(schemas):
+        os.remove(schemas)
+    uncached = list(JsonLinesStorage(storage.path, compact=compact).iter_records())
+    return result, records, uncached
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact triage entry encoding benchmark")
+    parser.add_argument('--entries', type=int, default=100000, help='Log entries')
+    parser.add_argument('--triage-every', type=int, default=1, help='Days between synthetic triage entries')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as home:
+        plain, _, _ = bench(home, False, args.entries, args.triage_every)
+        compact, records, uncached = bench(home, True, args.entries, args.triage_every)
+    expected = log_entries(args.entries, triage_every=args.triage_every)
+    mismatches = 0
+    for got in (records, uncached):
+        mismatches += sum(1 for r, want in zip(got, expected) if json.dumps(r) != json.dumps(want))
+        mismatches += abs(len(got) - args.entries)
+    results = {'entries': args.entries, 'triage_every': args.triage_every, 'plain': plain, 'compact': compact,
+               'size_ratio': plain['size_mb'] / compact['size_mb'], 'mismatches': mismatches}
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name in ('plain', 'compact'):
+            r = results[name]
+            print(f"{name:>8}: {r['size_mb']:8.1f} MB  write {r['write_s']:6.2f} s  load {r['load_s']:6.2f} s  "
+                  f"scan {r['scan_s']:6.2f} s  rollups rebuild {r['rollups_rebuild_s']:6.2f} s")
+        print(f"{results['size_ratio']:.1f}x smaller, {mismatches} round-trip mismatches")
+    if mismatches:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Concurrent writers stress test: no lost or duplicated records.
+
+Starts N writer processes against one log. Each appends K entries the way
+`add`/`triage` do (append under the write lock, then sync the rollups), and
+every writer also tries to log "today" once-per-day, of which exactly one
+may succeed. Afterwards the log must hold every entry exactly once, and the
+date index and rollups must match a rebuild from the log. Reports write
+throughput and per-append latency, which bounds how long the lock is held.
+
+    python -m benchmarks.bench_concurrent_writes --writers 16 --records 200
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import multiprocessing as mp
+from datetime import date, timedelta
+from claisen_data.storage import open_storage
+from claisen_data.rollups import Rollups
+
+SYMPTOMS = ['bloating', 'gas', 'heartburn']
+
+def writer(path, backend, fsync, writer_id, records, start_day, barrier, out):
+    storage = open_storage(path, backend)
+    storage.fsync = fsync
+    rollups = Rollups(path, SYMPTOMS)
+    barrier.wait()
+    latencies = []
+    today = str(date.today())
+    added_today = False
+    for i in range(records):
+        day = str(start_day + timedelta(days=(writer_id * records + i) % 3000))
+        record = {'date': day, 'notes': f'{writer_id}:{i}',
+                  'symptoms': [{'name': SYMPTOMS[i % 3], 'severity': 1 + i % 5}]}
+        t = time.perf_counter()
+        storage.append(record)
+        rollups.sync(storage)
+        latencies.append(time.perf_counter() - t)
+        if i == records // 2:
+            with storage.lock:
+                if not storage.has_date(today):
+                    storage.append({'date': today, 'notes': f'today:{writer_id}', 'symptoms': []})
+                    added_today = True
+    out.put((writer_id, latencies, added_today))
+
+def run(backend, writers, records, fsync):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'data.db')
+        ctx = mp.get_context('spawn')
+        barrier = ctx.Barrier(writers)
+        out = ctx.Queue()
+        start_day = date.today() - timedelta(days=4000)
+        procs = [ctx.Process(target=writer, args=(path, backend, fsync, w, records, start_day, barrier, out))
+                 for w in range(writers)]
+        start = time.perf_counter()
+        for p in procs:
+            p.start()
+        results = [out.get() for _ in procs]
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - start
+
+        storage = open_storage(path, backend)
+        notes = [r['notes'] for r in storage.iter_records()]
+        expected = {f'{w}:{i}' for w in range(writers) for i in range(records)}
+        written = [n for n in notes if not n.startswith('today:')]
+        todays = [n for n in notes if n.startswith('today:')]
+        checks = {
+            'no_lost_records': expected.issubset(written),
+            'no_duplicates': len(written) == len(set(written)) == len(expected),
+            'one_entry_today': len(todays) == 1 and sum(r[2] for r in results) == 1,
+        }
+        if backend == 'jsonl':
+            with open(path + '.idx', 'rb') as f:
+                index = f.read()
+            storage.rebuild_index()
+            with open(path + '.idx', 'rb') as f:
+                checks['index_matches_rebuild'] = f.read() == index
+        rollups = Rollups(path, SYMPTOMS)
+        before = rollups.load()
+        rollups.rebuild((0, r) for r in storage.iter_records())
+        after = rollups.load()
+        checks['rollups_match_rebuild'] = all((a == b).all() for a, b in zip(before, after))
+        latencies = sorted(t for r in results for t in r[1])
+        return {
+            'backend': backend, 'writers': writers, 'records': writers * records,
+            'records_per_sec': writers * records / elapsed,
+            'p50_ms': latencies[len(latencies) // 2] * 1000,
+            'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000,
+            'max_ms': latencies[-1] * 1000,
+            'checks': checks,
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent writers stress test")
+    parser.add_argument('--writers', type=int, default=16)
+    parser.add_argument('--records', type=int, default=200, help='Entries per writer')
+    parser.add_argument('--backends', default='jsonl,json')
+    parser.add_argument('--fsync', choices=['none', 'data', 'full'], default='data')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    results = []
+    for backend in args.backends.split(','):
+        # The JSON array backend rewrites the whole log per append; keep it small
+        records = args.records if backend == 'jsonl' else max(1, args.records // 10)
+        results.append(run(backend, args.writers, records, args.fsync))
+    ok = all(all(r['checks'].values()) for r in results)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for r in results:
+            failed = [name for name, passed in r['checks'].items() if not passed]
+            print(f"{r['backend']:5s} {r['writers']} writers, {r['records']} records: {r['records_per_sec']:8.0f} records/s   "
+                  f"append p50 {r['p50_ms']:6.2f} ms  p99 {r['p99_ms']:6.2f} ms  max {r['max_ms']:7.2f} ms   "
+                  + ('OK' if not failed else 'FAILED: ' + ', '.join(failed)))
+    sys.exit(0 if ok else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Triage daemon: end-to-end `triage` latency with and without a warm daemon.
+
+Starts `serve` on a throwaway socket, then times non-interactive
+`claisen_log.py triage` runs in fresh interpreters with --no-daemon and
+through the daemon, checks both print the same result, and times
+concurrent /assign_profile requests from several client threads.
+
+    python -m benchmarks.bench_daemon --runs 10 --clients 8
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from claisen_data.triage_questions import TRIAGE_QUESTIONS
+from claisen_data.daemon import TriageClient, SOCKET_NAME
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NOTES = ["severe burning pain at night, worse with stress", "mild gas after eating",
+         "heartburn most days, sour taste", "I vomited blood last night"]
+
+def full_answers():
+    """The first option for every question, so no prompt is shown."""
+    return {q['id']: q['options'][0] if q['type'] == 'choice' else (40 if q['type'] == 'int' else 'n/a')
+            for q in TRIAGE_QUESTIONS}
+
+def run_triage(home, answers, notes, daemon):
+    argv = [sys.executable, os.path.join(REPO_ROOT, 'claisen_log.py'), 'triage',
+            '--answers', json.dumps(answers), '--notes', notes]
+    if not daemon:
+        argv.append('--no-daemon')
+    env = dict(os.environ, CLAISEN_HOME=home, PYTHONPATH=REPO_ROOT)
+    start = time.perf_counter()
+    out = subprocess.run(argv, env=env, capture_output=True, text=True, stdin=subprocess.DEVNULL)
+    return time.perf_counter() - start, out.stdout
+
+def wait_for(client, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if client.health() is not None:
+            return True
+        time.sleep(0.1)
+    return False
+
+def main():
+    parser = argparse.ArgumentParser(description="Triage daemon latency benchmark")
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--clients', type=int, default=8, help='Concurrent client threads')
+    parser.add_argument('--requests', type=int, default=400, help='Requests for the concurrency test')
+    parser.add_argument('--workers', type=int, default=1, help='Daemon worker processes')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    answers = full_answers()
+    with tempfile.TemporaryDirectory() as home:
+        env = dict(os.environ, CLAISEN_HOME=home, PYTHONPATH=REPO_ROOT)
+        server = subprocess.Popen([sys.executable, os.path.join(REPO_ROOT, 'claisen_log.py'), 'serve',
+                                   '--workers', str(args.workers)],
+                                  env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            socket_path = os.path.join(home, SOCKET_NAME)
+            if not wait_for(TriageClient(socket_path)):
+                print("daemon did not start", file=sys.stderr)
+                sys.exit(1)
+            timings = {'in_process': [], 'daemon': []}
+            same = True
+            for i in range(args.runs):
+                notes = NOTES[i % len(NOTES)]
+                t_local, out_local = run_triage(home, answers, notes, daemon=False)
+                t_daemon, out_daemon = run_triage(home, answers, notes, daemon=True)
+                timings['in_process'].append(t_local)
+                timings['daemon'].append(t_daemon)
+                same &= out_local == out_daemon
+
+            def one(i):
+                client = TriageClient(socket_path)
+                start = time.perf_counter()
+                client.assign_profile(answers, NOTES[i % len(NOTES)] + f" ({i})")
+                client.close()
+                return time.perf_counter() - start
+            start = time.perf_counter()
+            with ThreadPoolExecutor(args.clients) as pool:
+                latencies = sorted(pool.map(one, range(args.requests)))
+            elapsed = time.perf_counter() - start
+        finally:
+            server.terminate()
+            server.wait()
+
+    results = {
+        'in_process_p50_ms': statistics.median(timings['in_process']) * 1000,
+        'daemon_p50_ms': statistics.median(timings['daemon']) * 1000,
+        'same_output': same,
+        'concurrent_requests_per_sec': args.requests / elapsed,
+        'concurrent_p50_ms': latencies[len(latencies) // 2] * 1000,
+        'concurrent_p99_ms': latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"triage CLI p50: in-process {results['in_process_p50_ms']:7.1f} ms   via daemon {results['daemon_p50_ms']:7.1f} ms   "
+              f"{'same output' if same else 'OUTPUT DIFFERS'}")
+        print(f"{args.clients} concurrent clients: {results['concurrent_requests_per_sec']:7.0f} req/s   "
+              f"p50 {results['concurrent_p50_ms']:6.2f} ms  p99 {results['concurrent_p99_ms']:6.2f} ms")
+    sys.exit(0 if same else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Export benchmark: one month out of a long history, indexed vs full scan.
+
+Builds a synthetic log of daily symptom and triage entries in a temporary
+directory, then exports the last month with --since/--until through the date
+index and through a plain filtered scan, checks both produce the same file,
+and reports the time for each output format.
+
+    python -m benchmarks.bench_export --days 3650
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+from datetime import date, timedelta
+from claisen_data.storage import open_storage, StorageBackend
+from claisen_data.export import export
+
+def synthetic_log(storage, days, seed=0):
+    rng = random.Random(seed)
+    start = date.today() - timedelta(days=days)
+    records = []
+    for i in range(days):
+        day = str(start + timedelta(days=i))
+        records.append({'date': day, 'notes': 'synthetic',
+                        'symptoms': [{'name': s, 'severity': rng.randint(1, 5)} for s in rng.sample(['bloating', 'gas', 'heartburn'], rng.randint(0, 3))]})
+        if rng.random() < 0.2:
+            records.append({'date': day, 'triage_answers': {'age_group': '31-50'}, 'profile': 'profile_1',
+                            'profile_reason': 'synthetic', 'recommendation': '', 'nlp_extracted': {},
+                            'followup_day': None, 'notes': 'synthetic'})
+    storage.save_all(records)
+
+def main():
+    parser = argparse.ArgumentParser(description="Date-range export benchmark")
+    parser.add_argument('--days', type=int, default=3650, help='Days of history to generate')
+    parser.add_argument('--formats', default='csv,json,jsonl,parquet,arrow')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    # Keep pyarrow's import time out of the first columnar timing
+    try:
+        import pyarrow.parquet, pyarrow.ipc
+    except ImportError:
+        pass
+    results = {'days': args.days, 'formats': {}}
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = open_storage(os.path.join(tmp, 'data.db'), 'jsonl')
+        synthetic_log(storage, args.days)
+        until = date.today() - timedelta(days=1)
+        since = until - timedelta(days=30)
+        for fmt in args.formats.split(','):
+            timings = {}
+            outputs = {}
+            for mode, records in (('indexed', lambda: storage.iter_range(str(since), str(until))),
+                                  ('full_scan', lambda: StorageBackend.iter_range(storage, str(since), str(until)))):
+                out = os.path.join(tmp, f'{mode}.{fmt}')
+                start = time.perf_counter()
+                try:
+                    export(records(), fmt, out)
+                except RuntimeError as e:
+                    print(f"{fmt}: skipped ({e})", file=sys.stderr)
+                    break
+                timings[mode] = time.perf_counter() - start
+                with open(out, 'rb') as f:
+                    outputs[mode] = f.read()
+            if len(timings) < 2:
+                continue
+            # Columnar files embed writer metadata, so compare the text formats only
+            same = fmt in ('parquet', 'arrow') or outputs['indexed'] == outputs['full_scan']
+            failed |= not same
+            results['formats'][fmt] = {**timings, 'same_output': same}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"last 31 days out of {args.days} days of history")
+        for fmt, r in results['formats'].items():
+            status = 'OK' if r['same_output'] else 'MISMATCH'
+            print(f"{fmt:8s} indexed {r['indexed'] * 1000:8.1f} ms   full scan {r['full_scan'] * 1000:8.1f} ms  {status}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Follow-up sessions: prior-state lookup cost and prompts per session.
+
+Lookup: on synthetic logs of each size (a triage entry every --triage-every
+days), finds the latest triage entry three ways: through the rollups header
+(latest_triage), by reading the log newest first, and by scanning the whole
+log forwards. All three must return the same entry. The header lookup should
+stay flat as the log grows. The forward scan grows linearly. Reading newest
+first grows with the distance back to the last triage entry.
+
+Prompts: for synthetic patients (a complete earlier triage, then follow-up
+answers), counts the questions a full questionnaire asks vs a follow-up
+session: the followup_* questions plus the ones carried answers are dropped
+for.
+
+    python -m benchmarks.bench_followup --sizes 1000,100000 --patients 5000
+"""
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+from claisen_data.storage import open_storage
+from claisen_data.rollups import Rollups
+from claisen_data.validation import SYMPTOMS
+from claisen_data.question_graph import QUESTION_GRAPH
+from claisen_data.followup import latest_triage, followup_questions, carry_forward
+from benchmarks.synthetic import write_log, sample_answers
+
+def best_of(fn, repeat):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def forward_scan(storage):
+    last = None
+    for record in storage.iter_records():
+        if 'triage_answers' in record:
+            last = record
+    return last
+
+def reverse_scan(storage):
+    return next((r for r in storage.iter_reverse() if 'triage_answers' in r), None)
+
+def bench_lookup(n, triage_every, repeat):
+    with tempfile.TemporaryDirectory() as home:
+        storage = open_storage(os.path.join(home, 'data.db'), 'jsonl')
+        write_log(storage, n, triage_every=triage_every)
+        rollups = Rollups(storage.path, SYMPTOMS)
+        rollups.sync(storage)
+        indexed_s, indexed = best_of(lambda: latest_triage(storage, rollups), repeat)
+        reverse_s, reverse = best_of(lambda: reverse_scan(storage), repeat)
+        forward_s, forward = best_of(lambda: forward_scan(storage), max(1, repeat // 10))
+        return {'entries': n, 'triage_every': triage_every,
+                'lookup_ms': {'indexed': indexed_s * 1000, 'newest_first': reverse_s * 1000,
+                              'full_scan': forward_s * 1000},
+                'found': indexed is not None, 'same_entry': indexed == reverse == forward}
+
+def bench_prompts(patients):
+    rng = random.Random(0)
+    full, followup = [], []
+    for _ in range(patients):
+        previous = sample_answers(rng, followup=True)
+        full.append(len(QUESTION_GRAPH.asked(previous)))
+        # Follow-up answers from a fresh sample; re-asked questions answered the same way
+        later = sample_answers(rng, followup=True)
+        answers = {q.id: later[q.id] for q in followup_questions({})}
+        asked = len(answers)
+        answers, _ = carry_forward({'profile': rng.choice([1, 2, 3, 4]), 'triage_answers': previous}, answers)
+        for q in QUESTION_GRAPH.pending(answers):
+            answers[q.id] = later.get(q.id, previous.get(q.id))
+            asked += 1
+        followup.append(asked)
+    return {'patients': patients, 'full_mean': sum(full) / patients, 'followup_mean': sum(followup) / patients,
+            'followup_max': max(followup)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Follow-up lookup and prompt-count benchmark")
+    parser.add_argument('--sizes', default='1000,100000', help='Comma-separated log sizes (entries)')
+    parser.add_argument('--triage-every', type=int, default=30, help='Days between synthetic triage entries')
+    parser.add_argument('--repeat', type=int, default=50, help='Lookups per method (best reported)')
+    parser.add_argument('--patients', type=int, default=5000, help='Synthetic follow-up sessions for prompt counts')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    lookups = [bench_lookup(int(n), args.triage_every, args.repeat) for n in args.sizes.split(',')]
+    prompts = bench_prompts(args.patients)
+    results = {'lookup': lookups, 'prompts': prompts}
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for r in lookups:
+            cols = '  '.join(f"{name} {ms:9.3f} ms" for name, ms in r['lookup_ms'].items())
+            print(f"{r['entries']:>8} entries: {cols}  {'same entry' if r['same_entry'] else 'MISMATCH'}")
+        print(f"prompts per session: full questionnaire {prompts['full_mean']:.1f}, "
+              f"follow-up {prompts['followup_mean']:.1f} (max {prompts['followup_max']})")
+    if not all(r['same_entry'] and r['found'] for r in lookups):
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Bulk import validation: agreement with the pydantic models, and rows/sec.
+
+Generates a synthetic CSV and JSON Lines backfill with a share of bad rows
+(unknown symptoms, out-of-range or malformed severities, bad dates), checks
+that ingest.validate accepts and rejects exactly what SymptomEntry/DayLog do
+row by row, then times the bulk path against building the models per row.
+
+Import checks run ingest.import_file end to end on a small log whose date
+index was deleted before an append, with a backfill that falls between and before the
+logged days: no day may be logged twice, importing the same file again must
+add nothing, the log must stay in date order, and its rollups must match a
+rebuild from scratch.
+
+    python -m benchmarks.bench_import --rows 500000
+"""
+import io
+import os
+import sys
+import csv
+import json
+import time
+import random
+import argparse
+import tempfile
+from datetime import date, timedelta
+from pydantic import ValidationError
+from claisen_data.validation import SymptomEntry, DayLog
+from claisen_data.ingest import read_csv, read_jsonl, validate, gc_paused, import_file
+from claisen_data.storage import open_storage
+from claisen_data.rollups import Rollups, summary, trends
+from claisen_data import validation
+
+SYMPTOMS = ['bloating', 'gas', 'heartburn']
+BAD_NAMES = ['cough', 'Gas', '', 'heartburn ']
+BAD_SEVERITIES = [0, 6, -1, 3.5, '4', ' 2', 'x', None, True, 10 ** 12]
+
+def synthetic_entries(rows, bad_rate, seed=0):
+    """Entries with 1-3 symptoms each, until about rows symptom reports are made."""
+    rng = random.Random(seed)
+    start = date(2000, 1, 1)
+    made = 0
+    i = 0
+    while made < rows:
+        day = str(start + timedelta(days=i))
+        if rng.random() < bad_rate / 4:
+            day = rng.choice(['2021-02-30', '2021-1-5', 'yesterday'])
+        symptoms = []
+        for name in rng.sample(SYMPTOMS, rng.randint(1, 3)):
+            severity = rng.randint(1, 5)
+            if rng.random() < bad_rate:
+                if rng.random() < 0.5:
+                    name = rng.choice(BAD_NAMES)
+                else:
+                    severity = rng.choice(BAD_SEVERITIES)
+            symptoms.append({'name': name, 'severity': severity})
+        made += len(symptoms)
+        yield {'date': day, 'symptoms': symptoms, 'notes': rng.choice(['', 'after dinner', f'clinic note {i}'])}
+        i += 1
+
+def to_csv(entries):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(['date', 'symptom', 'severity', 'notes'])
+    for e in entries:
+        for s in e['symptoms']:
+            writer.writerow([e['date'], s['name'], '' if s['severity'] is None else s['severity'], e['notes']])
+    return out.getvalue()
+
+def to_jsonl(entries):
+    return ''.join(json.dumps(e) + '\n' for e in entries)
+
+def model_validate(entries, from_csv):
+    """The interactive path: a SymptomEntry per report and a DayLog per entry."""
+    accepted = []
+    for e in entries:
+        try:
+            symptoms = [SymptomEntry(name=s['name'], severity=str(s['severity']) if from_csv and s['severity'] is not None else s['severity']).dict()
+                        for s in e['symptoms']]
+            accepted.append(DayLog(date=e['date'], symptoms=symptoms, notes=e['notes']).dict())
+        except ValidationError:
+            continue
+    return accepted
+
+def timed(fn):
+    start = time.perf_counter()
+    with gc_paused():
+        value = fn()
+    return value, time.perf_counter() - start
+
+def check_import(home):
+    """Import a backfill into a log with a missing index, twice; count what went wrong."""
+    storage = open_storage(os.path.join(home, 'data.db'), 'jsonl')
+    rollups = Rollups(storage.path, validation.SYMPTOMS)
+    start = date(2024, 1, 1)
+    day = lambda i: str(start + timedelta(days=i))
+    storage.save_all([{'date': day(i), 'symptoms': [{'name': 'gas', 'severity': 2}], 'notes': ''} for i in range(0, 60, 3)])
+    rollups.sync(storage)
+    os.remove(storage.index.path)
+    # As a triage run would: append without asking the index anything first
+    storage.append({'date': day(100), 'triage_answers': {}, 'profile': 2, 'notes': ''})
+    backfill = os.path.join(home, 'backfill.jsonl')
+    with open(backfill, 'w') as f:
+        for i in range(-10, 70):
+            f.write(json.dumps({'date': day(i), 'symptoms': [{'name': 'bloating', 'severity': 1}], 'notes': 'backfill'}) + '\n')
+    first = import_file(backfill, 'jsonl', storage, rollups=rollups)
+    rollups.sync(storage)
+    again = import_file(backfill, 'jsonl', storage, rollups=rollups)
+    dates = [r['date'] for r in storage.iter_records()]
+    synced = json.dumps([summary(rollups), trends(rollups, 'week')])
+    rollups.rebuild_from(storage)
+    return {'duplicate_days': len(dates) - len(set(dates)), 'missing_days': 81 - len(set(dates)),
+            'first_import': first['imported'], 'reimported': again['imported'],
+            'out_of_order': dates != sorted(dates), 'rollups_differ': synced != json.dumps([summary(rollups), trends(rollups, 'week')])}
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import validation benchmark")
+    parser.add_argument('--rows', type=int, default=500000, help='Symptom rows to generate')
+    parser.add_argument('--bad-rate', type=float, default=0.02, help='Share of rows made invalid')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    entries = list(synthetic_entries(args.rows, args.bad_rate))
+    rows = sum(len(e['symptoms']) for e in entries)
+    # Dates repeat only when a bad date is drawn twice; keep the comparison per entry
+    seen, unique = set(), []
+    for e in entries:
+        if e['date'] not in seen:
+            seen.add(e['date'])
+            unique.append(e)
+    results = {'rows': rows, 'formats': {}}
+    failed = False
+    for fmt, text, reader in (('csv', to_csv(unique), read_csv), ('jsonl', to_jsonl(unique), read_jsonl)):
+        (accepted, errors), bulk_time = timed(lambda: validate(reader(io.StringIO(text))))
+        expected, model_time = timed(lambda: model_validate(unique, fmt == 'csv'))
+        same = [e for _, e in accepted] == expected
+        failed |= not same
+        results['formats'][fmt] = {
+            'bulk_rows_per_sec': rows / bulk_time, 'model_rows_per_sec': rows / model_time,
+            'accepted_entries': len(accepted), 'rejected_rows': len(errors), 'same_as_models': same,
+        }
+
+    with tempfile.TemporaryDirectory() as home:
+        checks = check_import(home)
+    results['import_checks'] = checks
+    results['mismatches'] = (checks['duplicate_days'] + checks['missing_days'] + checks['reimported']
+                             + checks['out_of_order'] + checks['rollups_differ'])
+    failed |= bool(results['mismatches'])
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{rows} symptom rows, {args.bad_rate:.0%} made invalid")
+        for fmt, r in results['formats'].items():
+            status = 'OK' if r['same_as_models'] else 'MISMATCH'
+            print(f"{fmt:6s} bulk {r['bulk_rows_per_sec']:10,.0f} rows/s   per-row models {r['model_rows_per_sec']:10,.0f} rows/s   "
+                  f"{r['accepted_entries']} entries accepted, {r['rejected_rows']} rows rejected  {status}")
+        print(f"import into a log with no index: {checks['first_import']} imported, {checks['reimported']} on re-import, "
+              f"{checks['duplicate_days']} duplicate days, {'out of' if checks['out_of_order'] else 'in'} date order, "
+              f"rollups {'differ from' if checks['rollups_differ'] else 'match'} a rebuild")
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
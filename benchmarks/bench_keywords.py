@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Keyword matcher: equivalence with the original per-keyword scans, and notes/sec.
+
+Generates notes from the keyword tables mixed with filler words, random case,
+punctuation and the odd non-ASCII character, and checks that the merged
+matcher returns exactly what scan_slow (the original one-search-per-keyword
+code) returns.
+
+    python -m benchmarks.bench_keywords --notes 20000
+"""
+import sys
+import json
+import time
+import random
+import argparse
+from claisen_data.keyword_matcher import (
+    MATCHER, scan_slow, SEVERITY_KEYWORDS, TRIGGER_KEYWORDS, TIMING_KEYWORDS, STABLE_KEYWORDS,
+)
+
+FILLER = ["i", "have", "had", "some", "pain", "after", "lunch", "the", "and", "really", "today",
+          "nights", "stressed", "looked", "smoking", "meals", "betterment", "café", "naïve", "ſevere",
+          "ANXİETY", "oK", "—", "can’t sleep", "CAN'T SLEEP", "mildaily"]
+
+def synthetic_notes(n, seed=0):
+    rng = random.Random(seed)
+    vocab = [k for _, kws in SEVERITY_KEYWORDS for k in kws] + TRIGGER_KEYWORDS + TIMING_KEYWORDS + STABLE_KEYWORDS
+    notes = []
+    for _ in range(n):
+        words = [rng.choice(vocab if rng.random() < 0.3 else FILLER) for _ in range(rng.randint(0, 25))]
+        words = [w.upper() if rng.random() < 0.1 else w for w in words]
+        sep = rng.choice([' ', ' ', ', ', '', '. '])
+        notes.append(sep.join(words))
+    return notes
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyword matcher equivalence and throughput")
+    parser.add_argument('--notes', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3, help='Best of this many timing runs')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    notes = synthetic_notes(args.notes)
+    mismatches = [n for n in notes if MATCHER.scan(n) != scan_slow(n)]
+    timings = {}
+    for name, fn in (('per_keyword', scan_slow), ('matcher', MATCHER.scan)):
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            for n in notes:
+                fn(n)
+            best = min(best, time.perf_counter() - start)
+        timings[name] = len(notes) / best
+
+    results = {'notes': len(notes), 'mismatches': len(mismatches), 'notes_per_sec': timings}
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for n in mismatches[:5]:
+            print(f"MISMATCH: {n!r}", file=sys.stderr)
+        print(f"checked {len(notes)} notes, {len(mismatches)} mismatches")
+        for name, rate in timings.items():
+            print(f"{name:12s} {rate:10.0f} notes/sec")
+    sys.exit(1 if mismatches else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+LogFrame vs list-of-dicts: memory, round trip, and scan speed.
+
+Builds a synthetic cohort-sized log, checks that LogFrame.to_records()
+returns exactly the input (same keys, order and values), then compares the
+memory held and the time to answer a filter + aggregation with dict loops
+and with the frame's vectorized methods.
+
+    python -m benchmarks.bench_logframe --entries 200000
+"""
+import sys
+import gc
+import json
+import time
+import random
+import argparse
+import tracemalloc
+from datetime import date, timedelta
+from claisen_data.logframe import LogFrame
+
+SYMPTOMS = ['bloating', 'gas', 'heartburn']
+
+def synthetic_records(n, seed=0):
+    rng = random.Random(seed)
+    start = date(2015, 1, 1)
+    out = []
+    for i in range(n):
+        day = str(start + timedelta(days=rng.randint(0, 3650)))
+        if rng.random() < 0.85:
+            out.append({'date': day, 'notes': rng.choice(['', 'after dinner', 'stressful day', f'note {i}']),
+                        'symptoms': [{'name': s, 'severity': rng.randint(1, 5)} for s in rng.sample(SYMPTOMS, rng.randint(0, 3))]})
+        else:
+            out.append({'date': day, 'triage_answers': {'age_group': '31-50'}, 'profile': rng.randint(1, 5),
+                        'profile_reason': 'synthetic', 'recommendation': '', 'nlp_extracted': {},
+                        'followup_day': None, 'notes': ''})
+    return out
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size
+
+def dict_query(records, since, until):
+    """Mean severity per symptom in a date range, with plain loops."""
+    total, count = {}, {}
+    for r in records:
+        if since <= r['date'] <= until:
+            for s in r.get('symptoms', []):
+                total[s['name']] = total.get(s['name'], 0) + s['severity']
+                count[s['name']] = count.get(s['name'], 0) + 1
+    return {name: round(total[name] / count[name], 2) for name in SYMPTOMS if count.get(name)}
+
+def frame_query(frame, since, until):
+    summary = frame.take(frame.between(since, until)).symptom_summary()
+    return {name: s['mean'] for name, s in summary.items() if s['reports']}
+
+def best_of(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        best = min(best, time.perf_counter() - start)
+    return value, best
+
+def main():
+    parser = argparse.ArgumentParser(description="LogFrame memory and scan benchmark")
+    parser.add_argument('--entries', type=int, default=200000)
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    # Parse from JSON lines, as loading the log does, so the dicts own their strings
+    lines = [json.dumps(r) for r in synthetic_records(args.entries)]
+    records, dict_bytes = measure(lambda: [json.loads(line) for line in lines])
+    frame, frame_bytes = measure(lambda: LogFrame.from_records(records, SYMPTOMS))
+    round_trip = frame.to_records() == records
+    since, until = '2020-01-01', '2020-12-31'
+    dict_result, dict_time = best_of(lambda: dict_query(records, since, until))
+    frame_result, frame_time = best_of(lambda: frame_query(frame, since, until))
+    results = {
+        'entries': args.entries,
+        'dict_mb': dict_bytes / 2**20, 'frame_mb': frame_bytes / 2**20,
+        'dict_query_ms': dict_time * 1000, 'frame_query_ms': frame_time * 1000,
+        'round_trip': round_trip, 'same_answer': dict_result == frame_result,
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{args.entries} entries")
+        print(f"memory   dicts {results['dict_mb']:8.1f} MB   LogFrame {results['frame_mb']:8.1f} MB")
+        print(f"1-year symptom means   dicts {results['dict_query_ms']:8.1f} ms   LogFrame {results['frame_query_ms']:8.1f} ms")
+        print(f"round trip exact: {round_trip}, same answer: {results['same_answer']}")
+    sys.exit(0 if round_trip and results['same_answer'] else 1)
+
+if __name__ == '__main__':
+    main()
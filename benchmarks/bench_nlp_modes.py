@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+spaCy pipeline modes: findings parity, latency and memory.
+
+Builds three pipelines, each in its own interpreter so their memory can be
+told apart: `baseline` (en_core_web_sm with every component, as extraction
+used to load it), `full` (UNUSED_COMPONENTS excluded) and `rules` (blank
+tokenizer + EntityRuler). Each extracts the same synthetic notes. Reported
+per mode: load time, peak RSS, single-note latency (p50/p99 of nlp(text))
+and nlp.pipe() throughput per --n-process.
+
+Parity, against baseline: `full` must give identical findings. `rules`
+must give the same findings apart from the statistical NER labels in
+`entities` (DATE, CARDINAL, ...), and the same triage result for every note
+(assign_profile_from_findings with a fixed answer set). Differences are
+counted as mismatches and the benchmark exits 1.
+
+Modes that cannot be built (no spaCy, or no en_core_web_sm for baseline and
+full) are listed under `skipped_modes`, and parity is only checked against a
+baseline that was built. Without spaCy at all the benchmark exits 0 with
+`skipped`.
+
+    python -m benchmarks.bench_nlp_modes --notes 5000 --n-process 1,2
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import subprocess
+import statistics
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ['baseline', 'full', 'rules']
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is kilobytes on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1 << 20) if sys.platform == 'darwin' else rss / 1024
+
+def run_mode(mode, notes, batch_size, n_processes, latency_notes):
+    """Runs in a child interpreter: everything for one mode, as a JSON-serialisable dict."""
+    from claisen_data.triage_engine import load_nlp, _findings_from_doc
+    before = peak_rss_mb()
+    start = time.perf_counter()
+    nlp = load_nlp('full', exclude=[]) if mode == 'baseline' else load_nlp(mode)
+    load_s = time.perf_counter() - start
+    if nlp is None:
+        return {'mode': mode, 'skipped': 'spaCy or en_core_web_sm not installed'}
+    latencies = []
+    for text in notes[:latency_notes]:
+        start = time.perf_counter()
+        nlp(text)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    throughput = []
+    for n_process in n_processes:
+        start = time.perf_counter()
+        docs = list(nlp.pipe(notes, batch_size=batch_size, n_process=n_process))
+        throughput.append({'n_process': n_process, 'notes_per_sec': len(notes) / (time.perf_counter() - start)})
+    findings = [_findings_from_doc(doc, text, False) for doc, text in zip(docs, notes)]
+    return {'mode': mode, 'components': nlp.pipe_names, 'load_s': load_s,
+            'load_mb': peak_rss_mb() - before, 'peak_rss_mb': peak_rss_mb(),
+            'latency_ms': {'p50': statistics.median(latencies) * 1000,
+                           'p99': latencies[int(len(latencies) * 0.99)] * 1000},
+            'throughput': throughput, 'findings': findings}
+
+def spawn(mode, args):
+    argv = [sys.executable, '-m', 'benchmarks.bench_nlp_modes', '--run', mode, '--notes', str(args.notes),
+            '--batch-size', str(args.batch_size), '--n-process', args.n_process,
+            '--latency-notes', str(args.latency_notes)]
+    proc = subprocess.run(argv, cwd=REPO_ROOT, capture_output=True, text=True,
+                          env=dict(os.environ, PYTHONPATH=REPO_ROOT))
+    if proc.returncode != 0:
+        raise RuntimeError(f"{mode} run failed:\n{proc.stderr}")
+    return json.loads(proc.stdout)
+
+def ruler_only(findings):
+    from claisen_data.triage_engine import PATTERNS
+    labels = {p['label'] for p in PATTERNS}
+    return {**findings, 'entities': [e for e in findings['entities'] if e[1] in labels]}
+
+def triage(findings, answers):
+    from claisen_data.triage_engine import assign_profile_from_findings
+    result = assign_profile_from_findings(answers, findings)
+    return {k: v for k, v in result.items() if k != 'nlp_extracted'}
+
+def main():
+    parser = argparse.ArgumentParser(description="spaCy pipeline mode benchmark")
+    parser.add_argument('--notes', type=int, default=5000, help='Synthetic notes to extract')
+    parser.add_argument('--batch-size', type=int, default=256, help='nlp.pipe batch size')
+    parser.add_argument('--n-process', default='1,2', help='Comma-separated nlp.pipe process counts')
+    parser.add_argument('--latency-notes', type=int, default=500, help='Notes timed one at a time')
+    parser.add_argument('--run', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    from benchmarks.synthetic import sample_note, sample_answers
+    rng = random.Random(0)
+    notes = [sample_note(rng) for _ in range(args.notes)]
+    if args.run:
+        n_processes = [int(n) for n in args.n_process.split(',')]
+        print(json.dumps(run_mode(args.run, notes, args.batch_size, n_processes, args.latency_notes)))
+        return
+
+    runs = {mode: spawn(mode, args) for mode in MODES}
+    skipped = {mode: runs.pop(mode)['skipped'] for mode in MODES if 'skipped' in runs[mode]}
+    if not runs:
+        results = {'skipped': 'spaCy is not installed'}
+        print(json.dumps(results, indent=2) if args.json else f"skipped ({results['skipped']})")
+        return
+    answers = sample_answers(rng)
+    mismatches = {}
+    if 'baseline' in runs:
+        baseline = runs['baseline']['findings']
+        if 'full' in runs:
+            mismatches['full'] = sum(f != b for f, b in zip(runs['full']['findings'], baseline))
+        if 'rules' in runs:
+            mismatches['rules'] = sum(ruler_only(f) != ruler_only(b) or triage(f, answers) != triage(b, answers)
+                                      for f, b in zip(runs['rules']['findings'], baseline))
+    modes = [{k: v for k, v in r.items() if k != 'findings'} for r in runs.values()]
+    results = {'notes': len(notes), 'modes': modes, 'mismatches': sum(mismatches.values()),
+               'mismatches_by_mode': mismatches, 'skipped_modes': skipped}
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for r in modes:
+            rates = '  '.join(f"pipe x{t['n_process']} {t['notes_per_sec']:8.0f} notes/s" for t in r['throughput'])
+            print(f"{r['mode']:>8}: load {r['load_s']:5.2f} s  +{r['load_mb']:6.1f} MB (peak {r['peak_rss_mb']:6.1f} MB)  "
+                  f"nlp(text) p50 {r['latency_ms']['p50']:6.3f} ms p99 {r['latency_ms']['p99']:6.3f} ms  {rates}")
+            print(f"          components: {', '.join(r['components'])}")
+        for mode, why in skipped.items():
+            print(f"{mode:>8}: skipped ({why})")
+        if mismatches:
+            print("mismatches vs baseline: " + ', '.join(f"{mode} {n}" for mode, n in mismatches.items()))
+        else:
+            print("no baseline pipeline, parity not checked")
+    if results['mismatches']:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for the compiled profile rules.
+
+Reports decisions/sec for assign_profile_from_findings (rule table plus the
+result it builds) and for CompiledRules.match alone, over synthetic full
+answer sets. Equivalence with the if-chain the rule table replaced is
+checked by tests/test_triage_rules.py.
+
+    python -m benchmarks.bench_profile_rules --samples 50000
+"""
+import json
+import time
+import random
+import argparse
+from claisen_data.triage_rules import COMPILED_RULES
+from claisen_data.triage_engine import assign_profile_from_findings
+from benchmarks.synthetic import sample_answers
+
+FINDINGS = [
+    {},
+    {"symptoms": ["gas"], "severity": "mild", "triggers": ["stress"], "timing": [], "sentiment": "stable",
+     "entities": [("gas", "SYMPTOM"), ("stress", "TRIGGER")]},
+    {"symptoms": [], "severity": "severe", "triggers": [], "timing": ["night"], "sentiment": None, "entities": []},
+    {"symptoms": [], "severity": None, "triggers": [], "timing": [], "sentiment": "urgent", "entities": []},
+]
+
+def samples(n, seed=0):
+    rng = random.Random(seed)
+    return [(sample_answers(rng, followup=rng.random() < 0.2, alarm_rate=0.05), rng.choice(FINDINGS))
+            for _ in range(n)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Compiled rules: decisions/sec")
+    parser.add_argument('--samples', type=int, default=50000, help='Random answer sets')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    sample = samples(args.samples)
+    timings = {}
+    start = time.perf_counter()
+    for answers, findings in sample:
+        assign_profile_from_findings(answers, findings)
+    timings['assign_profile'] = len(sample) / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for answers, _ in sample:
+        COMPILED_RULES.match(answers)
+    timings['matcher_only'] = len(sample) / (time.perf_counter() - start)
+
+    results = {'samples': len(sample), 'decisions_per_sec': timings}
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, rate in timings.items():
+            print(f"{name:15s} {rate:12.0f} decisions/sec")
+
+if __name__ == '__main__':
+    main()
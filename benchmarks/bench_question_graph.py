@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Compiled question graph vs walking TRIAGE_QUESTIONS.
+
+Equivalence: for synthetic partial answer sets (a random subset of a
+complete synthetic patient), QUESTION_GRAPH.pending must prompt for exactly
+the questions the old linear walker did, in the same order. Speed: the
+pending walk, answer validation (one dict lookup per answer vs a scan of the
+question list per answer), and compiling the graph vs loading it from a
+pickle.
+
+    python -m benchmarks.bench_question_graph --patients 20000
+"""
+import json
+import time
+import pickle
+import random
+import argparse
+from claisen_data.triage_questions import TRIAGE_QUESTIONS
+from claisen_data.question_graph import QUESTION_GRAPH, QuestionGraph
+from benchmarks.synthetic import sample_answers
+
+def linear_pending(answers):
+    """The walker as it was: one ask_if condition, checked on every run."""
+    for q in TRIAGE_QUESTIONS:
+        if 'ask_if' in q:
+            key, val = list(q['ask_if'].items())[0]
+            if answers.get(key) != val:
+                continue
+        if q['id'] in answers:
+            continue
+        yield q['id']
+
+def walk(pending, answers, complete):
+    """Prompt order, answering each question from the complete answer set."""
+    asked = []
+    for q in pending(answers):
+        qid = q if isinstance(q, str) else q.id
+        asked.append(qid)
+        answers[qid] = complete.get(qid, '')
+    return asked
+
+def linear_validate(answers):
+    problems = []
+    for qid, value in answers.items():
+        q = next((q for q in TRIAGE_QUESTIONS if q['id'] == qid), None)
+        if q is None:
+            problems.append(qid)
+        elif q['type'] == 'choice' and value not in q['options']:
+            problems.append(qid)
+    return problems
+
+def timed(fn, items):
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Question graph benchmark")
+    parser.add_argument('--patients', type=int, default=20000, help='Synthetic partial answer sets')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    cases = []
+    for _ in range(args.patients):
+        complete = sample_answers(rng, followup=rng.random() < 0.5)
+        given = {k: v for k, v in complete.items() if rng.random() < 0.7}
+        cases.append((given, complete))
+
+    mismatches = sum(walk(linear_pending, dict(g), c) != walk(QUESTION_GRAPH.pending, dict(g), c) for g, c in cases)
+    invalid = sum(bool(QUESTION_GRAPH.validate(c)[1]) for _, c in cases)
+
+    n = len(cases)
+    linear_walk_s = timed(lambda gc: walk(linear_pending, dict(gc[0]), gc[1]), cases)
+    graph_walk_s = timed(lambda gc: walk(QUESTION_GRAPH.pending, dict(gc[0]), gc[1]), cases)
+    linear_validate_s = timed(lambda gc: linear_validate(gc[1]), cases)
+    graph_validate_s = timed(lambda gc: QUESTION_GRAPH.validate(gc[1]), cases)
+    runs = 200
+    compile_s = timed(lambda _: QuestionGraph(), range(runs)) / runs
+    data = pickle.dumps(QUESTION_GRAPH)
+    unpickle_s = timed(lambda _: pickle.loads(data), range(runs)) / runs
+
+    results = {
+        'patients': n,
+        'mismatches': mismatches,
+        'invalid_synthetic': invalid,
+        'walk_per_sec': {'linear': n / linear_walk_s, 'graph': n / graph_walk_s},
+        'validate_per_sec': {'linear': n / linear_validate_s, 'graph': n / graph_validate_s},
+        'compile_us': compile_s * 1e6,
+        'unpickle_us': unpickle_s * 1e6,
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{n} partial answer sets: {mismatches} prompt-order mismatches, {invalid} rejected")
+        for name in ('walk_per_sec', 'validate_per_sec'):
+            r = results[name]
+            print(f"{name[:-8]:9s} linear {r['linear']:10.0f}/s  graph {r['graph']:10.0f}/s  "
+                  f"({r['graph'] / r['linear']:.1f}x)")
+        print(f"graph build: compile {results['compile_us']:.0f} us, unpickle {results['unpickle_us']:.0f} us")
+    if mismatches or invalid:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
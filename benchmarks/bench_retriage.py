@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Re-triage of stored logs: throughput, memory, resume and idempotence.
+
+For each size a synthetic log (a triage entry every --triage-every days) is
+re-triaged two ways, each in a fresh interpreter so peak memory can be
+compared: `retriage` (claisen_data.retriage, streaming with checkpoints) and
+`load_all` (load the whole log, assign_profile() per triage entry,
+save_all(), as a one-off script would). Reported: seconds, entries/sec and
+how far peak RSS rose during the run. retriage should stay flat as the log
+grows; load_all grows with it.
+
+Checks, on the smallest size: a run interrupted after two chunks and then
+resumed must leave the same bytes as an uninterrupted run, and a second run
+must update nothing. An import that merges an older entry into the log
+while a run is reading it must survive: the run stops with LogReplaced, and
+a run interrupted before such an import must not resume from its checkpoint.
+Failures count as mismatches and the benchmark exits 1.
+
+    python -m benchmarks.bench_retriage --sizes 10000,100000,1000000
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import filecmp
+import resource
+import tempfile
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+METHODS = ['retriage', 'load_all']
+SIDE_FILES = ['', '.idx', '.schemas']
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is kilobytes on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1 << 20) if sys.platform == 'darwin' else rss / 1024
+
+def run_method(method, path, chunk):
+    """Runs in a child interpreter: one re-triage of the log at path."""
+    from claisen_data.storage import open_storage
+    from claisen_data.rollups import Rollups
+    from claisen_data.validation import SYMPTOMS
+    from claisen_data.retriage import Retriage
+    from claisen_data.triage_engine import assign_profile, get_nlp, get_urgency_model
+    import claisen_data.codec
+    get_nlp()
+    get_urgency_model()
+    storage = open_storage(path, 'jsonl')
+    retriage = Retriage(storage, Rollups(path, SYMPTOMS), chunk=chunk)
+    before = peak_rss_mb()
+    start = time.perf_counter()
+    if method == 'retriage':
+        entries = retriage.run()['entries']
+    else:
+        records = storage.load_all()
+        for record in records:
+            if isinstance(record.get('triage_answers'), dict):
+                result = assign_profile(record['triage_answers'], notes=record.get('notes'))
+                record.update({'profile': result['profile'], 'profile_reason': result['reason'],
+                               'recommendation': result['recommendation'], 'nlp_extracted': result['nlp_extracted']})
+        storage.save_all(records)
+        Rollups(path, SYMPTOMS).sync(storage)
+        entries = len(records)
+    seconds = time.perf_counter() - start
+    return {'method': method, 'seconds': seconds, 'entries_per_sec': entries / seconds,
+            'rss_growth_mb': peak_rss_mb() - before}
+
+def spawn(method, path, chunk):
+    argv = [sys.executable, '-m', 'benchmarks.bench_retriage', '--run', method, '--path', path, '--chunk', str(chunk)]
+    proc = subprocess.run(argv, cwd=REPO_ROOT, capture_output=True, text=True,
+                          env=dict(os.environ, PYTHONPATH=REPO_ROOT))
+    if proc.returncode != 0:
+        raise RuntimeError(f"{method} failed:\n{proc.stderr}")
+    return json.loads(proc.stdout)
+
+def copy_log(src, dst):
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    for ext in SIDE_FILES:
+        if os.path.exists(src + ext):
+            shutil.copy(src + ext, dst + ext)
+
+def check_resume(home, source, chunk):
+    """Mismatches: interrupted + resumed vs uninterrupted output, and updates made by a second run."""
+    from claisen_data.storage import open_storage
+    from claisen_data.rollups import Rollups
+    from claisen_data.validation import SYMPTOMS
+    from claisen_data.retriage import Retriage
+    whole, resumed = os.path.join(home, 'whole', 'data.db'), os.path.join(home, 'resumed', 'data.db')
+    copy_log(source, whole)
+    copy_log(source, resumed)
+    Retriage(open_storage(whole, 'jsonl'), Rollups(whole, SYMPTOMS), chunk=chunk).run()
+    calls = []
+    def interrupt(summary, offset):
+        calls.append(offset)
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+    try:
+        Retriage(open_storage(resumed, 'jsonl'), Rollups(resumed, SYMPTOMS), chunk=chunk).run(progress=interrupt)
+    except KeyboardInterrupt:
+        pass
+    rerun = Retriage(open_storage(resumed, 'jsonl'), Rollups(resumed, SYMPTOMS), chunk=chunk)
+    rerun.run()
+    again = Retriage(open_storage(whole, 'jsonl'), Rollups(whole, SYMPTOMS), chunk=chunk).run()
+    return {'resumed': rerun.resumed_from is not None,
+            'same_bytes': filecmp.cmp(whole, resumed, shallow=False),
+            'second_run_updates': again['updated']}
+
+def check_backfill(home, source, chunk):
+    """Mismatches: a backfill merged in during (or between) runs that is lost, or resumed across."""
+    from claisen_data.storage import open_storage
+    from claisen_data.rollups import Rollups
+    from claisen_data.validation import SYMPTOMS
+    from claisen_data.retriage import Retriage, LogReplaced
+    path = os.path.join(home, 'backfill', 'data.db')
+    copy_log(source, path)
+    storage = open_storage(path, 'jsonl')
+    first = next(storage.iter_records(expand=False))['date']
+    backfill = {'date': '1970-01-01', 'notes': 'backfilled'}
+    def merge(summary, offset):
+        if backfill['date'] == '1970-01-01':
+            backfill['date'] = first
+            storage.merge_many([dict(backfill)])
+    try:
+        Retriage(storage, Rollups(path, SYMPTOMS), chunk=chunk).run(progress=merge)
+        stopped = False
+    except LogReplaced:
+        stopped = True
+    kept = sum(r.get('notes') == 'backfilled' for r in storage.iter_records(expand=False))
+    # Interrupted, then the log rewritten before the run is started again
+    def interrupt(summary, offset):
+        raise KeyboardInterrupt
+    try:
+        Retriage(storage, Rollups(path, SYMPTOMS), chunk=chunk).run(progress=interrupt)
+    except KeyboardInterrupt:
+        pass
+    storage.merge_many([dict(backfill)])
+    rerun = Retriage(storage, Rollups(path, SYMPTOMS), chunk=chunk)
+    rerun.run()
+    kept_after_rerun = sum(r.get('notes') == 'backfilled' for r in storage.iter_records(expand=False))
+    return {'stopped_on_rewrite': stopped, 'backfill_kept': kept == 1,
+            'resumed_after_rewrite': rerun.resumed_from is not None, 'backfill_kept_after_rerun': kept_after_rerun == 2}
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-triage benchmark")
+    parser.add_argument('--sizes', default='10000,100000', help='Comma-separated log sizes (entries)')
+    parser.add_argument('--triage-every', type=int, default=2, help='Days between synthetic triage entries')
+    parser.add_argument('--chunk', type=int, default=2000, help='retriage chunk size (log lines)')
+    parser.add_argument('--methods', default=','.join(METHODS), help='Comma-separated methods to time')
+    parser.add_argument('--run', choices=METHODS, help=argparse.SUPPRESS)
+    parser.add_argument('--path', help=argparse.SUPPRESS)
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+    if args.run:
+        print(json.dumps(run_method(args.run, args.path, args.chunk)))
+        return
+
+    from claisen_data.storage import open_storage
+    from benchmarks.synthetic import write_log
+    sizes = [int(n) for n in args.sizes.split(',')]
+    runs = []
+    with tempfile.TemporaryDirectory() as home:
+        for n in sizes:
+            source = os.path.join(home, str(n), 'source', 'data.db')
+            os.makedirs(os.path.dirname(source))
+            write_log(open_storage(source, 'jsonl'), n, triage_every=args.triage_every)
+            run = {'entries': n}
+            for method in args.methods.split(','):
+                path = os.path.join(home, str(n), method, 'data.db')
+                copy_log(source, path)
+                run[method] = spawn(method, path, args.chunk)
+                shutil.rmtree(os.path.dirname(path))
+            runs.append(run)
+            if n == sizes[0]:
+                chunk = max(1, min(args.chunk, n // 5))
+                checks = check_resume(os.path.join(home, str(n)), source, chunk)
+                checks.update(check_backfill(os.path.join(home, str(n)), source, chunk))
+            shutil.rmtree(os.path.join(home, str(n)))
+    mismatches = (not checks['resumed']) + (not checks['same_bytes']) + checks['second_run_updates']
+    mismatches += ((not checks['stopped_on_rewrite']) + (not checks['backfill_kept'])
+                   + checks['resumed_after_rewrite'] + (not checks['backfill_kept_after_rerun']))
+    results = {'triage_every': args.triage_every, 'runs': runs, 'checks': checks, 'mismatches': mismatches}
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for run in runs:
+            for r in (v for v in run.values() if isinstance(v, dict)):
+                print(f"{run['entries']:>8} entries  {r['method']:<9} {r['seconds']:7.2f} s  "
+                      f"{r['entries_per_sec']:9.0f} entries/s  peak RSS +{r['rss_growth_mb']:7.1f} MB")
+        print(f"resume: {'same bytes' if checks['same_bytes'] else 'DIFFERENT'} as an uninterrupted run; "
+              f"second run updated {checks['second_run_updates']} entries")
+        print(f"backfill during a run: {'kept' if checks['backfill_kept'] else 'LOST'}"
+              f"{'' if checks['stopped_on_rewrite'] else ' (run did not stop)'}; "
+              f"after an interrupted run: {'kept' if checks['backfill_kept_after_rerun'] else 'LOST'}"
+              f"{' (RESUMED across the rewrite)' if checks['resumed_after_rewrite'] else ''}")
+    if mismatches:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Per-patient shards: single-patient append latency and cross-patient fan-out.
+
+Creates synthetic patients with a year of entries each, times appending one
+entry to one patient as the number of patients grows (it should stay flat),
+and times the `patients` summary serially and with a process pool, checking
+both give the same answer.
+
+    python -m benchmarks.bench_shards --patients 200 --workers 4
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+from datetime import date, timedelta
+from claisen_data.storage import open_storage
+from claisen_data.shards import ShardManifest, log_path, summarize
+
+SYMPTOMS = ['bloating', 'gas', 'heartburn']
+
+def synthetic_patient(home, user, days, rng):
+    path = log_path(home, user)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    ShardManifest(home).register(user)
+    start = date.today() - timedelta(days=days)
+    open_storage(path, 'jsonl').save_all([
+        {'date': str(start + timedelta(days=i)), 'notes': '',
+         'symptoms': [{'name': s, 'severity': rng.randint(1, 5)} for s in rng.sample(SYMPTOMS, rng.randint(0, 3))]}
+        for i in range(days)])
+
+def time_append(home, user, repeat=20):
+    storage = open_storage(log_path(home, user), 'jsonl')
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        storage.append({'date': str(date.today()), 'notes': 'bench', 'symptoms': []})
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded storage benchmark")
+    parser.add_argument('--patients', type=int, default=200)
+    parser.add_argument('--days', type=int, default=365, help='Days of history per patient')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    results = {'patients': args.patients, 'days': args.days, 'append_ms': {}}
+    with tempfile.TemporaryDirectory() as home:
+        checkpoints = sorted({1, max(1, args.patients // 10), args.patients})
+        made = 0
+        for n in checkpoints:
+            while made < n:
+                synthetic_patient(home, f'patient-{made:05d}', args.days, rng)
+                made += 1
+            results['append_ms'][n] = time_append(home, 'patient-00000') * 1000
+        start = time.perf_counter()
+        serial = summarize(home, workers=1)
+        results['serial_s'] = time.perf_counter() - start
+        start = time.perf_counter()
+        parallel = summarize(home, workers=args.workers)
+        results['parallel_s'] = time.perf_counter() - start
+        results['same_answer'] = serial == parallel and len(serial) == args.patients
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for n, ms in results['append_ms'].items():
+            print(f"append to one patient with {n:>6} patients on disk: {ms:6.2f} ms")
+        print(f"summary of {args.patients} patients: serial {results['serial_s']:.2f} s, "
+              f"{args.workers} workers {results['parallel_s']:.2f} s  {'OK' if results['same_answer'] else 'MISMATCH'}")
+    sys.exit(0 if results['same_answer'] else 1)
+
+if __name__ == '__main__':
+    main()
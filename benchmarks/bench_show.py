@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+`show` window latency against history length.
+
+Builds synthetic logs of increasing length and times the record selection
+behind `show --last 20`, `show --page 5` and `show --from/--to` for one month.
+Each should take roughly the same time whatever the history length.
+
+Index checks: logs whose date index is missing, or behind the log (as an
+older version leaves it), are appended to and then queried; has_date,
+dates_present and iter_range must agree with a plain scan of the log. A
+date-ordered log also gets backfilled days merged in
+(merge_many, as `import` does) and must stay in date order, with the index
+still used for ranges. On a log with packed triage entries, select() (which
+reads with expand=False and unpacks only the shown page) must return the
+same records as slicing a fully expanded read. Disagreements count as
+mismatches and the benchmark exits 1.
+
+    python -m benchmarks.bench_show --sizes 1000,10000,100000
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+from datetime import date, timedelta
+from claisen_data.storage import open_storage, StorageBackend
+from claisen_data.views import select
+
+# The date index starts at 1970, so long histories get several entries per day
+MAX_DAYS = 15000
+
+def synthetic_log(storage, n):
+    """Write n entries over at most MAX_DAYS days; return (first day, days covered)."""
+    per_day = -(-n // MAX_DAYS)
+    days = -(-n // per_day)
+    start = date.today() - timedelta(days=days)
+    storage.save_all([{'date': str(start + timedelta(days=i // per_day)), 'notes': 'synthetic',
+                       'symptoms': [{'name': 'gas', 'severity': 1 + i % 5}]} for i in range(n)])
+    return start, days
+
+def stale_index(storage, case):
+    """Leave storage's date index as case describes: 'missing' or 'behind' the log."""
+    if case == 'missing':
+        os.remove(storage.index.path)
+    else:
+        with open(storage.path, 'ab') as f:
+            f.write(b''.join(json.dumps({'date': d, 'notes': 'older version'}).encode() + b'\n'
+                             for d in ('2024-02-10', '2024-02-11')))
+
+def index_mismatches(storage):
+    """has_date / dates_present / iter_range answers that differ from a full scan."""
+    days = [str(date(2023, 12, 20) + timedelta(days=i)) for i in range(75)]
+    scanned = {r['date'] for r in storage.iter_records()}
+    ranges = [('2024-01-01', '2024-01-31'), ('2024-02-05', None), (None, '2024-02-10'), ('2023-12-24', '2024-01-04')]
+    mismatches = sum(storage.has_date(d) != (d in scanned) for d in days)
+    mismatches += storage.dates_present(days) != scanned & set(days)
+    for since, until in ranges:
+        mismatches += list(storage.iter_range(since, until)) != list(StorageBackend.iter_range(storage, since, until))
+    return mismatches
+
+def check_index(tmp):
+    """Append to logs with a missing or lagging index, then compare indexed reads with scans."""
+    checks = {}
+    for case in ('missing', 'behind'):
+        storage = open_storage(os.path.join(tmp, f'index-{case}.db'), 'jsonl')
+        storage.save_all([{'date': str(date(2024, 1, 1) + timedelta(days=i)), 'notes': 'before'} for i in range(31)])
+        stale_index(storage, case)
+        storage.append({'date': '2024-02-20', 'triage_answers': {}, 'notes': 'appended'})
+        storage.merge_many([{'date': '2024-02-21', 'notes': 'appended'}])
+        checks[case] = index_mismatches(storage)
+    # Backfill: every other day is logged, then the gaps and older days are merged in
+    storage = open_storage(os.path.join(tmp, 'index-backfill.db'), 'jsonl')
+    storage.save_all([{'date': str(date(2024, 1, 1) + timedelta(days=i)), 'notes': 'before'} for i in range(0, 31, 2)])
+    storage.merge_many([{'date': str(date(2023, 12, 25) + timedelta(days=i)), 'triage_answers': {}, 'notes': 'backfill'}
+                        for i in range(0, 14, 2)] + [{'date': '2024-01-09', 'notes': 'backfill'}])
+    dates = [r['date'] for r in storage.iter_records()]
+    checks['backfill'] = index_mismatches(storage) + (dates != sorted(dates)) + (not storage.index.header()[2])
+    return checks
+
+def check_select(tmp):
+    """select() windows that differ from the same window cut from iter_records()."""
+    from benchmarks.synthetic import write_log
+    storage = open_storage(os.path.join(tmp, 'select.db'), 'jsonl')
+    write_log(storage, 2000, triage_every=2)
+    records = list(storage.iter_records())
+    profile = next(r['profile'] for r in records if 'triage_answers' in r)
+    chosen = [r for r in records if r.get('profile') == profile]
+    since, until = records[500]['date'], records[900]['date']
+    in_range = [r for r in records if since <= r['date'] <= until]
+    expected = [(dict(last=20), records[-20:]), (dict(page=3, page_size=15), records[-45:-30]),
+                (dict(last=10, profile=profile), chosen[-10:]), (dict(profile=profile), chosen),
+                (dict(since=since, until=until), in_range),
+                (dict(since=since, until=until, page=2, page_size=25), in_range[-50:-25])]
+    return sum(list(select(storage, **q)) != want for q, want in expected)
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="show window latency vs history length")
+    parser.add_argument('--sizes', default='1000,10000,100000', help='Comma-separated history lengths (entries)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        checks = check_index(tmp)
+        checks['select'] = check_select(tmp)
+        for n in [int(s) for s in args.sizes.split(',')]:
+            storage = open_storage(os.path.join(tmp, f'{n}.db'), 'jsonl')
+            start, days = synthetic_log(storage, n)
+            since = start + timedelta(days=days // 2)
+            queries = {
+                'last_20': dict(last=20),
+                'page_5': dict(page=5, page_size=20),
+                'one_month': dict(since=str(since), until=str(since + timedelta(days=30))),
+            }
+            results[n] = {name: best_of(lambda: list(select(storage, **q)), args.repeat) for name, q in queries.items()}
+
+    sizes = dict(results)
+    results.update({'index_checks': checks, 'mismatches': sum(checks.values())})
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for n, r in sizes.items():
+            print(f"{n:>8} entries  " + '  '.join(f"{name} {t * 1000:7.2f} ms" for name, t in r.items()))
+        print("checks: " + '  '.join(f"{case} {m} mismatches" for case, m in checks.items()))
+    if results['mismatches']:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the non-NLP CLI commands.
+
+Runs `add` and `show` in fresh interpreters against a throwaway HOME, times
+them, and fails if either command ends up importing spaCy or scikit-learn.
+
+    python -m benchmarks.bench_startup --runs 20
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ['spacy', 'sklearn']
+
+# Runs one CLI command in-process, then reports which heavy modules got loaded.
+PROBE = """
+import sys
+sys.argv = ['claisen_log.py'] + {argv!r}
+import claisen_log
+claisen_log.main()
+loaded = [m for m in {heavy!r} if m in sys.modules]
+sys.stderr.write('HEAVY=' + ','.join(loaded) + '\\n')
+"""
+
+COMMANDS = {
+    'add': ['add', '--symptoms', 'gas', '--severity', '2', '--notes', 'bench'],
+    'show': ['show', '--last', '7'],
+}
+
+def run_command(argv, home):
+    env = dict(os.environ, HOME=home, PYTHONPATH=REPO_ROOT)
+    code = PROBE.format(argv=argv, heavy=HEAVY_MODULES)
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-c', code], env=env, cwd=REPO_ROOT,
+                          capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"{argv[0]} failed:\n{proc.stderr}")
+    heavy = ''
+    for line in proc.stderr.splitlines():
+        if line.startswith('HEAVY='):
+            heavy = line[len('HEAVY='):]
+    return elapsed, [m for m in heavy.split(',') if m]
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark for add/show")
+    parser.add_argument('--runs', type=int, default=10, help='Runs per command')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    results = {}
+    failed = False
+    for name, argv in COMMANDS.items():
+        timings = []
+        heavy_seen = set()
+        for _ in range(args.runs):
+            # Fresh HOME per run so `add` never hits the already-logged check
+            with tempfile.TemporaryDirectory() as home:
+                elapsed, heavy = run_command(argv, home)
+            timings.append(elapsed)
+            heavy_seen.update(heavy)
+        results[name] = {
+            'runs': args.runs,
+            'median_s': statistics.median(timings),
+            'min_s': min(timings),
+            'max_s': max(timings),
+            'heavy_imports': sorted(heavy_seen),
+        }
+        if heavy_seen:
+            failed = True
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, r in results.items():
+            status = 'OK' if not r['heavy_imports'] else f"FAIL (imported {', '.join(r['heavy_imports'])})"
+            print(f"{name:6s} median {r['median_s']*1000:7.1f} ms  min {r['min_s']*1000:7.1f} ms  {status}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
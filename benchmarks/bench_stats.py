@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Trend rollups: incremental vs rebuilt, checked against a plain recomputation,
+and query latency over long histories.
+
+Appends a synthetic history one entry at a time (as `add`/`triage` do),
+checks the incrementally maintained rollup files are byte-identical to a
+rebuild from the raw log, checks weekly/monthly trends against a pure-Python
+recomputation, and times the `stats` queries.
+
+    python -m benchmarks.bench_stats --days 3650
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+from datetime import date, timedelta
+from claisen_data.storage import open_storage
+from claisen_data.rollups import Rollups, trends, summary, transitions
+
+SYMPTOMS = ['bloating', 'gas', 'heartburn']
+
+def synthetic_records(days, seed=0):
+    rng = random.Random(seed)
+    start = date.today() - timedelta(days=days)
+    for i in range(days):
+        day = start + timedelta(days=i)
+        if rng.random() < 0.1:
+            continue
+        yield {'date': str(day), 'notes': '',
+               'symptoms': [{'name': s, 'severity': rng.randint(1, 5)} for s in rng.sample(SYMPTOMS, rng.randint(0, 3))]}
+        if rng.random() < 0.05:
+            yield {'date': str(day), 'triage_answers': {}, 'profile': rng.randint(1, 5), 'notes': ''}
+
+def reference_trends(records, period):
+    """Per-symptom mean/max of each day's worst severity, grouped with plain dicts."""
+    worst = {}
+    for r in records:
+        for s in r.get('symptoms', []):
+            key = (r['date'], s['name'])
+            worst[key] = max(worst.get(key, 0), s['severity'])
+    groups = {}
+    for (day, name), sev in worst.items():
+        d = date.fromisoformat(day)
+        label = str(d - timedelta(days=d.weekday())) if period == 'week' else day[:7]
+        groups.setdefault(label, {}).setdefault(name, []).append(sev)
+    out = {'periods': sorted(groups)}
+    for name in SYMPTOMS:
+        values = [groups[p].get(name, []) for p in out['periods']]
+        out[name] = {'mean': [round(sum(v) / len(v), 2) if v else None for v in values],
+                     'max': [max(v) if v else 0 for v in values],
+                     'days': [len(v) for v in values]}
+    return out
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def main():
+    parser = argparse.ArgumentParser(description="Trend rollup correctness and query latency")
+    parser.add_argument('--days', type=int, default=3650)
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    records = list(synthetic_records(args.days))
+    results = {'days': args.days, 'entries': len(records)}
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = open_storage(os.path.join(tmp, 'data.db'), 'jsonl')
+        rollups = Rollups(storage.path, SYMPTOMS)
+        start = time.perf_counter()
+        for record in records:
+            storage.append(record)
+            rollups.sync(storage)
+        results['append_and_update_ms'] = (time.perf_counter() - start) * 1000 / len(records)
+        incremental = (read(rollups.path), read(rollups.transitions_path))
+        start = time.perf_counter()
+        os.remove(rollups.path)
+        rollups.sync(storage)
+        results['rebuild_ms'] = (time.perf_counter() - start) * 1000
+        results['identical_after_rebuild'] = incremental == (read(rollups.path), read(rollups.transitions_path))
+        results['trends_match'] = all(trends(rollups, p) == reference_trends(records, p) for p in ('week', 'month'))
+        for name, query in (('weekly_trends', lambda: trends(rollups, 'week')),
+                            ('monthly_trends', lambda: trends(rollups, 'month')),
+                            ('summary', lambda: summary(rollups)),
+                            ('transitions', lambda: transitions(rollups))):
+            best = float('inf')
+            for _ in range(5):
+                start = time.perf_counter()
+                query()
+                best = min(best, time.perf_counter() - start)
+            results[f'{name}_ms'] = best * 1000
+
+    ok = results['identical_after_rebuild'] and results['trends_match']
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{results['entries']} entries over {args.days} days")
+        print(f"append + rollup update  {results['append_and_update_ms']:.3f} ms/entry")
+        print(f"full rebuild            {results['rebuild_ms']:.1f} ms")
+        for name in ('weekly_trends', 'monthly_trends', 'summary', 'transitions'):
+            print(f"{name:23s} {results[name + '_ms']:.2f} ms")
+        print(f"incremental == rebuild: {results['identical_after_rebuild']}, trends == reference: {results['trends_match']}")
+    sys.exit(0 if ok else 1)
+
+if __name__ == '__main__':
+    main()
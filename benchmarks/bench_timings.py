@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Stage timing instrumentation: cost with timing off and on.
+
+Times a bare `with span(...)` block with timing disabled and enabled, then
+assign_profile over distinct notes (so every call runs extraction) with
+timing off and on, and checks the results are identical either way.
+
+    python -m benchmarks.bench_timings --notes 20000
+"""
+import sys
+import json
+import time
+import random
+import argparse
+from claisen_data import timings
+from claisen_data.timings import TIMINGS, span
+from claisen_data.triage_engine import assign_profile, get_nlp, get_urgency_model, EXTRACTION_CACHE
+from claisen_data.triage_questions import TRIAGE_QUESTIONS
+
+WORDS = ["mild", "severe", "burning", "pain", "gas", "bloating", "heartburn", "at", "night", "after",
+         "eating", "stress", "coping", "fine", "nausea", "worse", "lying", "down", "today", "better"]
+
+def span_cost(n):
+    start = time.perf_counter()
+    for _ in range(n):
+        with span('bench'):
+            pass
+    return (time.perf_counter() - start) / n
+
+def run(answers, notes):
+    EXTRACTION_CACHE.clear()
+    start = time.perf_counter()
+    results = [assign_profile(answers, note) for note in notes]
+    return time.perf_counter() - start, results
+
+def main():
+    parser = argparse.ArgumentParser(description="Timing instrumentation overhead benchmark")
+    parser.add_argument('--notes', type=int, default=20000)
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    notes = [' '.join(rng.choices(WORDS, k=rng.randint(3, 12))) + f' {i}' for i in range(args.notes)]
+    answers = {q['id']: q['options'][-1] for q in TRIAGE_QUESTIONS if q['type'] == 'choice'}
+    get_nlp()
+    get_urgency_model()
+
+    results = {'span_off_ns': span_cost(200000) * 1e9}
+    run(answers, notes[:2000])  # warm up
+    off_s, off = run(answers, notes)
+    timings.enable()
+    results['span_on_ns'] = span_cost(200000) * 1e9
+    TIMINGS.stages.clear()
+    on_s, on = run(answers, notes)
+    results.update({
+        'notes': args.notes,
+        'off_notes_per_sec': args.notes / off_s,
+        'on_notes_per_sec': args.notes / on_s,
+        'on_overhead_pct': (on_s / off_s - 1) * 100,
+        'same_results': off == on,
+        'stages': {name: {k: d[k] for k in ('count', 'p50_ms', 'p95_ms', 'p99_ms')} for name, d in TIMINGS.snapshot().items()},
+    })
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"span: {results['span_off_ns']:6.0f} ns off   {results['span_on_ns']:6.0f} ns on")
+        print(f"assign_profile over {args.notes} notes: off {results['off_notes_per_sec']:8.0f}/s   "
+              f"on {results['on_notes_per_sec']:8.0f}/s ({results['on_overhead_pct']:+.1f}%)   "
+              f"{'same results' if results['same_results'] else 'RESULTS DIFFER'}")
+        for name, d in results['stages'].items():
+            print(f"  {name:20s} {d['count']:7d} calls  p50 {d['p50_ms']:8.4f} ms  p95 {d['p95_ms']:8.4f} ms  p99 {d['p99_ms']:8.4f} ms")
+    sys.exit(0 if results['same_results'] else 1)
+
+if __name__ == '__main__':
+    main()
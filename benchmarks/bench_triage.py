@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Single-patient triage latency, cold and warm.
+
+Cold: non-interactive `claisen_log.py triage --no-daemon` in a fresh
+interpreter (imports, model loading, extraction, rules and the log append).
+Warm: assign_profile() in one process over distinct synthetic patients, so
+every call runs extraction; reports p50/p99 per call and calls/sec.
+
+    python -m benchmarks.bench_triage --runs 10 --patients 5000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import statistics
+from claisen_data.triage_engine import assign_profile, get_nlp, get_urgency_model
+from benchmarks.synthetic import triage_records
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def cold_run(home, record):
+    argv = [sys.executable, os.path.join(REPO_ROOT, 'claisen_log.py'), 'triage', '--no-daemon',
+            '--answers', json.dumps(record['answers']), '--notes', record['notes']]
+    env = dict(os.environ, CLAISEN_HOME=home, PYTHONPATH=REPO_ROOT)
+    start = time.perf_counter()
+    proc = subprocess.run(argv, env=env, capture_output=True, text=True, stdin=subprocess.DEVNULL)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0 or 'Triage result saved' not in proc.stdout:
+        raise RuntimeError(f"triage failed:\n{proc.stdout}\n{proc.stderr}")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Single triage latency benchmark")
+    parser.add_argument('--runs', type=int, default=10, help='Cold CLI runs')
+    parser.add_argument('--patients', type=int, default=5000, help='Warm in-process assign_profile calls')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    # The walker prompts for every question not answered, follow-up ones included
+    records = triage_records(max(args.runs, args.patients), seed=1, followup_rate=1.0)
+    cold = []
+    for record in records[:args.runs]:
+        with tempfile.TemporaryDirectory() as home:
+            cold.append(cold_run(home, record))
+
+    get_nlp()
+    get_urgency_model()
+    latencies = []
+    for record in records[:args.patients]:
+        start = time.perf_counter()
+        assign_profile(record['answers'], notes=record['notes'])
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    results = {
+        'cold_median_s': statistics.median(cold),
+        'cold_min_s': min(cold),
+        'warm_p50_ms': latencies[len(latencies) // 2] * 1000,
+        'warm_p99_ms': latencies[int(len(latencies) * 0.99)] * 1000,
+        'warm_per_sec': len(latencies) / sum(latencies),
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"cold CLI triage: median {results['cold_median_s'] * 1000:7.1f} ms  min {results['cold_min_s'] * 1000:7.1f} ms")
+        print(f"warm assign_profile: p50 {results['warm_p50_ms']:.3f} ms  p99 {results['warm_p99_ms']:.3f} ms  "
+              f"{results['warm_per_sec']:8.0f}/s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Urgency classifier: bulk scoring throughput and single-call latency.
+
+Scores the same synthetic notes four ways: urgency_predict() once per note
+(the per-text NumPy path), urgency_predict_many(), urgency_scores() with
+the sparse-matrix NumPy fast path, and urgency_scores(fast=False) through
+the fitted TfidfVectorizer.transform() and LogisticRegression.predict_proba().
+The urgent flags must all agree with urgency_predict, and the fast-path
+probabilities must match predict_proba to within --tolerance. Single-call
+latency is urgency_predict() vs urgency_scores() on one note.
+
+The classifier is the built-in one fitted in this process (a saved artifact
+has no scikit-learn objects to compare against).
+
+    python -m benchmarks.bench_urgency --notes 20000 --batch-sizes 256,1024,4096
+"""
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from benchmarks.synthetic import sample_note
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk urgency scoring benchmark")
+    parser.add_argument('--notes', type=int, default=20000, help='Synthetic notes to score')
+    parser.add_argument('--batch-sizes', default='256,1024,4096', help='Comma-separated urgency_scores chunk sizes')
+    parser.add_argument('--latency-runs', type=int, default=2000, help='Single-note calls timed per method')
+    parser.add_argument('--tolerance', type=float, default=1e-9, help='Largest allowed probability difference')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as empty:
+        os.environ['CLAISEN_URGENCY_MODEL'] = empty
+        from claisen_data.triage_engine import urgency_predict, urgency_predict_many, urgency_scores, get_urgency_model
+        get_urgency_model()
+    rng = random.Random(0)
+    notes = [sample_note(rng, urgent_rate=0.3) for _ in range(args.notes)]
+
+    per_note_s, expected = timed(lambda: [urgency_predict(n) for n in notes])
+    many_s, many = timed(lambda: urgency_predict_many(notes))
+    sklearn_s, reference = timed(lambda: list(urgency_scores(notes, fast=False)))
+    batches = []
+    for size in (int(b) for b in args.batch_sizes.split(',')):
+        seconds, scores = timed(lambda: list(urgency_scores(notes, batch_size=size)))
+        batches.append({'size': size, 'notes_per_sec': len(notes) / seconds,
+                        'mismatches': sum(u != e for (_, u), e in zip(scores, expected)),
+                        'max_proba_diff': max(abs(p - r) for (p, _), (r, _) in zip(scores, reference))})
+    mismatches = (sum(m != e for m, e in zip(many, expected))
+                  + sum(u != e for (_, u), e in zip(reference, expected))
+                  + sum(b['mismatches'] for b in batches)
+                  + sum(b['max_proba_diff'] > args.tolerance for b in batches))
+
+    def latency(fn):
+        samples = []
+        for note in notes[:args.latency_runs]:
+            start = time.perf_counter()
+            fn(note)
+            samples.append(time.perf_counter() - start)
+        return statistics.median(samples) * 1e6
+
+    results = {
+        'notes': len(notes),
+        'urgent': sum(expected),
+        'notes_per_sec': {'per_note': len(notes) / per_note_s, 'predict_many': len(notes) / many_s,
+                          'sklearn_proba': len(notes) / sklearn_s},
+        'batches': batches,
+        'single_call_us': {'urgency_predict': latency(urgency_predict),
+                           'urgency_scores': latency(lambda n: list(urgency_scores([n])))},
+        'mismatches': mismatches,
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{results['notes']} notes ({results['urgent']} urgent)")
+        for name, rate in results['notes_per_sec'].items():
+            print(f"  {name:<16} {rate:10.0f} notes/s")
+        for b in batches:
+            print(f"  urgency_scores batch {b['size']:>5} {b['notes_per_sec']:10.0f} notes/s  "
+                  f"max |p - predict_proba| {b['max_proba_diff']:.1e}")
+        lat = results['single_call_us']
+        print(f"single call: urgency_predict {lat['urgency_predict']:.1f} us  urgency_scores {lat['urgency_scores']:.1f} us")
+        print(f"{mismatches} mismatches")
+    if mismatches:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
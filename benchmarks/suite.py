@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Run the benchmarks as one suite, save the results, flag regressions.
+
+Each benchmark runs in its own interpreter with --json. Its numeric results
+are flattened into metrics named like `cli.100000.median_s.add` or
+`batch_workers.4.records_per_sec`; a metric's name says which way is better
+(`*_per_sec` higher; `*_s`, `*_ms`, `*_mb` lower). Boolean results and
+`mismatches` counts are correctness checks that must stay true / zero. A
+benchmark that exits non-zero (its own equivalence checks failed) fails the
+suite.
+
+    python -m benchmarks.suite --out results.json
+    python -m benchmarks.suite --quick --baseline results.json --tolerance 0.15
+    python -m benchmarks.suite --compare old.json new.json
+
+Results file: {"format", "meta": {created, git_commit, python, platform, cpus,
+profile}, "benchmarks": {name: {args, ok, seconds, raw}}, "metrics":
+{name: {"value", "better"}}}. --baseline (or --compare) exits 1 if any
+metric got worse by more than --tolerance (a fraction) or any check failed.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+from datetime import datetime
+from typing import Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_FORMAT = 1
+DEFAULT_TOLERANCE = 0.15
+
+# name: (full arguments, --quick arguments)
+SUITE = {
+    'startup': (['--runs', '10'], ['--runs', '3']),
+    'triage': (['--runs', '5', '--patients', '5000'], ['--runs', '2', '--patients', '1000']),
+    'batch_workers': (['--records', '5000'], ['--records', '1000', '--workers', '1', '2']),
+    'cli': (['--sizes', '1000,100000,1000000'], ['--sizes', '1000,100000', '--runs', '1']),
+    'profile_rules': (['--samples', '50000'], ['--samples', '5000']),
+    'keywords': (['--notes', '20000'], ['--notes', '2000']),
+    'show': (['--sizes', '1000,10000,100000'], ['--sizes', '1000,10000']),
+    'export': (['--days', '3650'], ['--days', '730', '--formats', 'csv,jsonl']),
+    'stats': (['--days', '3650'], ['--days', '730']),
+    'import': (['--rows', '500000'], ['--rows', '50000']),
+    'logframe': (['--entries', '200000'], ['--entries', '20000']),
+    'question_graph': (['--patients', '20000'], ['--patients', '2000']),
+    'followup': (['--sizes', '1000,100000'], ['--sizes', '1000,10000', '--patients', '1000']),
+    'compact': (['--entries', '100000'], ['--entries', '10000']),
+    'urgency': (['--notes', '20000'], ['--notes', '5000', '--latency-runs', '500']),
+    'nlp_modes': (['--notes', '5000'], ['--notes', '1000', '--n-process', '1']),
+    'retriage': (['--sizes', '10000,100000'], ['--sizes', '5000,20000']),
+    'concurrent_writes': (['--writers', '16', '--records', '200'], ['--writers', '4', '--records', '50']),
+    'daemon': (['--runs', '10'], ['--runs', '3', '--clients', '4', '--requests', '100']),
+    'shards': (['--patients', '200'], ['--patients', '50', '--days', '90', '--workers', '2']),
+    'timings': (['--notes', '20000'], ['--notes', '2000']),
+}
+# Fields that identify an item in a list of results, used in place of its position
+LIST_KEYS = ('workers', 'entries', 'backend', 'size', 'format', 'mode', 'n_process')
+# Benchmarks whose nested results are bare durations in seconds
+BARE_SECONDS = ('show', 'export')
+
+def direction(name: str) -> Optional[str]:
+    """'higher' or 'lower' is better, 'zero' for mismatch counts, None for informational values."""
+    parts = name.split('.')
+    leaf, parent = parts[-1], parts[-2] if len(parts) > 2 else ''
+    if leaf == 'mismatches':
+        return 'zero'
+    if 'per_sec' in leaf or 'per_sec' in parent:
+        return 'higher'
+    if leaf.endswith(('_s', '_ms', '_us', '_ns', '_mb')) or leaf == 'seconds' or parent.endswith(('_s', '_ms')):
+        return 'lower'
+    if parts[0] in BARE_SECONDS and len(parts) > 2:
+        return 'lower'
+    return None
+
+def flatten(value, prefix: str, out: Dict):
+    if isinstance(value, dict):
+        for k, v in value.items():
+            flatten(v, f"{prefix}.{k}", out)
+    elif isinstance(value, list):
+        for i, v in enumerate(value):
+            label = next((str(v[k]) for k in LIST_KEYS if isinstance(v, dict) and k in v), str(i))
+            flatten(v, f"{prefix}.{label}", out)
+    elif isinstance(value, bool):
+        out[prefix] = {'value': value, 'better': 'true'}
+    elif isinstance(value, (int, float)):
+        better = direction(prefix)
+        if better is not None:
+            out[prefix] = {'value': value, 'better': better}
+
+def run_benchmark(name: str, args: List[str]) -> Dict:
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-m', f'benchmarks.bench_{name}', '--json'] + args,
+                          cwd=REPO_ROOT, capture_output=True, text=True,
+                          env=dict(os.environ, PYTHONPATH=REPO_ROOT))
+    seconds = time.perf_counter() - start
+    try:
+        raw = json.loads(proc.stdout)
+    except ValueError:
+        raw = None
+    return {'args': args, 'ok': proc.returncode == 0 and raw is not None, 'seconds': seconds, 'raw': raw,
+            'error': None if proc.returncode == 0 else proc.stderr[-2000:]}
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_suite(names: List[str], quick: bool) -> Dict:
+    results = {
+        'format': RESULTS_FORMAT,
+        'meta': {'created': datetime.now().isoformat(timespec='seconds'), 'git_commit': git_commit(),
+                 'python': platform.python_version(), 'platform': platform.platform(),
+                 'cpus': os.cpu_count(), 'profile': 'quick' if quick else 'full'},
+        'benchmarks': {},
+        'metrics': {},
+    }
+    for name in names:
+        print(f"running {name}...", file=sys.stderr, flush=True)
+        bench = run_benchmark(name, SUITE[name][1 if quick else 0])
+        results['benchmarks'][name] = bench
+        if bench['raw'] is not None:
+            flatten(bench['raw'], name, results['metrics'])
+    return results
+
+def compare(old: Dict, new: Dict, tolerance: float) -> List[Dict]:
+    """One row per metric in both runs, with its relative change and status."""
+    profiles = old.get('meta', {}).get('profile'), new.get('meta', {}).get('profile')
+    if profiles[0] != profiles[1]:
+        print(f"warning: comparing a {profiles[1]} run against a {profiles[0]} baseline", file=sys.stderr)
+    rows = []
+    for name, m in new['metrics'].items():
+        base = old['metrics'].get(name)
+        if base is None or base['better'] != m['better']:
+            continue
+        if m['better'] in ('true', 'zero'):
+            passed = m['value'] is True if m['better'] == 'true' else m['value'] == 0
+            status = 'ok' if passed else 'FAILED'
+            rows.append({'metric': name, 'old': base['value'], 'new': m['value'], 'change': None, 'status': status})
+            continue
+        if not base['value']:
+            continue
+        change = (m['value'] - base['value']) / base['value']
+        worse = change > tolerance if m['better'] == 'lower' else change < -tolerance
+        better = change < -tolerance if m['better'] == 'lower' else change > tolerance
+        rows.append({'metric': name, 'old': base['value'], 'new': m['value'], 'change': change,
+                     'status': 'REGRESSION' if worse else 'improved' if better else 'ok'})
+    return rows
+
+def print_comparison(rows: List[Dict], verbose: bool):
+    for r in rows:
+        if r['status'] == 'ok' and not verbose:
+            continue
+        change = '' if r['change'] is None else f"{r['change'] * 100:+7.1f}%"
+        old, new = (v if isinstance(v, bool) else f"{v:.6g}" for v in (r['old'], r['new']))
+        print(f"{r['status']:10s} {r['metric']:60s} {old:>12} -> {new:<12} {change}")
+    counts = {s: sum(r['status'] == s for r in rows) for s in ('REGRESSION', 'FAILED', 'improved', 'ok')}
+    print(f"{len(rows)} metrics compared: " + ', '.join(f"{n} {s}" for s, n in counts.items()))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite with regression gating")
+    parser.add_argument('--only', help=f"Comma-separated benchmarks to run (default: all of {', '.join(SUITE)})")
+    parser.add_argument('--quick', action='store_true', help='Smaller inputs, for a fast check')
+    parser.add_argument('--out', help='Write the results JSON here')
+    parser.add_argument('--baseline', help='Results JSON to compare this run against')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='Compare two saved results files without running anything')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='Allowed relative slowdown before a metric counts as a regression')
+    parser.add_argument('--verbose', action='store_true', help='List unchanged metrics too')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            old = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+        rows = compare(old, new, args.tolerance)
+        print_comparison(rows, args.verbose)
+        sys.exit(1 if any(r['status'] in ('REGRESSION', 'FAILED') for r in rows) else 0)
+
+    names = args.only.split(',') if args.only else list(SUITE)
+    unknown = [n for n in names if n not in SUITE]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+    results = run_suite(names, args.quick)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+    failed = [n for n, b in results['benchmarks'].items() if not b['ok']]
+    for name, b in results['benchmarks'].items():
+        print(f"{name:15s} {'ok' if b['ok'] else 'FAILED':6s} {b['seconds']:7.1f} s")
+        if b['error']:
+            print(b['error'], file=sys.stderr)
+    regressed = False
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(baseline, results, args.tolerance)
+        print_comparison(rows, args.verbose)
+        regressed = any(r['status'] in ('REGRESSION', 'FAILED') for r in rows)
+    sys.exit(1 if failed or regressed else 0)
+
+if __name__ == '__main__':
+    main()
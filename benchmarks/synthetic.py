@@ -0,0 +1,103 @@
+"""
+Synthetic patients for the benchmarks.
+
+Triage answer sets are sampled from the valid options in TRIAGE_QUESTIONS,
+walking the questions in order and honouring `ask_if` branching the way the
+CLI does. Notes are built from the EntityRuler vocabulary plus the severity,
+trigger and timing keywords, with an occasional urgent sentence. Logs are
+multi-year histories of daily symptom entries with periodic triage records
+(scored by the real rules, with keyword-only NLP findings), ending yesterday
+so `add` still has today free. Everything is seeded.
+"""
+import random
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional
+from claisen_data.triage_questions import TRIAGE_QUESTIONS
+from claisen_data.question_graph import QUESTION_GRAPH
+from claisen_data.triage_engine import PATTERNS, URGENCY_EXAMPLES, URGENCY_LABELS, assign_profile_from_findings
+from claisen_data.keyword_matcher import SEVERITY_KEYWORDS, TIMING_KEYWORDS, keyword_findings
+from claisen_data.triage_rules import ALARM_KEYS, ALARM_PREFIXES
+from claisen_data.validation import SYMPTOMS
+
+NAMES = ["Alex", "Sam", "Jordan", "Priya", "Chen", "Fatima", "Olu", "Maria"]
+FILLERS = ["today", "again", "worse", "a bit", "since monday", "after dinner", "all day", "on and off"]
+URGENT_SENTENCES = [t for t, label in zip(URGENCY_EXAMPLES, URGENCY_LABELS) if label]
+# The date index starts at 1970, so very long histories get several entries per day
+MAX_DAYS = 15000
+
+def sample_answers(rng: random.Random, followup: bool = False, alarm_rate: float = 0.01) -> Dict:
+    """
+    A complete answer set: every question the walker would ask, with a valid
+    answer. Each alarm question is answered positively with alarm_rate, so
+    most patients land on profiles 1-4 rather than 5.
+    """
+    answers = {}
+    for q in TRIAGE_QUESTIONS:
+        if q['id'].startswith('followup_') and not followup:
+            continue
+        if not QUESTION_GRAPH[q['id']].applies(answers):
+            continue
+        if q['type'] == 'choice' and q['id'] in ALARM_KEYS and rng.random() >= alarm_rate:
+            answers[q['id']] = rng.choice([o for o in q['options'] if not o.startswith(ALARM_PREFIXES)])
+        elif q['type'] == 'choice':
+            answers[q['id']] = rng.choice(q['options'])
+        elif q['type'] == 'multi_choice':
+            # Typed as free text by the walker; a comma-separated selection
+            answers[q['id']] = ', '.join(rng.sample(q['options'], rng.randint(1, 3)))
+        elif q['type'] == 'int':
+            answers[q['id']] = rng.randint(18, 90)
+        else:
+            answers[q['id']] = rng.choice(NAMES)
+    return answers
+
+def sample_note(rng: random.Random, urgent_rate: float = 0.05) -> str:
+    if rng.random() < urgent_rate:
+        return rng.choice(URGENT_SENTENCES)
+    words = [p['pattern'] for p in rng.sample(PATTERNS, rng.randint(1, 4))]
+    words.append(rng.choice(rng.choice(SEVERITY_KEYWORDS)[1]))
+    if rng.random() < 0.5:
+        words.append(rng.choice(TIMING_KEYWORDS))
+    words.append(rng.choice(FILLERS))
+    rng.shuffle(words)
+    return ' '.join(words)
+
+def triage_records(n: int, seed: int = 0, followup_rate: float = 0.2) -> List[Dict]:
+    """Batch triage input: {"id", "answers", "notes"} records."""
+    rng = random.Random(seed)
+    return [{'id': i, 'answers': sample_answers(rng, followup=rng.random() < followup_rate), 'notes': sample_note(rng)}
+            for i in range(n)]
+
+def log_entries(n: int, seed: int = 0, triage_every: int = 30, end: Optional[date] = None) -> Iterator[Dict]:
+    """
+    n log entries in date order ending the day before `end` (default today):
+    daily symptom entries, plus a triage record every triage_every days.
+    """
+    rng = random.Random(seed)
+    per_day = -(-n // MAX_DAYS)
+    days = -(-n // per_day)
+    start = (end or date.today()) - timedelta(days=days)
+    for i in range(n):
+        day = i // per_day
+        d = str(start + timedelta(days=day))
+        if triage_every and day % triage_every == triage_every - 1 and i % per_day == 0:
+            followup = rng.choice([None, 7, 14, 28])
+            answers = sample_answers(rng, followup=followup is not None)
+            notes = sample_note(rng)
+            result = assign_profile_from_findings(answers, keyword_findings(notes))
+            yield {'date': d, 'triage_answers': answers, 'profile': result['profile'],
+                   'profile_reason': result['reason'], 'recommendation': result['recommendation'],
+                   'nlp_extracted': result['nlp_extracted'], 'followup_day': followup, 'notes': notes}
+            continue
+        yield {'date': d, 'notes': sample_note(rng, urgent_rate=0),
+               'symptoms': [{'name': s, 'severity': rng.randint(1, 5)} for s in rng.sample(SYMPTOMS, rng.randint(0, 3))]}
+
+def write_log(storage, n: int, seed: int = 0, chunk: int = 50000, **kwargs):
+    """Write log_entries(n) to storage in chunks, so even 1M entries stay in bounded memory."""
+    batch = []
+    for entry in log_entries(n, seed, **kwargs):
+        batch.append(entry)
+        if len(batch) >= chunk:
+            storage.append_many(batch)
+            batch = []
+    if batch:
+        storage.append_many(batch)
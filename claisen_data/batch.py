@@ -0,0 +1,128 @@
+# Batch triage: score many answer sets and notes from a JSON Lines file
+# Input lines look like {"id": ..., "answers": {...}, "notes": "..."}; stored log
+# entries (with "triage_answers") are accepted too. Each output line carries the
+# input id (or line number) plus profile, reason, recommendation and nlp_extracted.
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, TextIO
+from .triage_engine import extract_many, assign_profile_from_findings, get_nlp, get_urgency_model, EXTRACTION_CACHE
+from .timings import TIMINGS, span
+from .question_graph import QUESTION_GRAPH
+
+DEFAULT_BATCH_SIZE = 256
+
+def read_records(f: TextIO) -> Iterator[Dict]:
+    """Yield one dict per non-blank input line; unparsable lines become error records."""
+    for lineno, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("expected a JSON object")
+        except ValueError as e:
+            yield {'line': lineno, 'error': f"Invalid JSON: {e}"}
+            continue
+        record.setdefault('line', lineno)
+        yield record
+
+def _answers_of(record: Dict) -> Dict:
+    answers = record.get('answers', record.get('triage_answers'))
+    return answers if isinstance(answers, dict) else {}
+
+def _checked(record: Dict) -> Dict:
+    """The record with its answers validated and normalized, or an error record."""
+    if 'error' in record:
+        return record
+    answers, problems = QUESTION_GRAPH.validate(_answers_of(record))
+    if problems:
+        return {**record, 'error': 'Invalid answers: ' + '; '.join(problems)}
+    return {**record, 'answers': answers}
+
+def score_chunk(chunk: List[Dict], batch_size: int = DEFAULT_BATCH_SIZE) -> List[Dict]:
+    """Triage a list of input records, running NLP over all their notes at once."""
+    chunk = [_checked(r) for r in chunk]
+    notes = ['' if 'error' in r else (r.get('notes') or '') for r in chunk]
+    results = []
+    for record, findings in zip(chunk, extract_many(notes, batch_size=batch_size)):
+        key = {'id': record['id']} if 'id' in record else {'line': record.get('line')}
+        if 'error' in record:
+            results.append({**key, 'error': record['error']})
+            continue
+        results.append({**key, **assign_profile_from_findings(record['answers'], findings)})
+    return results
+
+def chunked(records: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    it = iter(records)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _init_worker():
+    # Build the NLP pipeline and classifier once per worker process
+    get_nlp()
+    get_urgency_model()
+
+def _score_chunk_in_worker(chunk: List[Dict], batch_size: int):
+    # Hand the worker's cache counters and timings back so --stats and
+    # --profile-timings cover the whole run
+    before = dict(EXTRACTION_CACHE.stats)
+    with span('batch.chunk'):
+        results = score_chunk(chunk, batch_size)
+    delta = {k: v - before.get(k, 0) for k, v in EXTRACTION_CACHE.stats.items()}
+    return results, delta, TIMINGS.drain()
+
+def score_chunks(chunks: Iterable[List[Dict]], batch_size: int = DEFAULT_BATCH_SIZE, workers: int = 1) -> Iterator[List[Dict]]:
+    """
+    Score chunks of records, yielding one result list per chunk in input order.
+    With workers > 1 the chunks are spread over a process pool; at most
+    2 * workers chunks are in flight, so memory stays bounded however long
+    the input is.
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            with span('batch.chunk'):
+                results = score_chunk(chunk, batch_size)
+            yield results
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_score_chunk_in_worker, chunk, batch_size))
+            if len(pending) >= 2 * workers:
+                yield _collect(pending.popleft())
+        while pending:
+            yield _collect(pending.popleft())
+
+def _collect(future) -> List[Dict]:
+    results, stats, timings = future.result()
+    EXTRACTION_CACHE.add_stats(stats)
+    TIMINGS.merge(timings)
+    return results
+
+def triage_batch(records: Iterable[Dict], batch_size: int = DEFAULT_BATCH_SIZE, workers: int = 1) -> Iterator[Dict]:
+    """
+    Stream triage results for records, in input order. Only a bounded number
+    of chunks of batch_size records is held in memory at a time.
+    """
+    for results in score_chunks(chunked(records, batch_size), batch_size, workers):
+        yield from results
+
+def run_batch(in_path: str, out_path: str, batch_size: int = DEFAULT_BATCH_SIZE, workers: int = 1) -> Dict:
+    """
+    Triage every record in in_path and write results to out_path as JSON Lines.
+    Output is flushed after each chunk. Returns counts of scored and failed records.
+    """
+    counts = {'scored': 0, 'errors': 0}
+    with open(in_path, 'r') as fin, open(out_path, 'w') as fout:
+        for results in score_chunks(chunked(read_records(fin), batch_size), batch_size, workers):
+            for result in results:
+                fout.write(json.dumps(result) + '\n')
+                counts['errors' if 'error' in result else 'scored'] += 1
+            fout.flush()
+    return counts
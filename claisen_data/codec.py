@@ -0,0 +1,301 @@
+# Compact encoding of triage entries in the JSON Lines log
+# A triage entry stores ~60 answers as full option strings plus a long
+# recommendation, most of it the same text on every entry. When a record is
+# written, the JSON Lines backend packs those two fields against a schema:
+#
+#   "triage_answers": [schema id, [value per question], extras?, key order?]
+#       choice -> option index, multi_choice list -> list of option indices,
+#       int/text/typed multi_choice -> as is, unanswered -> null (trailing nulls
+#       dropped). Answers that do not fit their question go in `extras`, and
+#       the key order is stored only if it differs from question order.
+#   "recommendation": [schema id, template index, note indices?, trailing text?]
+#       template = a rule's recommendation with its {notes} filled from that
+#       rule's notes; text assign_profile appends (NLP findings) trails it.
+#
+# The schema is TRIAGE_QUESTIONS (ids, types, options) plus every
+# recommendation template; its id is a hash of both. The log itself carries
+# every schema its records use: the first packed record written with a
+# schema the log does not have yet also holds the schema in "_schemas", so
+# a copy of the log alone still decodes after the question bank changes.
+# <log>.schemas caches the schemas and notes which ones the log carries; if
+# it is missing, readers find the carried schemas by scanning the log once.
+# Every packed record is decoded again before it is written and must come
+# back as the same JSON as the original record, or it is stored unpacked.
+# All other fields (date, profile, notes, ...) are stored as they are, so
+# readers that only want those can skip decoding (see expand=False in
+# JsonLinesStorage).
+import json
+import hashlib
+from typing import Dict, List, Optional
+from .triage_questions import TRIAGE_QUESTIONS
+from .triage_rules import PROFILE_RULES, ALARM_RULE, NLP_URGENT_RULE, NLP_NOCTURNAL_RULE
+
+SCHEMAS_SUFFIX = '.schemas'
+# Record field holding the schemas a packed record carries for its log
+SCHEMAS_KEY = '_schemas'
+RECOMMENDATION_TEMPLATES = [ALARM_RULE, NLP_URGENT_RULE, NLP_NOCTURNAL_RULE] + PROFILE_RULES
+_MISSING = object()
+
+def build_schema(questions: List[Dict] = TRIAGE_QUESTIONS, templates: List[Dict] = RECOMMENDATION_TEMPLATES) -> Dict:
+    return {
+        'questions': [[q['id'], q['type'], list(q.get('options', []))] for q in questions],
+        'templates': [[r['name'], r['recommendation'], [n['text'] for n in r.get('notes', [])]] for r in templates],
+    }
+
+def schema_id(schema: Dict) -> str:
+    payload = json.dumps(schema, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha1(payload).hexdigest()[:8]
+
+class Schema:
+    """One version of the question bank and templates, with the lookups packing needs."""
+    def __init__(self, data: Dict):
+        self.data = data
+        self.id = schema_id(data)
+        self.ids = [q[0] for q in data['questions']]
+        self.types = [q[1] for q in data['questions']]
+        self.options = [q[2] for q in data['questions']]
+        self.position = {qid: i for i, qid in enumerate(self.ids)}
+        self.option_index = [{o: i for i, o in enumerate(opts)} for opts in self.options]
+        # (head, tail, note texts, has a {notes} slot) per template
+        self.templates = []
+        for _, text, notes in data['templates']:
+            head, slot, tail = text.partition('{notes}')
+            self.templates.append((head, tail, notes, bool(slot)))
+
+    def _pack_value(self, pos: int, value):
+        kind = self.types[pos]
+        if kind == 'choice':
+            return self.option_index[pos].get(value, _MISSING) if isinstance(value, str) else _MISSING
+        if kind == 'int':
+            return value if isinstance(value, int) and not isinstance(value, bool) else _MISSING
+        if isinstance(value, str):
+            return value
+        if kind == 'multi_choice' and isinstance(value, list):
+            index = self.option_index[pos]
+            packed = [index.get(v) if isinstance(v, str) else None for v in value]
+            return _MISSING if None in packed else packed
+        return _MISSING
+
+    def pack_answers(self, answers: Dict) -> List:
+        values = [None] * len(self.ids)
+        extras = {}
+        for key, value in answers.items():
+            pos = self.position.get(key)
+            packed = _MISSING if pos is None else self._pack_value(pos, value)
+            if packed is _MISSING:
+                extras[key] = value
+            else:
+                values[pos] = packed
+        while values and values[-1] is None:
+            values.pop()
+        out = [self.id, values]
+        natural = [self.ids[i] for i, v in enumerate(values) if v is not None] + list(extras)
+        order = list(answers)
+        if order != natural:
+            out += [extras, order]
+        elif extras:
+            out.append(extras)
+        return out
+
+    def unpack_answers(self, packed: List) -> Dict:
+        answers = {}
+        for pos, value in enumerate(packed[1]):
+            if value is None:
+                continue
+            kind = self.types[pos]
+            if kind == 'choice':
+                value = self.options[pos][value]
+            elif kind == 'multi_choice' and isinstance(value, list):
+                value = [self.options[pos][i] for i in value]
+            answers[self.ids[pos]] = value
+        if len(packed) > 2:
+            answers.update(packed[2])
+        if len(packed) > 3:
+            answers = {key: answers[key] for key in packed[3]}
+        return answers
+
+    def pack_recommendation(self, text: str) -> Optional[List]:
+        """The shortest template + notes + trailing text that renders text, or None."""
+        best = None
+        for t, (head, tail, notes, slot) in enumerate(self.templates):
+            if not text.startswith(head):
+                continue
+            pos = len(head)
+            chosen = []
+            if slot:
+                for i, note in enumerate(notes):
+                    if text.startswith(note, pos):
+                        chosen.append(i)
+                        pos += len(note)
+                if not text.startswith(tail, pos):
+                    continue
+                pos += len(tail)
+            rest = text[pos:]
+            if best is None or len(rest) < len(best[2]):
+                best = (t, chosen, rest)
+        if best is None:
+            return None
+        t, chosen, rest = best
+        out = [self.id, t]
+        if chosen or rest:
+            out.append(chosen)
+        if rest:
+            out.append(rest)
+        return out
+
+    def unpack_recommendation(self, packed: List) -> str:
+        head, tail, notes, slot = self.templates[packed[1]]
+        chosen = packed[2] if len(packed) > 2 else []
+        text = head + (''.join(notes[i] for i in chosen) + tail if slot else '')
+        return text + (packed[3] if len(packed) > 3 else '')
+
+CURRENT_SCHEMA = Schema(build_schema())
+
+class Codec:
+    """
+    Packs and unpacks the records of one log, against the schemas it carries
+    (cached in <log>.schemas).
+    """
+    def __init__(self, log_path: str):
+        self.log_path = log_path
+        self.path = log_path + SCHEMAS_SUFFIX
+        self._schemas = None
+        self._in_log = set()
+        # Schemas read from the log itself, kept across reloads of the cache
+        self._found = {}
+        self._scanned = False
+
+    def schemas(self) -> Dict[str, Schema]:
+        if self._schemas is None:
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    stored = json.load(f)
+            except (OSError, ValueError):
+                stored = {}
+            # Older caches are a bare {id: schema} map and say nothing about the log
+            if 'schemas' in stored and 'in_log' in stored:
+                self._in_log = set(stored['in_log'])
+                stored = stored['schemas']
+            else:
+                self._in_log = set()
+            self._schemas = {sid: Schema(data) for sid, data in stored.items()}
+            for sid, schema in self._found.items():
+                self._schemas.setdefault(sid, schema)
+        return self._schemas
+
+    def schema(self, sid: str) -> Schema:
+        if sid == CURRENT_SCHEMA.id:
+            return CURRENT_SCHEMA
+        schema = self.schemas().get(sid)
+        if schema is None:
+            # Written by another process since we loaded the file
+            self._schemas = None
+            schema = self.schemas().get(sid)
+        if schema is None and not self._scanned:
+            # No usable cache (e.g. the log was copied without it): read the schemas the log carries
+            self._scanned = True
+            self._scan_log()
+            schema = self.schemas().get(sid)
+        if schema is None:
+            raise ValueError(f"Log entry uses answer schema {sid}, which {self.log_path} does not carry")
+        return schema
+
+    def _scan_log(self):
+        marker = json.dumps(SCHEMAS_KEY).encode('utf-8')
+        try:
+            with open(self.log_path, 'rb') as f:
+                for line in f:
+                    if marker in line:
+                        try:
+                            self._register(json.loads(line).get(SCHEMAS_KEY))
+                        except (ValueError, AttributeError):
+                            continue
+        except OSError:
+            pass
+
+    def _register(self, carried) -> None:
+        for data in carried if isinstance(carried, list) else []:
+            try:
+                schema = Schema(data)
+            except (LookupError, TypeError, ValueError):
+                continue
+            self._found.setdefault(schema.id, schema)
+            self.schemas().setdefault(schema.id, schema)
+
+    def in_log(self) -> set:
+        """Ids of the schemas the log is known to carry (a copy)."""
+        self._schemas = None
+        self.schemas()
+        return set(self._in_log)
+
+    def ensure_current(self, write):
+        """Record the current schema in <log>.schemas if it is not there yet (call under the log's write lock)."""
+        self._schemas = None
+        if CURRENT_SCHEMA.id in self.schemas():
+            return
+        self.schemas()[CURRENT_SCHEMA.id] = CURRENT_SCHEMA
+        self._save(write)
+
+    def carry(self, in_log: set) -> List[Dict]:
+        """
+        The schemas (current one first) a file carrying only in_log is
+        missing, for the first packed record written to it; their ids are
+        added to in_log.
+        """
+        missing = [CURRENT_SCHEMA] + [s for sid, s in self.schemas().items() if sid != CURRENT_SCHEMA.id]
+        missing = [s for s in missing if s.id not in in_log]
+        in_log.update(s.id for s in missing)
+        return [s.data for s in missing]
+
+    def set_in_log(self, in_log: set, write):
+        """Note in <log>.schemas which schemas the log now carries (call under the write lock, after writing the log)."""
+        self.schemas()
+        if in_log != self._in_log:
+            self._in_log = set(in_log)
+            self._save(write)
+
+    def _save(self, write):
+        stored = {'schemas': {sid: s.data for sid, s in self.schemas().items()}, 'in_log': sorted(self._in_log)}
+        write(self.path, json.dumps(stored, ensure_ascii=False).encode('utf-8'))
+
+    def pack(self, record: Dict, plain: str) -> Dict:
+        """
+        record with its answers and recommendation packed, or record itself if
+        nothing packs or the packed form would not decode to plain (the
+        record's JSON).
+        """
+        answers, recommendation = record.get('triage_answers'), record.get('recommendation')
+        packed = {}
+        if isinstance(answers, dict) and answers:
+            packed['triage_answers'] = CURRENT_SCHEMA.pack_answers(answers)
+        if isinstance(recommendation, str) and recommendation:
+            rec = CURRENT_SCHEMA.pack_recommendation(recommendation)
+            if rec is not None:
+                packed['recommendation'] = rec
+        if not packed:
+            return record
+        out = {key: packed.get(key, value) for key, value in record.items()}
+        try:
+            if json.dumps(self.unpack(out)) == plain:
+                return out
+        except (LookupError, TypeError, ValueError):
+            pass
+        return record
+
+    def unpack(self, record: Dict) -> Dict:
+        """
+        record with packed answers and recommendation expanded (and any
+        schemas it carries taken in and dropped); unpacked records are
+        returned as is.
+        """
+        answers, recommendation = record.get('triage_answers'), record.get('recommendation')
+        if not isinstance(answers, list) and not isinstance(recommendation, list):
+            return record
+        out = dict(record)
+        if SCHEMAS_KEY in out:
+            self._register(out.pop(SCHEMAS_KEY))
+        if isinstance(answers, list):
+            out['triage_answers'] = self.schema(answers[0]).unpack_answers(answers)
+        if isinstance(recommendation, list):
+            out['recommendation'] = self.schema(recommendation[0]).unpack_recommendation(recommendation)
+        return out
@@ -0,0 +1,294 @@
+# Long-running triage daemon and its client
+# `serve` loads the spaCy pipeline, the urgency model and the compiled profile
+# rules once and answers requests over HTTP/1.1 on a Unix socket (default
+# $CLAISEN_HOME/triage.sock) or on localhost. Connections are handled by
+# asyncio; the CPU-bound work runs in an executor: one warm thread, or a pool
+# of warm worker processes with --workers N. `triage` uses the daemon when one
+# is answering at the configured address and runs in-process otherwise.
+#
+#   GET  /health          {"status": "ok", "pid", "workers", "uptime"}
+#   POST /assign_profile  {"answers": {...}, "notes": "..."} -> assign_profile result
+#                         (400 if an answer is not valid for its question)
+#   POST /extract         {"text": "..."} -> extract_symptoms_from_text result
+#   GET  /timings         per-stage latency histograms (with serve --profile-timings)
+import os
+import json
+import time
+import socket
+import asyncio
+import signal
+import http.client
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from .timings import TIMINGS, Timings
+from .question_graph import QUESTION_GRAPH
+
+DAEMON_ENV = 'CLAISEN_DAEMON'
+SOCKET_NAME = 'triage.sock'
+# Largest request body accepted, in bytes
+MAX_BODY = 1024 * 1024
+# Seconds the client waits for the daemon before falling back to in-process triage
+CONNECT_TIMEOUT = 0.2
+REQUEST_TIMEOUT = 30.0
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+class DaemonError(Exception):
+    """The daemon answered, but with an error."""
+
+def default_address(home: str) -> str:
+    """$CLAISEN_DAEMON (a socket path or http://127.0.0.1:PORT), else the socket in home."""
+    return os.environ.get(DAEMON_ENV) or os.path.join(home, SOCKET_NAME)
+
+def parse_address(address: str) -> Tuple[str, object]:
+    """('tcp', (host, port)) for http:// addresses, ('unix', path) otherwise."""
+    if address.startswith('http://'):
+        host, _, port = address[len('http://'):].rstrip('/').rpartition(':')
+        return 'tcp', (host or '127.0.0.1', int(port))
+    return 'unix', address
+
+# Work done in the executor. Module-level so worker processes can run it.
+
+def _warm():
+    from .triage_engine import get_nlp, get_urgency_model
+    get_nlp()
+    get_urgency_model()
+
+# Each returns its result plus the stage timings it recorded (empty unless timing is on)
+
+def _assign(answers: Dict, notes: Optional[str]) -> Tuple[Dict, Dict]:
+    from .triage_engine import assign_profile
+    return assign_profile(answers, notes=notes), TIMINGS.drain()
+
+def _extract(text: str) -> Tuple[Dict, Dict]:
+    from .triage_engine import extract_symptoms_from_text
+    return extract_symptoms_from_text(text), TIMINGS.drain()
+
+class TriageServer:
+    def __init__(self, workers: int = 1):
+        self.workers = workers
+        self.started = time.time()
+        # Stage timings from the executor plus request latency, merged here on the event loop
+        self.timings = Timings(enabled=TIMINGS.enabled)
+        if workers > 1:
+            self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_warm)
+            # Start and warm every worker now rather than on the first requests
+            for future in [self.executor.submit(_warm) for _ in range(workers)]:
+                future.result()
+        else:
+            # One thread: spaCy and the extraction cache are used from one thread only
+            _warm()
+            self.executor = ThreadPoolExecutor(max_workers=1)
+        self.routes = {
+            '/health': ('GET', self.health),
+            '/assign_profile': ('POST', self.assign_profile),
+            '/extract': ('POST', self.extract),
+            '/timings': ('GET', self.get_timings),
+        }
+
+    async def health(self, body: Dict) -> Dict:
+        return {'status': 'ok', 'pid': os.getpid(), 'workers': self.workers,
+                'uptime': round(time.time() - self.started, 1)}
+
+    async def assign_profile(self, body: Dict) -> Dict:
+        answers = body.get('answers') or {}
+        notes = body.get('notes')
+        if not isinstance(answers, dict) or not (notes is None or isinstance(notes, str)):
+            raise ValueError('"answers" must be an object and "notes" a string')
+        answers, problems = QUESTION_GRAPH.validate(answers)
+        if problems:
+            raise ValueError('Invalid answers: ' + '; '.join(problems))
+        return await self.run(_assign, answers, notes)
+
+    async def extract(self, body: Dict) -> Dict:
+        text = body.get('text')
+        if not isinstance(text, str):
+            raise ValueError('"text" must be a string')
+        return await self.run(_extract, text)
+
+    async def get_timings(self, body: Dict) -> Dict:
+        return {'enabled': self.timings.enabled, 'stages': self.timings.snapshot()}
+
+    async def run(self, fn, *args) -> Dict:
+        result, timings = await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        self.timings.merge(timings)
+        return result
+
+    async def dispatch(self, method: str, path: str, raw: bytes) -> Tuple[int, Dict]:
+        path = path.split('?', 1)[0]
+        route = self.routes.get(path)
+        if route is None:
+            return 404, {'error': f'No such endpoint: {path}'}
+        if method != route[0]:
+            return 405, {'error': f'{path} expects {route[0]}'}
+        try:
+            body = json.loads(raw) if raw else {}
+            if not isinstance(body, dict):
+                raise ValueError('expected a JSON object')
+        except ValueError as e:
+            return 400, {'error': f'Invalid request body: {e}'}
+        try:
+            with self.timings.span(f'daemon{path}'):
+                return 200, await route[1](body)
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        except Exception as e:
+            return 500, {'error': f'{type(e).__name__}: {e}'}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve HTTP/1.1 requests on one connection until the client closes it."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, target, _ = line.decode('latin-1').split(' ', 2)
+                except ValueError:
+                    await self.respond(writer, 400, {'error': 'Malformed request line'}, close=True)
+                    break
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = header.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get('content-length') or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self.respond(writer, 400, {'error': 'Invalid Content-Length'}, close=True)
+                    break
+                if length > MAX_BODY:
+                    await self.respond(writer, 413, {'error': f'Body larger than {MAX_BODY} bytes'}, close=True)
+                    break
+                raw = await reader.readexactly(length) if length else b''
+                status, payload = await self.dispatch(method, target, raw)
+                close = headers.get('connection', '').lower() == 'close'
+                await self.respond(writer, status, payload, close)
+                if close:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer: asyncio.StreamWriter, status: int, payload: Dict, close: bool = False):
+        body = json.dumps(payload).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def serve(self, address: str, ready=None):
+        kind, where = parse_address(address)
+        if kind == 'unix':
+            _claim_socket(where)
+            server = await asyncio.start_unix_server(self.handle, path=where)
+            os.chmod(where, 0o600)
+        else:
+            server = await asyncio.start_server(self.handle, host=where[0], port=where[1])
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+        if ready is not None:
+            ready()
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            if kind == 'unix' and os.path.exists(where):
+                os.unlink(where)
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+def _claim_socket(path: str):
+    """Remove a socket left by a daemon that died; refuse if one is still answering."""
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        return
+    if TriageClient(path).health() is not None:
+        raise OSError(f"A triage daemon is already listening on {path}")
+    os.unlink(path)
+
+def serve(address: str, workers: int = 1, ready=None):
+    asyncio.run(TriageServer(workers).serve(address, ready))
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__('localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.path)
+        self.sock = sock
+
+class TriageClient:
+    """
+    Client for a running daemon. One connection is kept open and reused.
+    Methods that would fall back to in-process triage return None when no
+    daemon answers; errors reported by the daemon raise DaemonError.
+    """
+    def __init__(self, address: str):
+        self.address = address
+        self.conn = None
+
+    def _connection(self, timeout: float):
+        kind, where = parse_address(self.address)
+        if kind == 'unix':
+            if not hasattr(socket, 'AF_UNIX') or not os.path.exists(where):
+                return None
+            return _UnixHTTPConnection(where, timeout)
+        return http.client.HTTPConnection(where[0], where[1], timeout=timeout)
+
+    def request(self, method: str, path: str, body: Optional[Dict] = None) -> Optional[Dict]:
+        if self.conn is None:
+            self.conn = self._connection(CONNECT_TIMEOUT)
+            if self.conn is None:
+                return None
+            try:
+                self.conn.connect()
+            except OSError:
+                self.conn = None
+                return None
+            self.conn.sock.settimeout(REQUEST_TIMEOUT)
+        payload = json.dumps(body).encode('utf-8') if body is not None else None
+        headers = {'Content-Type': 'application/json'} if payload is not None else {}
+        try:
+            self.conn.request(method, path, body=payload, headers=headers)
+            response = self.conn.getresponse()
+            data = json.loads(response.read() or b'{}')
+        except (OSError, http.client.HTTPException, ValueError):
+            self.close()
+            return None
+        if response.status != 200:
+            raise DaemonError(data.get('error', f'HTTP {response.status}'))
+        return data
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def health(self) -> Optional[Dict]:
+        try:
+            return self.request('GET', '/health')
+        except DaemonError:
+            return None
+
+    def assign_profile(self, answers: Dict, notes: Optional[str] = None) -> Optional[Dict]:
+        return self.request('POST', '/assign_profile', {'answers': answers, 'notes': notes})
+
+    def extract(self, text: str) -> Optional[Dict]:
+        return self.request('POST', '/extract', {'text': text})
+
+    def timings(self) -> Optional[Dict]:
+        return self.request('GET', '/timings')
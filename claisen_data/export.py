@@ -0,0 +1,135 @@
+# Streaming export of the symptom log
+# Records are read lazily (see StorageBackend.iter_range) and written as they
+# arrive, so exporting never holds the whole history in memory. Symptom entries
+# ({"symptoms": [...]}) and triage entries ({"triage_answers": ..., "profile": ...})
+# are both flattened to the same row layout for the tabular formats.
+import csv
+import json
+from itertools import islice
+from typing import Dict, Iterable, Iterator, TextIO
+
+FORMATS = ['csv', 'json', 'jsonl', 'parquet', 'arrow']
+# Rows per record batch for the columnar formats
+COLUMNAR_BATCH_SIZE = 4096
+# The first four are the original CSV columns
+COLUMNS = ['date', 'symptom', 'severity', 'notes', 'kind', 'profile', 'profile_reason', 'followup_day', 'triage_answers']
+
+def record_kind(record: Dict) -> str:
+    if 'triage_answers' in record or 'profile' in record:
+        return 'triage'
+    return 'symptoms'
+
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def flatten(record: Dict) -> Iterator[Dict]:
+    """
+    Yield the export rows for one record: one per symptom for symptom entries
+    (one blank-symptom row for a day logged with none), one per triage entry.
+    """
+    base = {
+        'date': record.get('date'),
+        'notes': record.get('notes') or '',
+        'kind': record_kind(record),
+        'symptom': None, 'severity': None, 'profile': None,
+        'profile_reason': None, 'followup_day': None, 'triage_answers': None,
+    }
+    if base['kind'] == 'triage':
+        answers = record.get('triage_answers')
+        yield {**base,
+               'profile': _as_int(record.get('profile')),
+               'profile_reason': record.get('profile_reason'),
+               'followup_day': _as_int(record.get('followup_day')),
+               'triage_answers': json.dumps(answers) if answers is not None else None}
+        return
+    symptoms = [s for s in record.get('symptoms') or [] if isinstance(s, dict)]
+    if not symptoms:
+        yield base
+        return
+    for s in symptoms:
+        yield {**base, 'symptom': s.get('name'), 'severity': _as_int(s.get('severity'))}
+
+def rows(records: Iterable[Dict]) -> Iterator[Dict]:
+    for record in records:
+        yield from flatten(record)
+
+def write_csv(records: Iterable[Dict], f: TextIO) -> int:
+    writer = csv.writer(f)
+    writer.writerow(COLUMNS)
+    n = 0
+    for row in rows(records):
+        writer.writerow(['' if row[c] is None else row[c] for c in COLUMNS])
+        n += 1
+    return n
+
+def write_json(records: Iterable[Dict], f: TextIO) -> int:
+    """Write a JSON array laid out exactly like json.dump(records, f, indent=2)."""
+    n = 0
+    for record in records:
+        body = json.dumps(record, indent=2).replace('\n', '\n  ')
+        f.write(('[\n  ' if n == 0 else ',\n  ') + body)
+        n += 1
+    f.write('\n]' if n else '[]')
+    return n
+
+def write_jsonl(records: Iterable[Dict], f: TextIO) -> int:
+    n = 0
+    for record in records:
+        f.write(json.dumps(record) + '\n')
+        n += 1
+    return n
+
+def _arrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise RuntimeError("Parquet and Arrow export need pyarrow (pip install pyarrow)")
+    return pyarrow
+
+def arrow_schema():
+    pa = _arrow()
+    types = {'severity': pa.int32(), 'profile': pa.int32(), 'followup_day': pa.int32()}
+    return pa.schema([(c, types.get(c, pa.string())) for c in COLUMNS])
+
+def arrow_batches(records: Iterable[Dict], batch_size: int = COLUMNAR_BATCH_SIZE) -> Iterator:
+    """Yield pyarrow RecordBatches of at most batch_size rows."""
+    pa = _arrow()
+    schema = arrow_schema()
+    it = rows(records)
+    while True:
+        chunk = list(islice(it, batch_size))
+        if not chunk:
+            return
+        yield pa.RecordBatch.from_pydict({c: [row[c] for row in chunk] for c in COLUMNS}, schema=schema)
+
+def write_columnar(records: Iterable[Dict], path: str, fmt: str) -> int:
+    pa = _arrow()
+    schema = arrow_schema()
+    n = 0
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(path, schema)
+    else:
+        import pyarrow.ipc
+        writer = pa.ipc.new_file(path, schema)
+    with writer:
+        for batch in arrow_batches(records):
+            writer.write_batch(batch)
+            n += batch.num_rows
+    return n
+
+def export(records: Iterable[Dict], fmt: str, path: str) -> int:
+    """
+    Write records to path in fmt. Returns the number of items written: rows
+    for csv/parquet/arrow, records for json/jsonl.
+    """
+    if fmt in ('parquet', 'arrow'):
+        return write_columnar(records, path, fmt)
+    writers = {'csv': write_csv, 'json': write_json, 'jsonl': write_jsonl}
+    if fmt not in writers:
+        raise ValueError(f"Unknown export format: {fmt} (choose from {', '.join(FORMATS)})")
+    with open(path, 'w', newline='' if fmt == 'csv' else None) as f:
+        return writers[fmt](records, f)
@@ -0,0 +1,174 @@
+# Follow-up sessions (`triage --followup 7|14|28`)
+# A follow-up starts from the patient's latest triage entry. The rollups header
+# records where that entry ends in the log, so it is found with one seek
+# however long the history is. Answers that describe the patient rather than
+# how treatment is going are carried forward. The walker asks only the
+# followup_* questions, plus the earlier questions that a follow-up answer
+# (FOLLOWUP_REASK) or the last recommendation (REASK_AFTER_PROFILE) says may
+# have changed. The previous profile is then stepped up or down by the
+# follow-up answers (FOLLOWUP_SIGNALS, ESCALATE, DEESCALATE). Alarm features
+# and urgent notes still go to profile 5 through the usual rules.
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from .question_graph import QUESTION_GRAPH, Question
+from .triage_rules import PROFILE_RULES, ALARM_RULE, profile_rule
+from .storage import StorageBackend, JsonLinesStorage
+from .rollups import Rollups
+
+FOLLOWUP_PREFIX = 'followup_'
+FOLLOWUP_IDS = [q.id for q in QUESTION_GRAPH.questions if q.id.startswith(FOLLOWUP_PREFIX)]
+
+# (follow-up question, answer) -> earlier questions to ask again instead of carrying forward
+FOLLOWUP_REASK = {
+    ('followup_new_symptoms', 'Yes – Night symptoms'): ['symptom_lying_down', 'night_choking', 'sleep_position'],
+    ('followup_new_symptoms', 'Yes – Nausea or dysphagia'): ['dysphagia', 'odynophagia', 'persistent_nausea'],
+    ('followup_alarm_features', 'Yes'): ['weight_change', 'vomiting_blood', 'dysphagia'],
+    ('followup_improvement', '>75% improvement'): ['symptom_intensity', 'symptom_frequency'],
+    ('followup_improvement', '30–75%'): ['symptom_intensity', 'symptom_frequency'],
+    ('followup_improvement', '<30% or worsening'): ['symptom_intensity', 'symptom_frequency', 'symptom_duration', 'symptom_change'],
+    ('followup_adherence', 'Yes'): ['meal_portion_size', 'meal_bedtime_interval', 'sleep_position'],
+    ('followup_antacid_freq', 'Yes'): ['relief_attempts'],
+}
+# Previous profile -> questions its recommendation is expected to have changed (profiles 2-3 start a PPI)
+REASK_AFTER_PROFILE = {
+    2: ['recent_ppi'],
+    3: ['recent_ppi'],
+}
+
+# Follow-up answers that count towards "worse" (positive) or "better" (negative)
+FOLLOWUP_SIGNALS = {
+    'followup_antacid_days': {'0–1 days': -1, '4+ days': 1},
+    'followup_symptom_interfere': {'Never': -1, 'Several times': 1},
+    'followup_new_symptoms': {'Yes – Night symptoms': 1, 'Yes – Nausea or dysphagia': 1},
+    'followup_improvement': {'>75% improvement': -2, '<30% or worsening': 2},
+    'followup_antacid_freq': {'No': -1, 'Yes': 1},
+    'followup_symptom_free_days': {'>10 days': -1, '<5 days': 1},
+    'followup_night_relief': {'Yes': 1},
+}
+# Net score at which the profile moves; between the two it stays where it was
+TREND_THRESHOLD = 2
+ESCALATE = {1: 2, 2: 4, 3: 4, 4: 4}
+DEESCALATE = {1: 1, 2: 1, 3: 2, 4: 2}
+# Night-time symptoms send profiles 1-2 to the nocturnal profile instead
+NOCTURNAL_SIGNALS = [('followup_new_symptoms', 'Yes – Night symptoms'), ('followup_night_relief', 'Yes')]
+NOCTURNAL_PROFILE = 3
+
+def validate_followup():
+    """
+    Check the tables above against the question bank and the profile rules.
+    Raises ValueError listing all problems found.
+    """
+    problems = []
+    def check_answer(key, value, where):
+        q = QUESTION_GRAPH.by_id.get(key)
+        if q is None or not key.startswith(FOLLOWUP_PREFIX):
+            problems.append(f"{where}: '{key}' is not a follow-up question")
+        elif value not in q.option_index:
+            problems.append(f"{where}: '{value}' is not an option of '{key}'")
+    def check_targets(ids, where):
+        for qid in ids:
+            if qid not in QUESTION_GRAPH.by_id or qid.startswith(FOLLOWUP_PREFIX):
+                problems.append(f"{where}: '{qid}' is not a question that is carried forward")
+    for (key, value), ids in FOLLOWUP_REASK.items():
+        check_answer(key, value, 'reask')
+        check_targets(ids, f"reask {key}")
+    for profile, ids in REASK_AFTER_PROFILE.items():
+        check_targets(ids, f"reask after profile {profile}")
+    for key, weights in FOLLOWUP_SIGNALS.items():
+        for value in weights:
+            check_answer(key, value, 'signal')
+    for key, value in NOCTURNAL_SIGNALS:
+        check_answer(key, value, 'nocturnal')
+    profiles = {rule['profile'] for rule in PROFILE_RULES}
+    for name, table in (('escalate', ESCALATE), ('deescalate', DEESCALATE)):
+        for src, dst in table.items():
+            if src not in profiles or dst not in profiles:
+                problems.append(f"{name}: no rule assigns profile {src if src not in profiles else dst}")
+    if NOCTURNAL_PROFILE not in profiles:
+        problems.append(f"nocturnal: no rule assigns profile {NOCTURNAL_PROFILE}")
+    if problems:
+        raise ValueError("Invalid follow-up rules:\n" + "\n".join(problems))
+
+def latest_triage(storage: StorageBackend, rollups: Rollups) -> Optional[Dict]:
+    """The most recent log entry with triage answers, or None if there is none."""
+    if not storage.exists():
+        return None
+    if isinstance(storage, JsonLinesStorage):
+        rollups.sync(storage)
+        header = rollups.header()
+        if header is not None:
+            end = header[4]
+            record = storage.read_ending_at(end) if end else None
+            if record is not None and 'triage_answers' in record:
+                return record
+            if not end:
+                return None
+    # No offsets to go on (JSON array backend, or a header that just went stale): newest first
+    return next((r for r in storage.iter_reverse() if isinstance(r.get('triage_answers'), dict)), None)
+
+def followup_questions(answers: Dict) -> Iterator[Question]:
+    """The follow-up questions not answered yet, in order."""
+    return (q for q in QUESTION_GRAPH.pending(answers) if q.id.startswith(FOLLOWUP_PREFIX))
+
+def reask_ids(answers: Dict, previous_profile: Optional[int] = None) -> Set[str]:
+    """Earlier questions that these follow-up answers (or the previous profile's treatment) may have changed."""
+    ids = set(REASK_AFTER_PROFILE.get(previous_profile, ()))
+    for key in FOLLOWUP_IDS:
+        value = answers.get(key)
+        if isinstance(value, str):
+            ids.update(FOLLOWUP_REASK.get((key, value), ()))
+    return ids
+
+def carry_forward(previous: Dict, answers: Dict) -> Tuple[Dict, List[str]]:
+    """
+    Merge the previous triage answers under the answers given this session.
+    Follow-up answers are never carried, nor are the questions reask_ids()
+    names (unless given again) or answers no longer valid for their question.
+    Returns (answers, ids left to ask again).
+    """
+    reask = reask_ids(answers, previous.get('profile'))
+    carried, _ = QUESTION_GRAPH.validate({k: v for k, v in previous.get('triage_answers', {}).items()
+                                          if not k.startswith(FOLLOWUP_PREFIX) and k in QUESTION_GRAPH.by_id})
+    merged = {k: v for k, v in carried.items() if k not in reask}
+    merged.update(answers)
+    return merged, [q.id for q in QUESTION_GRAPH.questions if q.id in reask and q.id not in answers]
+
+def followup_trend(answers: Dict) -> Tuple[str, int]:
+    """('worse' | 'better' | 'stable', net score) from the follow-up answers."""
+    score = sum(weights.get(answers.get(key), 0) for key, weights in FOLLOWUP_SIGNALS.items())
+    if score >= TREND_THRESHOLD:
+        return 'worse', score
+    if score <= -TREND_THRESHOLD:
+        return 'better', score
+    return 'stable', score
+
+def reassess(previous: Dict, answers: Dict, result: Dict) -> Dict:
+    """
+    Step the previous profile by the follow-up trend. result is assign_profile
+    on this session's full answers: it stands as is when it is an alarm or
+    urgent result (profile 5), or when the previous profile was not 1-4.
+    Either way a "followup" summary is added.
+    """
+    previous_profile = previous.get('profile')
+    trend, score = followup_trend(answers)
+    summary = {'previous_date': previous.get('date'), 'previous_profile': previous_profile,
+               'trend': trend, 'score': score}
+    if result['profile'] == ALARM_RULE['profile'] or previous_profile not in ESCALATE:
+        return {**result, 'followup': summary}
+    if trend == 'worse':
+        nocturnal = previous_profile < NOCTURNAL_PROFILE and any(answers.get(k) == v for k, v in NOCTURNAL_SIGNALS)
+        profile = NOCTURNAL_PROFILE if nocturnal else ESCALATE[previous_profile]
+    elif trend == 'better':
+        profile = DEESCALATE[previous_profile]
+    else:
+        profile = previous_profile
+    change = ('escalated to' if profile > previous_profile else 'stepped down to' if profile < previous_profile
+              else 'staying on')
+    lead = (f"Follow-up: {trend} since the {previous.get('date')} triage (profile {previous_profile}), "
+            f"{change} profile {profile}.")
+    if profile == result['profile']:
+        return {**result, 'reason': f"{lead} {result['reason']}", 'followup': summary}
+    rule, notes = profile_rule(profile, answers)
+    return {**result, 'profile': profile, 'reason': f"{lead} {rule['reason']}",
+            'recommendation': rule['recommendation'].replace('{notes}', notes), 'followup': summary}
+
+validate_followup()
@@ -0,0 +1,310 @@
+# Bulk import of backfilled symptom logs (CSV or JSON Lines)
+# Rows are gathered into columns and checked all at once: symptom names by set
+# membership, severities by a NumPy range check, dates by one datetime64
+# conversion. Values the fast checks cannot decide on their own (odd types,
+# padded numbers, unexpected record shapes) are handed to the pydantic models
+# in validation.py, so `import` and `add` accept exactly the same entries.
+# Bad rows are reported with their line number; the rest of the file is imported.
+import gc
+import csv
+import json
+import bisect
+from contextlib import contextmanager
+from typing import Dict, List, Optional, TextIO, Tuple
+import numpy as np
+from pydantic import ValidationError
+from .validation import (SYMPTOM_SET, SEVERITY_MIN, SEVERITY_MAX, SymptomEntry, DayLog,
+                         check_symptom, check_severity, check_date, error_message)
+
+IMPORT_FORMATS = ['csv', 'jsonl']
+# Entries per storage write
+APPEND_CHUNK = 8192
+DIGITS = '0123456789'
+# Severities beyond this many digits are left to the model rather than risk overflow
+MAX_FAST_DIGITS = 9
+ENTRY_KEYS = frozenset(['date', 'symptoms', 'notes'])
+DAYS_IN_MONTH = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+class Batch:
+    """
+    Parsed input as columns. Entries (one per day) have a source line, date and
+    notes; symptom reports have the entry row they belong to, a source line,
+    a name and a raw severity. Entries the model already validated carry the
+    model's output in `checked`.
+    """
+    def __init__(self):
+        self.entry_line: List[int] = []
+        self.entry_date: List = []
+        self.entry_notes: List[Optional[str]] = []
+        self.checked: Dict[int, Dict] = {}
+        self.report_entry: List[int] = []
+        self.report_line: List[int] = []
+        self.report_name: List = []
+        self.report_severity: List = []
+        self.rows = 0
+        self.skipped = 0
+        self.errors: List[Tuple[int, str]] = []
+
+def read_csv(f: TextIO) -> Batch:
+    """
+    Read the CSV layout written by `export --format csv`: one row per symptom,
+    grouped into one entry per date. Rows with an empty symptom and severity
+    stand for a day logged with no symptoms; triage rows (kind=triage) are skipped.
+    """
+    batch = Batch()
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if header is None:
+        return batch
+    missing = [c for c in ('date', 'symptom', 'severity') if c not in header]
+    if missing:
+        raise ValueError(f"CSV header is missing column(s): {', '.join(missing)}")
+    i_date, i_name, i_sev = header.index('date'), header.index('symptom'), header.index('severity')
+    i_notes = header.index('notes') if 'notes' in header else None
+    i_kind = header.index('kind') if 'kind' in header else None
+    width = len(header)
+    entries = {}
+    entry_line, entry_date, entry_notes = batch.entry_line, batch.entry_date, batch.entry_notes
+    report_entry, report_line, report_name, report_severity = (
+        batch.report_entry, batch.report_line, batch.report_name, batch.report_severity)
+    rows = skipped = 0
+    for row in reader:
+        if not row:
+            continue
+        rows += 1
+        if len(row) < width:
+            batch.errors.append((reader.line_num, f"Expected {width} columns, got {len(row)}"))
+            continue
+        if i_kind is not None and row[i_kind] == 'triage':
+            skipped += 1
+            continue
+        day = row[i_date]
+        entry = entries.get(day)
+        if entry is None:
+            entry = entries[day] = len(entry_line)
+            entry_line.append(reader.line_num)
+            entry_date.append(day)
+            entry_notes.append(row[i_notes] if i_notes is not None else '')
+        name, severity = row[i_name], row[i_sev]
+        if name or severity:
+            report_entry.append(entry)
+            report_line.append(reader.line_num)
+            report_name.append(name)
+            report_severity.append(severity)
+    batch.rows, batch.skipped = rows, skipped
+    return batch
+
+def read_jsonl(f: TextIO) -> Batch:
+    """
+    Read one entry per line, in the layout `add` stores ({"date", "symptoms",
+    "notes"}). Triage entries are skipped. Other shapes are checked with DayLog.
+    """
+    batch = Batch()
+    entry_line, entry_date, entry_notes = batch.entry_line, batch.entry_date, batch.entry_notes
+    report_entry, report_line, report_name, report_severity = (
+        batch.report_entry, batch.report_line, batch.report_name, batch.report_severity)
+    loads = json.loads
+    for line, text in enumerate(f, 1):
+        text = text.strip()
+        if not text:
+            continue
+        batch.rows += 1
+        try:
+            record = loads(text)
+        except ValueError as e:
+            batch.errors.append((line, f"Invalid JSON: {e}"))
+            continue
+        if type(record) is not dict:
+            batch.errors.append((line, "Expected a JSON object"))
+            continue
+        # Triage entries, as export.record_kind tells them apart
+        if 'triage_answers' in record or 'profile' in record:
+            batch.skipped += 1
+            continue
+        symptoms = record.get('symptoms')
+        notes = record.get('notes', '')
+        # The stored entry layout is covered completely by the bulk checks
+        if ('date' in record and type(symptoms) is list and ENTRY_KEYS.issuperset(record)
+                and (notes is None or type(notes) is str)
+                and all(type(s) is dict and len(s) == 2 and 'name' in s and 'severity' in s for s in symptoms)):
+            k = len(symptoms)
+            report_entry.extend([len(entry_line)] * k)
+            report_line.extend([line] * k)
+            entry_line.append(line)
+            entry_date.append(record['date'])
+            entry_notes.append(notes)
+            for s in symptoms:
+                report_name.append(s['name'])
+                report_severity.append(s['severity'])
+            continue
+        try:
+            checked = DayLog(**record).dict()
+        except ValidationError as e:
+            batch.errors.append((line, error_message(e)))
+            continue
+        batch.checked[len(entry_line)] = checked
+        entry_line.append(line)
+        entry_date.append(checked['date'])
+        entry_notes.append(checked['notes'])
+    return batch
+
+READERS = {'csv': read_csv, 'jsonl': read_jsonl}
+
+def _severity_column(values: List) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (severity as int64, fast mask): ints, and strings of plain ASCII digits, are
+    converted in bulk; the mask is False where the model has to decide.
+    """
+    n = len(values)
+    out = np.zeros(n, dtype=np.int64)
+    if not n:
+        return out, np.zeros(0, dtype=bool)
+    if all(type(v) is str for v in values):
+        text = np.array(values, dtype=str)
+        fast = (np.char.str_len(text) > 0) & (np.char.str_len(text) <= MAX_FAST_DIGITS) & (np.char.strip(text, DIGITS) == '')
+        out[fast] = text[fast].astype(np.int64)
+    else:
+        fast = np.fromiter((type(v) is int and -10 ** MAX_FAST_DIGITS < v < 10 ** MAX_FAST_DIGITS for v in values), bool, n)
+        out[fast] = np.fromiter((v for v, ok in zip(values, fast) if ok), np.int64)
+    return out, fast
+
+def check_reports(names: List, severities: List) -> Tuple[np.ndarray, Dict[int, str]]:
+    """
+    Bulk form of SymptomEntry for many (name, severity) pairs.
+    Returns (validated severities, {row: error message}).
+    """
+    severity, fast = _severity_column(severities)
+    fast &= np.fromiter((type(v) is str for v in names), bool, len(names))
+    known = np.fromiter((v in SYMPTOM_SET if ok else False for v, ok in zip(names, fast)), bool, len(names))
+    in_range = (severity >= SEVERITY_MIN) & (severity <= SEVERITY_MAX)
+    errors = {}
+    # The rule functions raise the messages, so bulk and model errors read the same
+    for i in np.flatnonzero(fast & ~(known & in_range)):
+        try:
+            check_symptom(names[i])
+            check_severity(int(severity[i]))
+        except ValueError as e:
+            errors[int(i)] = str(e)
+    for i in np.flatnonzero(~fast):
+        try:
+            severity[i] = SymptomEntry(name=names[i], severity=severities[i]).severity
+        except ValidationError as e:
+            errors[int(i)] = error_message(e)
+    return severity, errors
+
+def _canonical_dates(values: List) -> np.ndarray:
+    """Mask of values that are real calendar dates written exactly as YYYY-MM-DD."""
+    n = len(values)
+    text = np.array([v if type(v) is str and len(v) == 10 else '' for v in values], dtype='<U10')
+    if not n:
+        return np.zeros(0, dtype=bool)
+    digits = text.view(np.uint32).reshape(n, 10).astype(np.int64) - ord('0')
+    dash = ord('-') - ord('0')
+    shaped = (digits[:, 4] == dash) & (digits[:, 7] == dash)
+    shaped &= ((digits[:, [0, 1, 2, 3, 5, 6, 8, 9]] >= 0) & (digits[:, [0, 1, 2, 3, 5, 6, 8, 9]] <= 9)).all(axis=1)
+    year = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+    month = digits[:, 5] * 10 + digits[:, 6]
+    day = digits[:, 8] * 10 + digits[:, 9]
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    month_ok = (month >= 1) & (month <= 12)
+    last = DAYS_IN_MONTH[np.where(month_ok, month, 0)] + (leap & (month == 2))
+    return shaped & (year >= 1) & month_ok & (day >= 1) & (day <= last)
+
+def check_dates(values: List) -> Dict[int, str]:
+    """Bulk form of the DayLog date check. Returns {row: error message}."""
+    errors = {}
+    for i in np.flatnonzero(~_canonical_dates(values)):
+        try:
+            check_date(values[i])
+        except ValueError as e:
+            errors[int(i)] = str(e)
+    return errors
+
+def validate(batch: Batch) -> Tuple[List[Dict], List[Tuple[int, str]]]:
+    """
+    Check every parsed entry and report. Returns (entries, errors): the entries
+    whose date and symptom reports are all valid, as `add` would store them,
+    and (line, message) for every rejected row, in line order.
+    """
+    errors = list(batch.errors)
+    n = len(batch.entry_line)
+    bad = np.zeros(n, dtype=bool)
+    for i, message in check_dates(batch.entry_date).items():
+        if i not in batch.checked:
+            bad[i] = True
+            errors.append((batch.entry_line[i], message))
+    severity, report_errors = check_reports(batch.report_name, batch.report_severity)
+    for i, message in report_errors.items():
+        bad[batch.report_entry[i]] = True
+        errors.append((batch.report_line[i], message))
+    symptoms = [[] for _ in range(n)]
+    for entry, name, value in zip(batch.report_entry, batch.report_name, severity.tolist()):
+        symptoms[entry].append({'name': name, 'severity': value})
+    entries = []
+    for i in np.flatnonzero(~bad).tolist():
+        if i in batch.checked:
+            entries.append((batch.entry_line[i], batch.checked[i]))
+        else:
+            entries.append((batch.entry_line[i], {'date': batch.entry_date[i], 'symptoms': symptoms[i],
+                                                  'notes': batch.entry_notes[i]}))
+    errors.sort(key=lambda e: e[0])
+    return entries, errors
+
+@contextmanager
+def gc_paused():
+    """
+    Hold off cyclic garbage collection while building many small containers.
+    The rows hold no reference cycles, and collections triggered by the
+    allocations alone would otherwise cost more than the validation itself.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+def import_file(path: str, fmt: str, storage, dry_run: bool = False, rollups=None) -> Dict:
+    """
+    Validate path and add its valid entries to storage in date order.
+    Dates already in the log, or repeated in the file, are not imported twice,
+    so re-running an import is harmless. Entries newer than the log are
+    appended with the write lock taken per chunk of APPEND_CHUNK entries.
+    Backfilled entries (older than the newest logged day) are merged into the
+    log with one rewrite under the lock (storage.merge_many), so the log stays
+    in date order and range reads keep using the date index; rollups, if
+    given, are then rebuilt under the same lock. Returns counts and the error list.
+    """
+    if fmt not in READERS:
+        raise ValueError(f"Unknown import format: {fmt} (choose from {', '.join(IMPORT_FORMATS)})")
+    with open(path, 'r', newline='' if fmt == 'csv' else None) as f, gc_paused():
+        batch = READERS[fmt](f)
+        entries, errors = validate(batch)
+    seen = {}
+    unique = []
+    for line, entry in entries:
+        day = entry['date']
+        if day in seen:
+            errors.append((line, f"Duplicate entry for {day} (first on line {seen[day]})"))
+            continue
+        seen[day] = line
+        unique.append(entry)
+    unique.sort(key=lambda e: e['date'])
+    newest = storage.newest_date() if storage.exists() else None
+    backfill = bisect.bisect_left([e['date'] for e in unique], newest) if newest is not None else 0
+    chunks = [unique[:backfill]] if backfill else []
+    chunks += [unique[start:start + APPEND_CHUNK] for start in range(backfill, len(unique), APPEND_CHUNK)]
+    imported = 0
+    for chunk in chunks:
+        # Check and write under one lock per chunk, so a concurrent `add` cannot
+        # slip in a duplicate day, and no writer waits on a whole import
+        with storage.lock:
+            present = storage.dates_present([e['date'] for e in chunk]) if storage.exists() else set()
+            fresh = [e for e in chunk if e['date'] not in present]
+            if not dry_run and storage.merge_many(fresh) and rollups is not None:
+                rollups.rebuild_from(storage)
+        imported += len(fresh)
+    errors.sort(key=lambda e: e[0])
+    return {'rows': batch.rows, 'imported': imported, 'already_logged': len(unique) - imported,
+            'skipped': batch.skipped, 'errors': errors}
@@ -0,0 +1,119 @@
+# Keyword tables for severity, trigger, timing and stability words in notes
+# All tables are merged into one matcher that lowercases the note once and
+# checks each distinct keyword once, instead of re-lowering the note for every
+# trigger/timing keyword and running separate case-insensitive regex scans.
+import re
+from typing import Dict, List, Optional
+
+# Checked in this order; the first level with any keyword present wins
+SEVERITY_KEYWORDS = [
+    ("severe", ["severe", "unbearable", "can't sleep", "awful", "worst", "disabling"]),
+    ("mild", ["mild", "slight", "occasional", "manageable", "better"]),
+    ("moderate", ["moderate", "bothersome", "often", "frequent"]),
+]
+TRIGGER_KEYWORDS = ["night", "lying down", "after eating", "spicy", "fatty", "stress", "anxiety", "exercise", "alcohol", "caffeine"]
+TIMING_KEYWORDS = ["night", "morning", "after meals", "bedtime", "daily", "weekly"]
+STABLE_KEYWORDS = ["coping", "ok", "fine", "improving", "better"]
+
+# Non-ASCII characters that case-insensitive matching treats as ASCII letters but
+# str.lower() does not map to them (or maps to two characters). Notes containing
+# any of these take the slow path so results match re.I exactly.
+_CASEFOLD_SPECIAL = re.compile('[İıſK]')
+
+# Upper bound on remembered keyword combinations (see KeywordMatcher.labels)
+LABEL_CACHE_SIZE = 4096
+
+class KeywordMatcher:
+    """
+    Matcher over all keyword tables at once. The tables are merged into one
+    deduplicated keyword tuple ("night" and "better" appear twice) checked
+    against a single lowercased copy of the note; the labels are then read off
+    the set of keywords present.
+    """
+    def __init__(self):
+        keywords = {kw for _, kws in SEVERITY_KEYWORDS for kw in kws}
+        keywords.update(TRIGGER_KEYWORDS, TIMING_KEYWORDS, STABLE_KEYWORDS)
+        self.keywords = tuple(sorted(keywords))
+        # Labels depend only on which keywords are present, and few combinations occur
+        self.labels = {}
+
+    def found(self, lowered: str) -> frozenset:
+        """Every keyword occurring anywhere in the (already lowercased) text."""
+        return frozenset([kw for kw in self.keywords if kw in lowered])
+
+    def scan(self, text: str) -> Dict:
+        """
+        Return {"severity", "triggers", "timing", "stable"} for text, with lists in
+        table order, exactly as the per-keyword scans in extract_symptoms_from_text
+        used to compute them.
+        """
+        if not text.isascii() and _CASEFOLD_SPECIAL.search(text):
+            return scan_slow(text)
+        present = self.found(text.lower())
+        hits = self.labels.get(present)
+        if hits is None:
+            hits = self.label(present)
+            if len(self.labels) < LABEL_CACHE_SIZE:
+                self.labels[present] = hits
+        return {**hits, "triggers": list(hits["triggers"]), "timing": list(hits["timing"])}
+
+    @staticmethod
+    def label(present: frozenset) -> Dict:
+        severity = None
+        for level, kws in SEVERITY_KEYWORDS:
+            if any(k in present for k in kws):
+                severity = level
+                break
+        return {
+            "severity": severity,
+            "triggers": [k for k in TRIGGER_KEYWORDS if k in present],
+            "timing": [k for k in TIMING_KEYWORDS if k in present],
+            "stable": any(k in present for k in STABLE_KEYWORDS),
+        }
+
+def scan_slow(text: str) -> Dict:
+    """Reference implementation: the original one-search-per-keyword scans."""
+    severity = None
+    for level, kws in SEVERITY_KEYWORDS:
+        if re.search('|'.join(kws), text, re.I):
+            severity = level
+            break
+    return {
+        "severity": severity,
+        "triggers": [k for k in TRIGGER_KEYWORDS if k in text.lower()],
+        "timing": [k for k in TIMING_KEYWORDS if k in text.lower()],
+        "stable": bool(re.search('|'.join(STABLE_KEYWORDS), text, re.I)),
+    }
+
+MATCHER = KeywordMatcher()
+
+def scan_keywords(text: str) -> Dict:
+    return MATCHER.scan(text)
+
+def keyword_findings(text: str, urgent: bool = False, entities: Optional[List] = None) -> Dict:
+    """
+    Build the extract_symptoms_from_text findings dict from keyword matches and,
+    if given, (text, label) entities from the spaCy EntityRuler. With no
+    entities this is the keyword-only fast path used when spaCy is unavailable.
+    """
+    findings = {"symptoms": [], "severity": None, "triggers": [], "timing": [], "sentiment": None, "entities": []}
+    # Use custom entities
+    for ent_text, label in entities or []:
+        if label == "SYMPTOM" and ent_text not in findings["symptoms"]:
+            findings["symptoms"].append(ent_text)
+        if label == "TRIGGER" and ent_text not in findings["triggers"]:
+            findings["triggers"].append(ent_text)
+        findings["entities"].append((ent_text, label))
+    hits = scan_keywords(text)
+    findings["severity"] = hits["severity"]
+    # Triggers (fallback)
+    for trigger in hits["triggers"]:
+        if trigger not in findings["triggers"]:
+            findings["triggers"].append(trigger)
+    findings["timing"] = hits["timing"]
+    # Sentiment (very basic)
+    if urgent:
+        findings["sentiment"] = "urgent"
+    elif hits["stable"]:
+        findings["sentiment"] = "stable"
+    return findings
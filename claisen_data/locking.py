@@ -0,0 +1,92 @@
+# Advisory write lock for a symptom log
+# Every write to a log (appends, rewrites, index and rollup updates) happens
+# while holding an exclusive lock on <log>.lock, so concurrent `add`, `triage`
+# and `import` runs queue up instead of overwriting each other. Readers never
+# take the lock: the log is only ever appended to or atomically replaced, so a
+# reader sees either the old or the new state. The lock is reentrant within a
+# process and is held only around the write itself, never while prompting.
+import os
+import time
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Seconds to wait for another writer before giving up
+LOCK_TIMEOUT = 30.0
+# Polling interval while waiting, doubled up to POLL_MAX
+POLL_MIN = 0.001
+POLL_MAX = 0.01
+
+class LockTimeout(OSError):
+    """Another process held the log's write lock for longer than the timeout."""
+
+def _try_lock(fd: int) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    except BlockingIOError:
+        return False
+    except OSError:
+        # msvcrt reports a lock held elsewhere as a plain OSError
+        if fcntl is None:
+            return False
+        raise
+    return True
+
+def _unlock(fd: int):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+class WriteLock:
+    """
+    Exclusive advisory lock on path (normally <log>.lock), usable as a
+    context manager. Nested `with` blocks on the same WriteLock only lock once.
+    """
+    def __init__(self, path: str, timeout: Optional[float] = None):
+        self.path = path
+        self.timeout = LOCK_TIMEOUT if timeout is None else timeout
+        self.fd = None
+        self.depth = 0
+
+    def acquire(self):
+        if self.depth:
+            self.depth += 1
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.monotonic() + self.timeout
+        delay = POLL_MIN
+        while not _try_lock(fd):
+            if time.monotonic() >= deadline:
+                os.close(fd)
+                raise LockTimeout(f"Timed out after {self.timeout:g}s waiting for another writer to release {self.path}")
+            time.sleep(delay)
+            delay = min(delay * 2, POLL_MAX)
+        self.fd = fd
+        self.depth = 1
+
+    def release(self):
+        self.depth -= 1
+        if self.depth:
+            return
+        fd, self.fd = self.fd, None
+        try:
+            _unlock(fd)
+        finally:
+            os.close(fd)
+
+    def __enter__(self) -> 'WriteLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
@@ -0,0 +1,226 @@
+# Columnar in-memory form of the symptom log
+# A LogFrame holds a batch of log entries as NumPy arrays instead of nested
+# dicts: one row per entry (day number, profile, notes id, key layout) and one
+# row per reported symptom (entry row, symptom code, severity), with notes in a
+# deduplicated string table. Anything that does not fit a column (triage
+# answers, NLP findings, unusual values) is kept per entry in `extras`, so
+# to_records() gives back exactly the dicts that went in, keys in the same order.
+#
+# Whole-range aggregations use it (stats --from/--to, analysis code). show and
+# export do not: they pass each record on unchanged as it is read, so building
+# columns only to turn them back into dicts costs time and memory for nothing
+# (a one-year range through LogFrame.from_storage + to_records is ~4x slower
+# than streaming it with views.select), and export would lose its bounded memory.
+from datetime import date
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from .storage import day_number, day_bounds, INDEX_EPOCH, StorageBackend
+
+NO_DAY = -1
+NO_NOTES = -1
+EPOCH = np.datetime64('1970-01-01')
+# Entries per frame when streaming a log in chunks
+DEFAULT_CHUNK = 65536
+
+def _columnar_date(value) -> int:
+    # Only canonical YYYY-MM-DD strings go in the day column; anything else is an extra
+    n = day_number(value)
+    if n is None or date.fromordinal(n + INDEX_EPOCH).isoformat() != value:
+        return NO_DAY
+    return n
+
+def _columnar_severity(value) -> bool:
+    return type(value) is int and 0 <= value <= 255
+
+def _columnar_profile(value) -> bool:
+    return type(value) is int and 1 <= value <= 255
+
+class LogFrame:
+    """
+    Columnar batch of log entries.
+
+    Entry columns (length n): day (int32 day number, NO_DAY if not columnar),
+    profile (uint8, 0 = none), notes (int32 index into notes_table, NO_NOTES),
+    has_symptoms (bool, entry has a columnar "symptoms" list), layout (int32
+    index into layouts, the entry's key order).
+    Symptom columns: sym_entry (int32 entry row), sym_code (uint8 index into
+    symptoms), sym_severity (uint8), ordered by entry.
+    """
+    def __init__(self, symptoms: List[str], day, profile, notes, has_symptoms, layout,
+                 sym_entry, sym_code, sym_severity, notes_table: List[str],
+                 layouts: List[Tuple[str, ...]], extras: List[Optional[Dict]]):
+        self.symptoms = list(symptoms)
+        self.day = day
+        self.profile = profile
+        self.notes = notes
+        self.has_symptoms = has_symptoms
+        self.layout = layout
+        self.sym_entry = sym_entry
+        self.sym_code = sym_code
+        self.sym_severity = sym_severity
+        self.notes_table = notes_table
+        self.layouts = layouts
+        self.extras = extras
+
+    def __len__(self) -> int:
+        return len(self.day)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict], symptoms: List[str]) -> 'LogFrame':
+        codes = {name: i for i, name in enumerate(symptoms)}
+        day, profile, notes, has_symptoms, layout = [], [], [], [], []
+        sym_entry, sym_code, sym_severity = [], [], []
+        notes_ids, notes_table = {}, []
+        layout_ids, layouts = {}, []
+        extras = []
+        for i, record in enumerate(records):
+            rest = dict(record)
+            n = _columnar_date(rest.get('date'))
+            if n != NO_DAY:
+                del rest['date']
+            day.append(n)
+            p = rest.get('profile')
+            if _columnar_profile(p):
+                del rest['profile']
+                profile.append(p)
+            else:
+                profile.append(0)
+            text = rest.get('notes')
+            if isinstance(text, str):
+                del rest['notes']
+                if text not in notes_ids:
+                    notes_ids[text] = len(notes_table)
+                    notes_table.append(text)
+                notes.append(notes_ids[text])
+            else:
+                notes.append(NO_NOTES)
+            reports = rest.get('symptoms')
+            columnar = isinstance(reports, list) and all(
+                isinstance(s, dict) and list(s) == ['name', 'severity'] and s['name'] in codes and _columnar_severity(s['severity']) for s in reports)
+            has_symptoms.append(columnar)
+            if columnar:
+                del rest['symptoms']
+                for s in reports:
+                    sym_entry.append(i)
+                    sym_code.append(codes[s['name']])
+                    sym_severity.append(s['severity'])
+            keys = tuple(record)
+            if keys not in layout_ids:
+                layout_ids[keys] = len(layouts)
+                layouts.append(keys)
+            layout.append(layout_ids[keys])
+            extras.append(rest or None)
+        return cls(symptoms,
+                   np.array(day, dtype=np.int32), np.array(profile, dtype=np.uint8),
+                   np.array(notes, dtype=np.int32), np.array(has_symptoms, dtype=bool),
+                   np.array(layout, dtype=np.int32),
+                   np.array(sym_entry, dtype=np.int32), np.array(sym_code, dtype=np.uint8),
+                   np.array(sym_severity, dtype=np.uint8), notes_table, layouts, extras)
+
+    @classmethod
+    def from_storage(cls, storage: StorageBackend, symptoms: List[str],
+                     since: Optional[str] = None, until: Optional[str] = None) -> 'LogFrame':
+        return cls.from_records(storage.iter_range(since, until), symptoms)
+
+    @classmethod
+    def chunks(cls, records: Iterable[Dict], symptoms: List[str], size: int = DEFAULT_CHUNK) -> Iterator['LogFrame']:
+        """Stream records as frames of at most size entries."""
+        it = iter(records)
+        while True:
+            chunk = list(islice(it, size))
+            if not chunk:
+                return
+            yield cls.from_records(chunk, symptoms)
+
+    # Back to dicts
+
+    def dates(self) -> np.ndarray:
+        """ISO date strings for the day column ('' where the date is not columnar)."""
+        out = (EPOCH + self.day.astype('timedelta64[D]')).astype(str)
+        out[self.day == NO_DAY] = ''
+        return out
+
+    def to_records(self) -> List[Dict]:
+        dates = self.dates()
+        starts = np.searchsorted(self.sym_entry, np.arange(len(self) + 1))
+        names = self.symptoms
+        out = []
+        for i in range(len(self)):
+            extra = self.extras[i] or {}
+            values = {}
+            if self.day[i] != NO_DAY:
+                values['date'] = str(dates[i])
+            if self.profile[i]:
+                values['profile'] = int(self.profile[i])
+            if self.notes[i] != NO_NOTES:
+                values['notes'] = self.notes_table[self.notes[i]]
+            if self.has_symptoms[i]:
+                lo, hi = starts[i], starts[i + 1]
+                values['symptoms'] = [{'name': names[c], 'severity': int(s)}
+                                      for c, s in zip(self.sym_code[lo:hi], self.sym_severity[lo:hi])]
+            out.append({k: values[k] if k in values else extra[k] for k in self.layouts[self.layout[i]]})
+        return out
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.to_records())
+
+    # Vectorized filters: each returns a boolean mask over entries
+
+    def between(self, since: Optional[str] = None, until: Optional[str] = None) -> np.ndarray:
+        lo, hi = day_bounds(since, until)
+        mask = (self.day != NO_DAY) & (self.day >= lo)
+        if hi is not None:
+            mask &= self.day <= hi
+        return mask
+
+    def with_profile(self, profile: int) -> np.ndarray:
+        return self.profile == profile
+
+    def with_symptom(self, name: str, min_severity: int = 1) -> np.ndarray:
+        hits = (self.sym_code == self.symptoms.index(name)) & (self.sym_severity >= min_severity)
+        mask = np.zeros(len(self), dtype=bool)
+        mask[self.sym_entry[hits]] = True
+        return mask
+
+    def take(self, mask: np.ndarray) -> 'LogFrame':
+        """The entries where mask is True, as a new frame (sharing the string tables)."""
+        rows = np.flatnonzero(mask)
+        renumber = np.full(len(self), -1, dtype=np.int32)
+        renumber[rows] = np.arange(len(rows), dtype=np.int32)
+        keep = mask[self.sym_entry] if len(self.sym_entry) else np.zeros(0, dtype=bool)
+        return LogFrame(self.symptoms, self.day[rows], self.profile[rows], self.notes[rows],
+                        self.has_symptoms[rows], self.layout[rows],
+                        renumber[self.sym_entry[keep]], self.sym_code[keep], self.sym_severity[keep],
+                        self.notes_table, self.layouts, [self.extras[i] for i in rows])
+
+    # Vectorized aggregations
+
+    def daily_severity(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (days, severity[days, symptoms]): the worst severity reported per symptom
+        on each day that has a columnar date, 0 where not reported.
+        """
+        dated = self.day != NO_DAY
+        days = np.unique(self.day[dated])
+        matrix = np.zeros((len(days), len(self.symptoms)), dtype=np.uint8)
+        sym_days = self.day[self.sym_entry]
+        ok = sym_days != NO_DAY
+        np.maximum.at(matrix, (np.searchsorted(days, sym_days[ok]), self.sym_code[ok]), self.sym_severity[ok])
+        return days, matrix
+
+    def symptom_summary(self) -> Dict[str, Dict]:
+        """Per symptom: number of reports, mean and max severity."""
+        n = len(self.symptoms)
+        count = np.bincount(self.sym_code, minlength=n)
+        total = np.bincount(self.sym_code, weights=self.sym_severity, minlength=n)
+        worst = np.zeros(n, dtype=np.uint8)
+        np.maximum.at(worst, self.sym_code, self.sym_severity)
+        return {name: {'reports': int(count[i]),
+                       'mean': round(float(total[i] / count[i]), 2) if count[i] else None,
+                       'max': int(worst[i])}
+                for i, name in enumerate(self.symptoms)}
+
+    def profile_counts(self) -> Dict[int, int]:
+        counts = np.bincount(self.profile, minlength=1)
+        return {p: int(c) for p, c in enumerate(counts) if p and c}
@@ -0,0 +1,191 @@
+# Memoization for NLP extraction results
+# Results are keyed on the normalized note text plus a fingerprint of everything
+# that can change the output (EntityRuler patterns, urgency training data and the
+# installed spaCy/model/scikit-learn versions), so editing any of those simply
+# stops old entries from matching.
+import os
+import json
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional
+
+DEFAULT_MAXSIZE = 1024
+# Path of an SQLite file to use as the on-disk cache; read when the cache is first
+# used, so worker processes started by batch triage pick it up too
+DISK_CACHE_ENV = 'CLAISEN_NLP_CACHE'
+# Fingerprints whose rows the disk cache keeps (most recently opened first): enough
+# for processes in different --nlp-modes to share it, while old versions age out
+DISK_FINGERPRINTS = 4
+# Bump when extract_symptoms_from_text changes in a way that alters its output
+EXTRACTOR_VERSION = 2
+VERSIONED_PACKAGES = ['spacy', 'en_core_web_sm', 'scikit-learn']
+
+def normalize_text(text: str) -> str:
+    """Trim and collapse runs of whitespace; extraction runs on this form."""
+    return ' '.join(text.split())
+
+def _package_versions() -> List[str]:
+    from importlib import metadata
+    out = []
+    for name in VERSIONED_PACKAGES:
+        try:
+            out.append(f"{name}={metadata.version(name)}")
+        except metadata.PackageNotFoundError:
+            out.append(f"{name}=none")
+    return out
+
+def extraction_fingerprint(*parts) -> str:
+    """Hash the given JSON-serialisable parts together with the package versions."""
+    payload = json.dumps([EXTRACTOR_VERSION, _package_versions(), list(parts)], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+def _copy_findings(findings: Dict) -> Dict:
+    # Callers get their own lists; entity tuples are immutable and can be shared
+    return {k: list(v) if isinstance(v, list) else v for k, v in findings.items()}
+
+def _from_json(raw: str) -> Dict:
+    findings = json.loads(raw)
+    if 'entities' in findings:
+        findings['entities'] = [tuple(e) for e in findings['entities']]
+    return findings
+
+class DiskCache:
+    """
+    SQLite table of key -> findings JSON, with rows tagged by fingerprint.
+    Opening the cache marks its fingerprint as used; rows of all but the
+    DISK_FINGERPRINTS most recently used fingerprints are deleted, so caches
+    opened with different pipelines (e.g. the daemon and the CLI in other
+    --nlp-modes) share the file without wiping each other's results.
+    """
+    def __init__(self, path: str, fingerprint: str, keep: int = DISK_FINGERPRINTS):
+        import sqlite3
+        self.fingerprint = fingerprint
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        with self.conn:
+            # The first version kept one fingerprint and emptied its table when it changed
+            self.conn.execute('DROP TABLE IF EXISTS meta')
+            self.conn.execute('DROP TABLE IF EXISTS findings')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS fingerprints (fingerprint TEXT PRIMARY KEY, used REAL)')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, fingerprint TEXT, value TEXT)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS results_fingerprint ON results (fingerprint)')
+            self.conn.execute('INSERT OR REPLACE INTO fingerprints VALUES (?, ?)', (fingerprint, time.time()))
+            stale = [row[0] for row in self.conn.execute(
+                'SELECT fingerprint FROM fingerprints ORDER BY used DESC LIMIT -1 OFFSET ?', (keep,))]
+            for old in stale:
+                self.conn.execute('DELETE FROM results WHERE fingerprint = ?', (old,))
+                self.conn.execute('DELETE FROM fingerprints WHERE fingerprint = ?', (old,))
+
+    def get(self, key: str) -> Optional[Dict]:
+        row = self.conn.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+        return _from_json(row[0]) if row else None
+
+    def put_many(self, items: Dict[str, Dict]):
+        with self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO results VALUES (?, ?, ?)',
+                                  [(k, self.fingerprint, json.dumps(v)) for k, v in items.items()])
+
+class ExtractionCache:
+    """
+    Bounded LRU of extraction results, optionally backed by a DiskCache.
+    fingerprint is a callable so that the package-version lookup only happens
+    once the cache is actually used.
+    """
+    def __init__(self, fingerprint: Callable[[], str], maxsize: int = DEFAULT_MAXSIZE):
+        self._fingerprint_fn = fingerprint
+        self._fingerprint = None
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.disk = None
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0}
+
+    @property
+    def fingerprint(self) -> str:
+        if self._fingerprint is None:
+            self._fingerprint = self._fingerprint_fn()
+        return self._fingerprint
+
+    def enable_disk(self, path: str):
+        self.disk = DiskCache(path, self.fingerprint)
+
+    def _check_disk_env(self):
+        path = os.environ.get(DISK_CACHE_ENV)
+        if path and self.disk is None:
+            import sqlite3
+            try:
+                self.enable_disk(path)
+            except sqlite3.Error:
+                # An unusable cache file only costs us the disk tier
+                os.environ.pop(DISK_CACHE_ENV, None)
+
+    def add_stats(self, delta: Dict[str, int]):
+        for k, v in delta.items():
+            self.stats[k] = self.stats.get(k, 0) + v
+
+    def clear(self):
+        self.entries.clear()
+        self._fingerprint = None
+        self.disk = None
+
+    def key(self, normalized: str) -> str:
+        return hashlib.sha256(f"{self.fingerprint}\0{normalized}".encode('utf-8')).hexdigest()
+
+    def _remember(self, key: str, findings: Dict):
+        self.entries[key] = findings
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def lookup(self, key: str) -> Optional[Dict]:
+        findings = self.entries.get(key)
+        if findings is not None:
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return _copy_findings(findings)
+        if self.disk is not None:
+            findings = self.disk.get(key)
+            if findings is not None:
+                self._remember(key, findings)
+                self.stats['disk_hits'] += 1
+                return _copy_findings(findings)
+        self.stats['misses'] += 1
+        return None
+
+    def store(self, items: Dict[str, Dict]):
+        for key, findings in items.items():
+            self._remember(key, _copy_findings(findings))
+        if self.disk is not None and items:
+            self.disk.put_many(items)
+
+    def get_or_compute(self, text: str, compute: Callable[[str], Dict]) -> Dict:
+        self._check_disk_env()
+        normalized = normalize_text(text)
+        key = self.key(normalized)
+        findings = self.lookup(key)
+        if findings is None:
+            findings = compute(normalized)
+            self.store({key: findings})
+        return findings
+
+    def get_or_compute_many(self, texts: List[str], compute_many: Callable[[List[str]], Iterable[Dict]]) -> List[Dict]:
+        """Batch form: only the texts that miss are passed (normalized) to compute_many."""
+        self._check_disk_env()
+        out = [None] * len(texts)
+        missing = OrderedDict()
+        for i, text in enumerate(texts):
+            normalized = normalize_text(text)
+            key = self.key(normalized)
+            findings = self.lookup(key)
+            if findings is None:
+                missing.setdefault(key, (normalized, []))[1].append(i)
+            else:
+                out[i] = findings
+        if missing:
+            computed = {}
+            for (key, (_, slots)), findings in zip(missing.items(), compute_many([n for n, _ in missing.values()])):
+                computed[key] = findings
+                for i in slots:
+                    out[i] = _copy_findings(findings)
+            self.store(computed)
+        return out
@@ -0,0 +1,153 @@
+# Compiled form of TRIAGE_QUESTIONS
+# The question list is compiled once, at import, into a QuestionGraph: an id
+# index, an option -> position map per question, and one branching predicate
+# per question built from its `ask_if`. The CLI walker, batch triage and the
+# daemon all share QUESTION_GRAPH, so supplied answers are validated with a
+# dict lookup per answer instead of scans of the question list.
+#
+# `ask_if` maps earlier question ids to the answer that makes this question
+# apply, or to a list of acceptable answers; all of its entries must hold:
+#   "ask_if": {"demographics_gender": "Female"}
+#   "ask_if": {"demographics_gender": "Female", "symptom_frequency": ["Daily", "Weekly"]}
+# A condition may only refer to a question asked before it, so one forward
+# pass decides every predicate after the answers it depends on are known.
+from typing import Dict, FrozenSet, Iterator, List, Optional, Tuple
+from .triage_questions import TRIAGE_QUESTIONS
+
+QUESTION_TYPES = ('choice', 'multi_choice', 'int', 'text')
+
+class Question:
+    __slots__ = ('position', 'id', 'text', 'type', 'options', 'option_index', 'ask_if')
+
+    def __init__(self, position: int, q: Dict, ask_if: Tuple[Tuple[str, FrozenSet], ...]):
+        self.position = position
+        self.id = q['id']
+        self.text = q['text']
+        self.type = q['type']
+        self.options = tuple(q.get('options', ()))
+        self.option_index = {o: i for i, o in enumerate(self.options)}
+        self.ask_if = ask_if
+
+    def applies(self, answers: Dict) -> bool:
+        """Whether this question is asked, given the answers so far."""
+        for key, accepted in self.ask_if:
+            value = answers.get(key)
+            if value.__hash__ is None or value not in accepted:
+                return False
+        return True
+
+    def check(self, value):
+        """Return value, normalized (ints from digit strings); raise ValueError if it is not a valid answer."""
+        if self.type == 'choice':
+            if value.__hash__ is None or value not in self.option_index:
+                raise ValueError(f"{self.id}: {value!r} is not one of the options")
+            return value
+        if self.type == 'multi_choice':
+            # Typed as free text at the prompt; a JSON list must name options
+            if isinstance(value, list):
+                bad = [v for v in value if v.__hash__ is None or v not in self.option_index]
+                if bad:
+                    raise ValueError(f"{self.id}: {bad[0]!r} is not one of the options")
+                return value
+            if not isinstance(value, str):
+                raise ValueError(f"{self.id}: expected text or a list of options")
+            return value
+        if self.type == 'int':
+            if isinstance(value, bool):
+                raise ValueError(f"{self.id}: expected a whole number")
+            if isinstance(value, int):
+                return value
+            if isinstance(value, str) and value.strip().lstrip('-').isdigit():
+                return int(value)
+            raise ValueError(f"{self.id}: expected a whole number, got {value!r}")
+        if not isinstance(value, str):
+            raise ValueError(f"{self.id}: expected text")
+        return value
+
+def compile_questions(questions: List[Dict]) -> List[Question]:
+    """
+    Build Question objects, checking ids, types and every ask_if condition.
+    Raises ValueError listing all problems found.
+    """
+    problems = []
+    compiled = []
+    by_id = {}
+    for position, q in enumerate(questions):
+        qid = q.get('id')
+        if qid in by_id:
+            problems.append(f"{qid}: duplicate question id")
+        if q.get('type') not in QUESTION_TYPES:
+            problems.append(f"{qid}: unknown type {q.get('type')!r}")
+        if q.get('type') in ('choice', 'multi_choice') and not q.get('options'):
+            problems.append(f"{qid}: {q['type']} question has no options")
+        ask_if = []
+        for key, accepted in q.get('ask_if', {}).items():
+            accepted = accepted if isinstance(accepted, list) else [accepted]
+            dep = by_id.get(key)
+            if dep is None:
+                where = 'unknown' if all(other['id'] != key for other in questions) else 'later'
+                problems.append(f"{qid}: ask_if refers to {where} question '{key}'")
+                continue
+            for value in accepted:
+                if dep.options and value not in dep.option_index:
+                    problems.append(f"{qid}: ask_if value {value!r} is not an option of '{key}'")
+            ask_if.append((key, frozenset(accepted)))
+        question = Question(position, q, tuple(ask_if))
+        compiled.append(question)
+        by_id.setdefault(qid, question)
+    if problems:
+        raise ValueError("Invalid triage questions:\n" + "\n".join(problems))
+    return compiled
+
+class QuestionGraph:
+    def __init__(self, questions: List[Dict] = TRIAGE_QUESTIONS):
+        self.questions = tuple(compile_questions(questions))
+        self.by_id = {q.id: q for q in self.questions}
+        # Questions whose ask_if reads each id
+        dependents = {}
+        for q in self.questions:
+            for key, _ in q.ask_if:
+                dependents.setdefault(key, []).append(q.id)
+        self.dependents = {k: tuple(v) for k, v in dependents.items()}
+
+    def __getitem__(self, qid: str) -> Question:
+        return self.by_id[qid]
+
+    def option_index(self, qid: str, option: str) -> Optional[int]:
+        return self.by_id[qid].option_index.get(option)
+
+    def validate(self, answers: Dict) -> Tuple[Dict, List[str]]:
+        """
+        Check supplied answers: each id must be a known question and each value
+        a valid answer to it. Returns (normalized answers, problems).
+        """
+        normalized = {}
+        problems = []
+        for qid, value in answers.items():
+            q = self.by_id.get(qid)
+            if q is None:
+                problems.append(f"{qid}: unknown question")
+                continue
+            try:
+                normalized[qid] = q.check(value)
+            except ValueError as e:
+                problems.append(str(e))
+        return normalized, problems
+
+    def pending(self, answers: Dict) -> Iterator[Question]:
+        """
+        Yield, in order, each question that applies and has no answer yet.
+        Answers the caller adds to `answers` while iterating are taken into
+        account for the questions after them, so a walker can prompt as it goes.
+        """
+        for q in self.questions:
+            if q.ask_if and not q.applies(answers):
+                continue
+            if q.id not in answers:
+                yield q
+
+    def asked(self, answers: Dict) -> List[str]:
+        """Ids of the questions that apply to a complete answer set, in order."""
+        return [q.id for q in self.questions if not q.ask_if or q.applies(answers)]
+
+QUESTION_GRAPH = QuestionGraph()
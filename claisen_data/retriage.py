@@ -0,0 +1,295 @@
+# Re-triage stored log entries (`retriage`)
+# After the profile rules change, every triage entry's profile, profile_reason,
+# recommendation and nlp_extracted are derived again from its stored
+# triage_answers and notes; follow-up entries are stepped again from the
+# re-triaged entry before them (followup.reassess). The log is streamed a chunk
+# of lines at a time: triage entries are scored through batch.score_chunks (so
+# --workers applies) and every line is written to <log>.retriage, with lines
+# that do not change copied byte for byte. After each chunk the output is
+# flushed and <log>.retriage.ckpt records how far the log and the output have
+# got, so an interrupted run resumes where it stopped (if the log is still the
+# same file). The last lines (anything appended meanwhile) are done under the
+# log's write lock, then the output replaces the log and the date index and
+# rollups are rebuilt. If the log was rewritten meanwhile (e.g. an import
+# merged older entries into it), the output is discarded instead. Memory holds
+# a few chunks and the change counts, however long the history is.
+import os
+import json
+import hashlib
+from collections import deque
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from .storage import JsonLinesStorage, _decode, _replace_file
+from .rollups import Rollups
+from .batch import score_chunks, DEFAULT_BATCH_SIZE
+from .triage_rules import PROFILE_RULES, ALARM_RULE, NLP_URGENT_RULE, NLP_NOCTURNAL_RULE
+from .triage_engine import EXTRACTION_CACHE
+from . import followup
+
+OUTPUT_SUFFIX = '.retriage'
+CHECKPOINT_SUFFIX = '.retriage.ckpt'
+CHECKPOINT_VERSION = 2
+DEFAULT_CHUNK = 2000
+DERIVED_FIELDS = ['profile', 'profile_reason', 'recommendation', 'nlp_extracted', 'followup']
+# Bytes of the log, from its start and from just before the checkpoint, hashed
+# to tell a resumed run that it is still the same file
+HEAD_BYTES = 4096
+
+class LogReplaced(RuntimeError):
+    """The log was rewritten (not just appended to) while retriage was reading it."""
+
+def rules_fingerprint() -> str:
+    """Hash of everything that decides a re-triaged entry: the rule tables and the extraction setup."""
+    tables = [PROFILE_RULES, ALARM_RULE, NLP_URGENT_RULE, NLP_NOCTURNAL_RULE, followup.FOLLOWUP_SIGNALS,
+              followup.TREND_THRESHOLD, followup.ESCALATE, followup.DEESCALATE, followup.NOCTURNAL_SIGNALS,
+              followup.NOCTURNAL_PROFILE, EXTRACTION_CACHE.fingerprint]
+    payload = json.dumps(tables, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+def _head(fd: int, offset: int) -> str:
+    # Only bytes already processed, so appends after them do not count as a different log;
+    # pread leaves the position of a file being read through fd alone
+    digest = hashlib.sha256(os.pread(fd, min(HEAD_BYTES, offset), 0))
+    digest.update(os.pread(fd, min(HEAD_BYTES, offset), max(offset - HEAD_BYTES, 0)))
+    return digest.hexdigest()[:16]
+
+def _file_id(st: os.stat_result) -> List[int]:
+    # Every rewrite of the log replaces the file, so a new inode means a different log
+    return [st.st_dev, st.st_ino]
+
+def _is_triage(record: Optional[Dict]) -> bool:
+    return record is not None and isinstance(record.get('triage_answers'), dict)
+
+def new_summary() -> Dict:
+    return {'entries': 0, 'triage': 0, 'updated': 0, 'profile_changed': 0, 'errors': 0, 'transitions': {}}
+
+def _lines(f, stop: Optional[int] = None) -> Iterator[Tuple[int, bytes]]:
+    """(end offset, line) for each complete line from the file's position, up to stop."""
+    pos = f.tell()
+    for line in f:
+        if not line.endswith(b'\n') and stop is None:
+            return
+        pos += len(line)
+        yield pos, line
+        if stop is not None and pos >= stop:
+            return
+
+class Retriage:
+    """
+    One re-triage run over a JSON Lines log. run() does the work and returns
+    the summary; with dry_run nothing is written (not even a checkpoint).
+    changes_path, if given, gets one JSON line per updated entry with the old
+    and new value of each derived field that changed.
+    """
+    def __init__(self, storage: JsonLinesStorage, rollups: Rollups, chunk: int = DEFAULT_CHUNK, workers: int = 1,
+                 batch_size: int = DEFAULT_BATCH_SIZE, dry_run: bool = False, changes_path: Optional[str] = None):
+        self.storage = storage
+        self.rollups = rollups
+        self.chunk = chunk
+        self.workers = workers
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.changes_path = changes_path
+        self.output_path = storage.path + OUTPUT_SUFFIX
+        self.checkpoint_path = storage.path + CHECKPOINT_SUFFIX
+        self.fingerprint = rules_fingerprint()
+        self.summary = new_summary()
+        self.previous = None
+        # Schemas the output carries (see JsonLinesStorage._encode_all)
+        self.in_log = set()
+        self.offset = 0
+        self.resumed_from = None
+
+    # Checkpoints
+
+    def load_checkpoint(self) -> Optional[Dict]:
+        """
+        The checkpoint of an earlier run, if it can be resumed: same rules,
+        same log file (only appended to since), output intact.
+        """
+        try:
+            with open(self.checkpoint_path, 'r') as f:
+                ckpt = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            with open(self.storage.path, 'rb') as f:
+                st = os.fstat(f.fileno())
+                same_log = (ckpt['log'] == _file_id(st) and ckpt['offset'] <= st.st_size
+                            and ckpt['head'] == _head(f.fileno(), ckpt['offset']))
+            resumable = (ckpt.get('version') == CHECKPOINT_VERSION and ckpt['fingerprint'] == self.fingerprint
+                         and same_log and self.storage._at_line_start(ckpt['offset'])
+                         and os.path.getsize(self.output_path) >= ckpt['output_size']
+                         and (not self.changes_path or ckpt.get('changes_path') == self.changes_path
+                              and os.path.getsize(self.changes_path) >= ckpt['changes_size']))
+        except (OSError, KeyError, TypeError):
+            return None
+        return ckpt if resumable else None
+
+    def save_checkpoint(self, f, out, changes):
+        out.flush()
+        os.fsync(out.fileno())
+        if changes is not None:
+            changes.flush()
+        ckpt = {'version': CHECKPOINT_VERSION, 'fingerprint': self.fingerprint,
+                'log': _file_id(os.fstat(f.fileno())), 'head': _head(f.fileno(), self.offset),
+                'offset': self.offset, 'output_size': out.tell(), 'changes_path': self.changes_path,
+                'changes_size': changes.tell() if changes is not None else 0,
+                'previous': self.previous, 'summary': self.summary, 'in_log': sorted(self.in_log)}
+        _replace_file(self.checkpoint_path, json.dumps(ckpt).encode('utf-8'))
+
+    def discard(self):
+        """Remove the output and checkpoint of an unfinished run."""
+        for path in (self.output_path, self.checkpoint_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    # Scoring
+
+    def _chunks(self, f, stop: Optional[int], pending: deque) -> Iterator[List[Dict]]:
+        """Batch input for score_chunks, one list per chunk of log lines; the lines go on pending."""
+        lines = []
+        for end, line in _lines(f, stop):
+            lines.append((end, line))
+            if len(lines) >= self.chunk:
+                yield self._queue(lines, pending)
+                lines = []
+        if lines:
+            yield self._queue(lines, pending)
+
+    def _queue(self, lines: List[Tuple[int, bytes]], pending: deque) -> List[Dict]:
+        records = [self.storage._expand(_decode(line)) for _, line in lines]
+        pending.append((lines, records))
+        return [{'id': i, 'answers': r['triage_answers'], 'notes': r.get('notes')}
+                for i, r in enumerate(records) if _is_triage(r)]
+
+    def _rederive(self, record: Dict, result: Dict) -> Dict:
+        """record with its derived fields replaced by result (a batch result or error)."""
+        if 'error' in result:
+            self.summary['errors'] += 1
+            return record
+        if 'followup' in record and self.previous is not None:
+            result = followup.reassess(self.previous, record['triage_answers'], result)
+        updated = dict(record)
+        updated.update({'profile': result['profile'], 'profile_reason': result['reason'],
+                        'recommendation': result.get('recommendation', ''),
+                        'nlp_extracted': result.get('nlp_extracted', {})})
+        if 'followup' in result and 'followup' in record:
+            updated['followup'] = result['followup']
+        return updated
+
+    def _diff(self, old: Dict, new: Dict) -> Dict:
+        return {k: [old.get(k), new.get(k)] for k in DERIVED_FIELDS
+                if k in new and json.dumps(old.get(k)) != json.dumps(new.get(k))}
+
+    def _write_chunk(self, lines, records, results, out, changes):
+        by_index = {r['id']: r for r in results}
+        payloads = []
+        for i, ((end, line), record) in enumerate(zip(lines, records)):
+            self.offset = end
+            if record is not None:
+                self.summary['entries'] += 1
+            if not _is_triage(record):
+                payloads.append(line)
+                continue
+            self.summary['triage'] += 1
+            new = self._rederive(record, by_index[i])
+            diff = self._diff(record, new)
+            self.previous = new
+            if not diff:
+                payloads.append(line)
+                continue
+            self.summary['updated'] += 1
+            if 'profile' in diff:
+                self.summary['profile_changed'] += 1
+                key = f"{record.get('profile')}->{new['profile']}"
+                self.summary['transitions'][key] = self.summary['transitions'].get(key, 0) + 1
+            if changes is not None:
+                changes.write(json.dumps({'date': new.get('date'), **diff}) + '\n')
+            payloads.append(None if out is None else new)
+        if out is None:
+            return
+        # Encoded under the lock: packing may add the current schema to <log>.schemas
+        with self.storage.lock:
+            encoded = iter(self.storage._encode_all([p for p in payloads if isinstance(p, dict)], self.in_log))
+        out.write(b''.join(next(encoded) if isinstance(p, dict) else p for p in payloads))
+
+    def _process(self, f, out, changes, stop: Optional[int] = None, workers: int = 1, progress=None):
+        """Re-triage lines from f's position (to stop, or the last complete line), checkpointing after each chunk."""
+        pending = deque()
+        for results in score_chunks(self._chunks(f, stop, pending), self.batch_size, workers):
+            lines, records = pending.popleft()
+            self._write_chunk(lines, records, results, out, changes)
+            if out is not None and stop is None:
+                self.save_checkpoint(f, out, changes)
+            if progress is not None:
+                progress(self.summary, self.offset)
+
+    # Run
+
+    def run(self, restart: bool = False, progress: Optional[Callable[[Dict, int], None]] = None) -> Dict:
+        """
+        Re-triage the whole log and replace it with the result. Resumes from a
+        matching checkpoint unless restart is set. progress(summary, offset) is
+        called after each chunk. Raises LogReplaced (having discarded the
+        output) if the log was rewritten before the run could take its lock.
+        """
+        ckpt = None if (restart or self.dry_run) else self.load_checkpoint()
+        if ckpt is not None:
+            self.offset, self.previous, self.summary = ckpt['offset'], ckpt['previous'], ckpt['summary']
+            self.in_log = set(ckpt.get('in_log', []))
+            self.resumed_from = ckpt['offset']
+        out = changes = None
+        if not self.dry_run:
+            out = open(self.output_path, 'r+b' if ckpt else 'wb')
+            out.truncate(ckpt['output_size'] if ckpt else 0)
+            out.seek(0, os.SEEK_END)
+        if self.changes_path:
+            changes = open(self.changes_path, 'r+' if ckpt else 'w')
+            changes.truncate(ckpt['changes_size'] if ckpt else 0)
+            changes.seek(0, os.SEEK_END)
+        try:
+            with open(self.storage.path, 'rb') as f:
+                f.seek(self.offset)
+                self._process(f, out, changes, workers=self.workers, progress=progress)
+                # Whatever was appended while we worked, then swap the logs, all under the write lock
+                with self.storage.lock:
+                    if _file_id(os.fstat(f.fileno())) != _file_id(os.stat(self.storage.path)):
+                        raise LogReplaced(f"{self.storage.path} was rewritten while retriage read it (e.g. an import "
+                                          f"merged older entries in); nothing was changed")
+                    f.seek(self.offset)
+                    self._process(f, out, changes, stop=os.path.getsize(self.storage.path))
+                    if out is not None:
+                        self._finish(out)
+                        out = None
+        except LogReplaced:
+            if out is not None:
+                out.close()
+                out = None
+                self.discard()
+            raise
+        finally:
+            if out is not None:
+                out.close()
+            if changes is not None:
+                changes.close()
+        return self.summary
+
+    def _finish(self, out):
+        out.flush()
+        os.fsync(out.fileno())
+        out.close()
+        storage = self.storage
+        os.replace(self.output_path, storage.path)
+        if storage.fsync == 'full' and hasattr(os, 'O_DIRECTORY'):
+            fd = os.open(os.path.dirname(storage.path) or '.', os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        # Nothing re-encoded means the log's bytes, and the schemas it carries, are unchanged
+        if self.in_log:
+            storage._note_carried(self.in_log)
+        storage.rebuild_index()
+        self.rollups.rebuild((end, r) for _, end, r in storage.iter_with_offsets(expand=False))
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
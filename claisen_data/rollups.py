@@ -0,0 +1,311 @@
+# Symptom trend rollups
+# A fixed-size slot per calendar day, kept next to the log like the date index:
+# how many symptom and triage entries were logged that day and the worst
+# severity reported for each symptom. Profile changes from triage entries are
+# appended to a second file as fixed-size records, and the header keeps where
+# the latest triage entry ends in the log, so follow-ups find it with one seek. Both are written with plain
+# struct packing on every add/triage (no NumPy on the write path) and read back
+# as NumPy arrays by `stats`, which reduces them to weekly/monthly figures,
+# streaks and transition counts.
+#
+#   <log>.rollup        header + one slot per day since 1970-01-01
+#   <log>.transitions   (day, from profile, to profile) per profile change
+import os
+import zlib
+import struct
+from typing import Dict, Iterator, List, Optional, Tuple
+from .storage import StorageBackend, JsonLinesStorage, day_number
+
+ROLLUP_MAGIC = b'CLXR'
+ROLLUP_VERSION = 2
+# magic, version, covered log size, first day, last day, last profile, symptoms crc,
+# end offset of the latest triage entry (0 if none, or if the backend has no offsets)
+ROLLUP_HEADER = struct.Struct('<4sHQiiBIQ')
+ROLLUP_HEADER_SIZE = 64
+TRANSITION = struct.Struct('<iBBH')  # day, from profile, to profile, padding
+# Slot fields before the per-symptom severities
+SLOT_PREFIX = 2  # symptom entries, triage entries
+
+def _symptoms_crc(symptoms: List[str]) -> int:
+    return zlib.crc32(','.join(symptoms).encode('utf-8'))
+
+def _count(value: int) -> int:
+    # Per-day counters are one byte; a day with 255+ entries just stays at 255
+    return min(value + 1, 255)
+
+def _severity(value) -> int:
+    try:
+        return max(0, min(int(value), 255))
+    except (TypeError, ValueError):
+        return 0
+
+def _profile(value) -> int:
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return 0
+    return value if 0 < value < 256 else 0
+
+class Rollups:
+    """
+    Daily rollup slots for one log. symptoms fixes the order of the severity
+    columns; changing it (e.g. adding a symptom) forces a rebuild.
+    """
+    def __init__(self, log_path: str, symptoms: List[str]):
+        self.path = log_path + '.rollup'
+        self.transitions_path = log_path + '.transitions'
+        self.symptoms = list(symptoms)
+        self.slot = struct.Struct('<' + 'B' * (SLOT_PREFIX + len(self.symptoms)))
+        self.crc = _symptoms_crc(self.symptoms)
+        self.column = {name: i for i, name in enumerate(self.symptoms)}
+
+    def header(self) -> Optional[Tuple[int, int, int, int, int]]:
+        """Return (covered_size, first_day, last_day, last_profile, last_triage_end), or None if missing/stale."""
+        try:
+            with open(self.path, 'rb') as f:
+                raw = f.read(ROLLUP_HEADER.size)
+        except FileNotFoundError:
+            return None
+        if len(raw) < ROLLUP_HEADER.size:
+            return None
+        magic, version, covered, first_day, last_day, last_profile, crc, last_triage = ROLLUP_HEADER.unpack(raw)
+        if magic != ROLLUP_MAGIC or version != ROLLUP_VERSION or crc != self.crc:
+            return None
+        return covered, first_day, last_day, last_profile, last_triage
+
+    def _write_header(self, f, covered, first_day, last_day, last_profile, last_triage):
+        f.seek(0)
+        f.write(ROLLUP_HEADER.pack(ROLLUP_MAGIC, ROLLUP_VERSION, covered, first_day, last_day,
+                                   last_profile, self.crc, last_triage).ljust(ROLLUP_HEADER_SIZE, b'\0'))
+
+    def _fold(self, slot: List[int], record: Dict) -> List[int]:
+        """Add one record to a day's slot values."""
+        if 'symptoms' in record:
+            slot[0] = _count(slot[0])
+            for s in record.get('symptoms') or []:
+                col = self.column.get(s.get('name')) if isinstance(s, dict) else None
+                if col is not None:
+                    slot[SLOT_PREFIX + col] = max(slot[SLOT_PREFIX + col], _severity(s.get('severity')))
+        if 'profile' in record or 'triage_answers' in record:
+            slot[1] = _count(slot[1])
+        return slot
+
+    def rebuild(self, entries: Iterator[Tuple[int, Dict]], covered: int = 0):
+        """
+        Rewrite both files from (end offset, record) pairs in log order.
+        covered defaults to the end of the last record.
+        """
+        slots = {}
+        transitions = []
+        last_profile = 0
+        last_triage = 0
+        for end, record in entries:
+            covered = max(covered, end)
+            if 'triage_answers' in record:
+                last_triage = end
+            n = day_number(record.get('date'))
+            if n is None:
+                continue
+            slots[n] = self._fold(slots.get(n) or [0] * self.slot.size, record)
+            profile = _profile(record.get('profile'))
+            if profile and profile != last_profile:
+                transitions.append(TRANSITION.pack(n, last_profile, profile, 0))
+                last_profile = profile
+        first_day = min(slots) if slots else -1
+        last_day = max(slots) if slots else -1
+        tmp = self.transitions_path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(b''.join(transitions))
+        os.replace(tmp, self.transitions_path)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as f:
+            self._write_header(f, covered, first_day, last_day, last_profile, last_triage)
+            for n in sorted(slots):
+                f.seek(ROLLUP_HEADER_SIZE + n * self.slot.size)
+                f.write(self.slot.pack(*slots[n]))
+        os.replace(tmp, self.path)
+
+    def add(self, record: Dict, end: int):
+        """Fold one appended record (ending at byte end of the log) into the rollups."""
+        self.add_many([(end, record)])
+
+    def add_many(self, entries: List[Tuple[int, Dict]]):
+        """Fold (end offset, record) pairs appended in log order, in one open of each file."""
+        if not entries:
+            return
+        covered, first_day, last_day, last_profile, last_triage = self.header()
+        transitions = []
+        with open(self.path, 'r+b') as f:
+            for end, record in entries:
+                if 'triage_answers' in record:
+                    last_triage = end
+                n = day_number(record.get('date'))
+                if n is None:
+                    continue
+                f.seek(ROLLUP_HEADER_SIZE + n * self.slot.size)
+                raw = f.read(self.slot.size)
+                slot = list(self.slot.unpack(raw)) if len(raw) == self.slot.size else [0] * self.slot.size
+                f.seek(ROLLUP_HEADER_SIZE + n * self.slot.size)
+                f.write(self.slot.pack(*self._fold(slot, record)))
+                first_day = n if first_day < 0 else min(first_day, n)
+                last_day = max(last_day, n)
+                profile = _profile(record.get('profile'))
+                if profile and profile != last_profile:
+                    transitions.append(TRANSITION.pack(n, last_profile, profile, 0))
+                    last_profile = profile
+            if transitions:
+                with open(self.transitions_path, 'ab') as t:
+                    t.write(b''.join(transitions))
+            self._write_header(f, entries[-1][0], first_day, last_day, last_profile, last_triage)
+
+    def sync(self, storage: StorageBackend):
+        """
+        Bring the rollups in line with the log: catch up on records appended
+        since the last sync, or rebuild from scratch if the files are missing,
+        from another symptom list, or cover more (or other) bytes than the log.
+        Only rollups that need work take the log's write lock.
+        """
+        size = os.path.getsize(storage.path) if storage.exists() else 0
+        header = self.header()
+        if header is not None and header[0] == size and os.path.exists(self.transitions_path):
+            return
+        with storage.lock:
+            self._sync(storage)
+
+    def rebuild_from(self, storage: StorageBackend):
+        """Rebuild from every record in the log, e.g. after records were moved in a rewrite."""
+        if isinstance(storage, JsonLinesStorage):
+            self.rebuild((end, record) for _, end, record in storage.iter_with_offsets(expand=False))
+        else:
+            size = os.path.getsize(storage.path) if storage.exists() else 0
+            self.rebuild(((0, record) for record in storage.iter_records()), covered=size)
+
+    def _sync(self, storage: StorageBackend):
+        size = os.path.getsize(storage.path) if storage.exists() else 0
+        header = self.header()
+        incremental = isinstance(storage, JsonLinesStorage)
+        if (header is None or header[0] > size or not os.path.exists(self.transitions_path)
+                or (incremental and not storage._at_line_start(header[0]))
+                or (not incremental and header[0] != size)):
+            self.rebuild_from(storage)
+            return
+        if incremental and header[0] < size:
+            self.add_many([(end, record) for _, end, record in storage.iter_with_offsets(header[0], expand=False)])
+
+    def load(self):
+        """Return (days, symptom counts, triage counts, severities[days, symptoms]) as NumPy arrays."""
+        import numpy as np
+        header = self.header()
+        if header is None or header[1] < 0:
+            return (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.uint8), np.empty(0, dtype=np.uint8),
+                    np.empty((0, len(self.symptoms)), dtype=np.uint8))
+        _, first_day, last_day, _, _ = header
+        n_days = last_day - first_day + 1
+        with open(self.path, 'rb') as f:
+            f.seek(ROLLUP_HEADER_SIZE + first_day * self.slot.size)
+            raw = np.frombuffer(f.read(n_days * self.slot.size), dtype=np.uint8)
+        # The file is sparse: a day never written past the last full slot reads short
+        slots = np.zeros(n_days * self.slot.size, dtype=np.uint8)
+        slots[:len(raw)] = raw
+        slots = slots.reshape(n_days, self.slot.size)
+        days = np.arange(first_day, last_day + 1, dtype=np.int32)
+        return days, slots[:, 0], slots[:, 1], slots[:, SLOT_PREFIX:]
+
+    def load_transitions(self):
+        """Return (days, from profiles, to profiles) as NumPy arrays."""
+        import numpy as np
+        dtype = np.dtype([('day', '<i4'), ('from', 'u1'), ('to', 'u1'), ('pad', '<u2')])
+        try:
+            records = np.fromfile(self.transitions_path, dtype=dtype)
+        except (FileNotFoundError, ValueError):
+            records = np.empty(0, dtype=dtype)
+        return records['day'], records['from'], records['to']
+
+# Query side
+
+def _runs(mask) -> Tuple[int, int]:
+    """(longest run of True, run of True ending at the last element) for a bool array."""
+    import numpy as np
+    if not len(mask) or not mask.any():
+        return 0, 0
+    padded = np.concatenate(([False], mask, [False])).astype(np.int8)
+    edges = np.flatnonzero(np.diff(padded))
+    starts, ends = edges[::2], edges[1::2]
+    lengths = ends - starts
+    current = int(lengths[-1]) if ends[-1] == len(mask) else 0
+    return int(lengths.max()), current
+
+def period_ids(days, period: str):
+    """Map day numbers to week (Monday-based) or month ids, with a label per id."""
+    import numpy as np
+    if period == 'week':
+        # 1970-01-01 was a Thursday, so day + 3 counts from the preceding Monday
+        ids = (days + 3) // 7
+        labels = lambda ids: [str(np.datetime64('1970-01-01') + np.timedelta64(int(i) * 7 - 3, 'D')) for i in ids]
+    elif period == 'month':
+        ids = (np.datetime64('1970-01-01') + days.astype('timedelta64[D]')).astype('datetime64[M]').astype(np.int64)
+        labels = lambda ids: [str(np.datetime64(int(i), 'M')) for i in ids]
+    else:
+        raise ValueError(f"Unknown period: {period} (choose 'week' or 'month')")
+    return ids, labels
+
+def trends(rollups: Rollups, period: str = 'week', last: Optional[int] = None) -> Dict:
+    """
+    Per-symptom mean and max severity per week or month, over the days that
+    symptom was reported. Returns {"periods": [labels], symptom: {"mean", "max", "days"}}.
+    """
+    import numpy as np
+    days, _, _, severity = rollups.load()
+    ids, labels = period_ids(days, period)
+    keys, inverse = np.unique(ids, return_inverse=True)
+    # Only the newest `last` periods are reported, but all are reduced in one pass
+    start = len(keys) if last is not None and last <= 0 else max(len(keys) - (last or len(keys)), 0)
+    out = {'periods': labels(keys[start:])}
+    for col, name in enumerate(rollups.symptoms):
+        sev = severity[:, col].astype(np.int64)
+        count = np.bincount(inverse, weights=sev > 0, minlength=len(keys))[start:]
+        total = np.bincount(inverse, weights=sev, minlength=len(keys))[start:]
+        worst = np.zeros(len(keys), dtype=np.int64)
+        np.maximum.at(worst, inverse, sev)
+        mean = total / np.maximum(count, 1)
+        out[name] = {'mean': [round(float(m), 2) if c else None for m, c in zip(mean, count)],
+                     'max': [int(m) for m in worst[start:]],
+                     'days': [int(c) for c in count]}
+    return out
+
+def summary(rollups: Rollups) -> Dict:
+    """Logged days, symptom-free days and streaks over the whole history."""
+    import numpy as np
+    days, logged, _, severity = rollups.load()
+    has_entry = logged > 0
+    free = has_entry & ~(severity > 0).any(axis=1)
+    longest_free, current_free = _runs(free)
+    longest_logged, current_logged = _runs(has_entry)
+    out = {
+        'first_day': str(np.datetime64('1970-01-01') + np.timedelta64(int(days[0]), 'D')) if len(days) else None,
+        'last_day': str(np.datetime64('1970-01-01') + np.timedelta64(int(days[-1]), 'D')) if len(days) else None,
+        'days_logged': int(has_entry.sum()),
+        'symptom_free_days': int(free.sum()),
+        'symptom_free_streak': {'longest': longest_free, 'current': current_free},
+        'logging_streak': {'longest': longest_logged, 'current': current_logged},
+        'symptom_streaks': {},
+    }
+    for col, name in enumerate(rollups.symptoms):
+        longest, current = _runs(severity[:, col] > 0)
+        out['symptom_streaks'][name] = {'longest': longest, 'current': current}
+    return out
+
+def transitions(rollups: Rollups, last: int = 10) -> Dict:
+    """Counts of each from -> to profile change, plus the most recent changes."""
+    import numpy as np
+    days, src, dst = rollups.load_transitions()
+    # The first triage entry is recorded as a change from profile 0 (none)
+    changed = src > 0
+    counts = {}
+    if changed.any():
+        pairs, n = np.unique(np.stack([src[changed], dst[changed]], axis=1), axis=0, return_counts=True)
+        counts = {f"{int(a)}->{int(b)}": int(c) for (a, b), c in zip(pairs, n)}
+    recent = [{'date': str(np.datetime64('1970-01-01') + np.timedelta64(int(d), 'D')),
+               'from': int(a) or None, 'to': int(b)}
+              for d, a, b in zip(days[-last:], src[-last:], dst[-last:])] if last > 0 else []
+    return {'counts': counts, 'recent': recent, 'current_profile': int(dst[-1]) if len(dst) else None}
@@ -0,0 +1,133 @@
+# Per-patient shards of the symptom log
+# Each patient gets a log of their own (with its date index and rollups) at
+# <home>/users/<first 2 hex digits of sha1(id)>/<id>/data.db, so reading or
+# writing one patient never touches another patient's files, and no directory
+# grows past a few hundred entries. users/manifest.json lists every patient
+# and their shard directory; cross-patient queries read it and fan out over
+# the shards in a process pool.
+import os
+import re
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from .storage import open_storage, _replace_file
+from .locking import WriteLock
+
+USERS_DIR = 'users'
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+LOG_NAME = 'data.db'
+USER_ID = re.compile(r'[A-Za-z0-9][A-Za-z0-9._-]{0,63}')
+
+def check_user_id(user: str) -> str:
+    """User ids become directory names, so only plain ASCII names are allowed."""
+    if not USER_ID.fullmatch(user or ''):
+        raise ValueError(f"Invalid user id: {user!r} (letters, digits, '.', '_' and '-', up to 64 characters)")
+    return user
+
+def shard_dir(user: str) -> str:
+    """The patient's shard directory, relative to the data home."""
+    bucket = hashlib.sha1(check_user_id(user).encode('utf-8')).hexdigest()[:2]
+    return os.path.join(USERS_DIR, bucket, user)
+
+def log_path(home: str, user: Optional[str] = None) -> str:
+    """The log for user under home, or the single-user log when user is None."""
+    if user is None:
+        return os.path.join(home, LOG_NAME)
+    return os.path.join(home, shard_dir(user), LOG_NAME)
+
+class ShardManifest:
+    """
+    users/manifest.json: {"version": 1, "users": {id: {"shard": dir, "created": iso}}}.
+    It is only rewritten when a patient's shard is first created, under its
+    own write lock so patients created concurrently are all kept.
+    """
+    def __init__(self, home: str):
+        self.home = home
+        self.path = os.path.join(home, USERS_DIR, MANIFEST_NAME)
+        self.lock = WriteLock(self.path + '.lock')
+
+    def load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return self.rebuild() if os.path.isdir(os.path.dirname(self.path)) else {}
+        except ValueError:
+            # A damaged manifest can always be recovered from the directory tree
+            return self.rebuild()
+        return data.get('users', {}) if data.get('version') == MANIFEST_VERSION else self.rebuild()
+
+    def _write(self, users: Dict[str, Dict]):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        payload = json.dumps({'version': MANIFEST_VERSION, 'users': users}, indent=2, sort_keys=True)
+        _replace_file(self.path, payload.encode('utf-8'))
+
+    def register(self, user: str) -> bool:
+        """Add user to the manifest. Returns False if they were already listed."""
+        if user in self.load():
+            return False
+        with self.lock:
+            users = self.load()
+            if user in users:
+                return False
+            users[user] = {'shard': shard_dir(user), 'created': datetime.now().isoformat(timespec='seconds')}
+            self._write(users)
+        return True
+
+    def rebuild(self) -> Dict[str, Dict]:
+        """Rewrite the manifest from the shard directories on disk."""
+        users = {}
+        root = os.path.join(self.home, USERS_DIR)
+        for bucket in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+            bucket_dir = os.path.join(root, bucket)
+            if not os.path.isdir(bucket_dir):
+                continue
+            for user in sorted(os.listdir(bucket_dir)):
+                path = os.path.join(bucket_dir, user, LOG_NAME)
+                if USER_ID.fullmatch(user) and shard_dir(user) == os.path.join(USERS_DIR, bucket, user) and os.path.exists(path):
+                    created = datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec='seconds')
+                    users[user] = {'shard': shard_dir(user), 'created': created}
+        with self.lock:
+            self._write(users)
+        return users
+
+    def users(self) -> List[str]:
+        return sorted(self.load())
+
+    def log_paths(self) -> Dict[str, str]:
+        return {user: os.path.join(self.home, info['shard'], LOG_NAME) for user, info in sorted(self.load().items())}
+
+def fan_out(fn: Callable, paths: Iterable[str], workers: int = 1) -> Iterator:
+    """
+    Apply fn to each shard log path, yielding results in input order. fn must be
+    a module-level function so it can be sent to worker processes.
+    """
+    paths = list(paths)
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield fn(path)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+        yield from pool.map(fn, paths, chunksize=max(1, len(paths) // (workers * 4)))
+
+def patient_summary(path: str) -> Dict:
+    """Entries, first/last date and latest dosing profile of one shard."""
+    entries, first, last, profile = 0, None, None, None
+    # Only dates and profiles are read, so packed answers are left packed
+    for record in open_storage(path).iter_records(expand=False):
+        entries += 1
+        day = record.get('date')
+        if isinstance(day, str):
+            first = day if first is None else min(first, day)
+            last = day if last is None else max(last, day)
+        if record.get('profile') is not None:
+            profile = record['profile']
+    return {'entries': entries, 'first_date': first, 'last_date': last, 'profile': profile}
+
+def summarize(home: str, workers: int = 1) -> Dict[str, Dict]:
+    """patient_summary for every patient in the manifest, read in parallel."""
+    paths = ShardManifest(home).log_paths()
+    return dict(zip(paths, fan_out(patient_summary, paths.values(), workers)))
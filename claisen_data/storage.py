@@ -0,0 +1,744 @@
+# Storage backends for the symptom log
+# The default backend is an append-only JSON Lines file with a binary date index
+# next to it; the original pretty-printed JSON array is kept as a second backend
+# and as the source format for migration.
+import os
+import json
+import shutil
+import struct
+import warnings
+from datetime import date
+from typing import Dict, Iterator, List, Optional, Tuple
+from .locking import WriteLock
+
+DEFAULT_BACKEND = 'jsonl'
+# Where logs, models and caches live unless $CLAISEN_HOME says otherwise
+HOME_ENV = 'CLAISEN_HOME'
+DEFAULT_HOME = '~/.claisen'
+BLOCK_SIZE = 64 * 1024
+# When writes reach the disk: 'none' leaves it to the OS, 'data' fsyncs the log
+# after every append, 'full' also fsyncs the directory after a file is replaced.
+# The date index and rollups are not fsynced: they are rebuilt from the log if
+# they disagree with it.
+FSYNC_POLICIES = ['none', 'data', 'full']
+DEFAULT_FSYNC = 'data'
+
+def data_home() -> str:
+    """The data directory: $CLAISEN_HOME, or ~/.claisen."""
+    return os.environ.get(HOME_ENV) or os.path.expanduser(DEFAULT_HOME)
+
+def _decode(line: bytes) -> Optional[Dict]:
+    # A crash mid-append can leave a torn last line; readers skip it
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+def _encode(record: Dict) -> bytes:
+    return (json.dumps(record) + '\n').encode('utf-8')
+
+def _packed(record: Optional[Dict]) -> bool:
+    # Triage answers / recommendation in the compact form of claisen_data.codec
+    return record is not None and (isinstance(record.get('triage_answers'), list)
+                                   or isinstance(record.get('recommendation'), list))
+
+def _replace_file(path: str, payload: bytes, sync_dir: bool = False):
+    """
+    Write payload to a temp file next to path, fsync it, then rename over path.
+    With sync_dir the directory is fsynced too, so the rename itself survives a crash.
+    """
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    if sync_dir:
+        _sync_dir(path)
+
+def _sync_dir(path: str):
+    """fsync the directory holding path, so a rename into it survives a crash."""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(os.path.dirname(path) or '.', os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+# Date index
+# Slot N holds (byte offset + 1) of the first record dated INDEX_EPOCH + N days,
+# or 0 if there is none, so a lookup or an update is one seek and 8 bytes.
+INDEX_MAGIC = b'CLXI'
+INDEX_VERSION = 1
+INDEX_EPOCH = date(1970, 1, 1).toordinal()
+HEADER = struct.Struct('<4sHQiB')  # magic, version, covered log size, last day, in_order
+HEADER_SIZE = 32
+SLOT = struct.Struct('<Q')
+
+def day_number(day: str) -> Optional[int]:
+    try:
+        n = date.fromisoformat(day).toordinal() - INDEX_EPOCH
+    except (TypeError, ValueError):
+        return None
+    return n if n >= 0 else None
+
+def day_bounds(since: Optional[str], until: Optional[str]) -> Tuple[int, Optional[int]]:
+    """Day numbers for an inclusive since..until range; hi is None when unbounded."""
+    lo = day_number(since) if since is not None else None
+    if lo is None:
+        lo = 0
+    hi = None
+    if until is not None:
+        hi = day_number(until)
+        # A bound before the epoch excludes every indexable date
+        hi = -1 if hi is None else hi
+    return lo, hi
+
+class DateIndex:
+    """
+    Persistent date -> offset index for a JSON Lines log.
+    The header records how many bytes of the log the index covers, so a
+    reader can tell when the index is missing or behind the log.
+    """
+    def __init__(self, path: str):
+        self.path = path
+
+    def header(self) -> Optional[Tuple[int, int, bool]]:
+        """Return (covered_size, last_day, in_order), or None if missing/corrupt."""
+        try:
+            with open(self.path, 'rb') as f:
+                raw = f.read(HEADER.size)
+        except FileNotFoundError:
+            return None
+        if len(raw) < HEADER.size:
+            return None
+        magic, version, covered, last_day, in_order = HEADER.unpack(raw)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            return None
+        return covered, last_day, bool(in_order)
+
+    def reset(self):
+        with open(self.path, 'wb') as f:
+            f.write(HEADER.pack(INDEX_MAGIC, INDEX_VERSION, 0, -1, 1).ljust(HEADER_SIZE, b'\0'))
+
+    def rebuild(self, entries: Iterator[Tuple[int, int, Dict]]):
+        """Rewrite the index from (offset, end, record) tuples in log order."""
+        first = {}
+        covered, last_day, in_order = 0, -1, True
+        for offset, end, record in entries:
+            covered = end
+            n = day_number(record.get('date'))
+            if n is None:
+                continue
+            first.setdefault(n, offset)
+            if n < last_day:
+                in_order = False
+            last_day = max(last_day, n)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(HEADER.pack(INDEX_MAGIC, INDEX_VERSION, covered, last_day, int(in_order)).ljust(HEADER_SIZE, b'\0'))
+            for n in sorted(first):
+                f.seek(HEADER_SIZE + n * SLOT.size)
+                f.write(SLOT.pack(first[n] + 1))
+        os.replace(tmp, self.path)
+
+    def lookup(self, day: str) -> Optional[int]:
+        n = day_number(day)
+        if n is None:
+            return None
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(HEADER_SIZE + n * SLOT.size)
+                raw = f.read(SLOT.size)
+        except FileNotFoundError:
+            return None
+        if len(raw) < SLOT.size:
+            return None
+        value = SLOT.unpack(raw)[0]
+        return value - 1 if value else None
+
+    def first_on_or_after(self, n: int, last_day: int) -> Optional[int]:
+        """Offset of the first record dated day n or later (up to last_day), if any."""
+        n = max(n, 0)
+        if n > last_day:
+            return None
+        with open(self.path, 'rb') as f:
+            f.seek(HEADER_SIZE + n * SLOT.size)
+            raw = f.read((last_day - n + 1) * SLOT.size)
+        for (value,) in SLOT.iter_unpack(raw[:len(raw) - len(raw) % SLOT.size]):
+            if value:
+                return value - 1
+        return None
+
+    def add(self, day: str, offset: int, end: int):
+        """Index one record at [offset, end) and advance the covered size to end."""
+        self.add_many([(day, offset, end)])
+
+    def add_many(self, entries: List[Tuple[str, int, int]]):
+        """
+        Index (day, offset, end) records appended in log order, in one open of
+        the index, and mark the log covered up to the last end. The index must
+        already cover everything before the first offset (see sync_index).
+        """
+        if not entries:
+            return
+        header = self.header()
+        if header is None:
+            self.reset()
+            header = (0, -1, True)
+        _, last_day, in_order = header
+        with open(self.path, 'r+b') as f:
+            for day, offset, end in entries:
+                n = day_number(day)
+                if n is None:
+                    continue
+                f.seek(HEADER_SIZE + n * SLOT.size)
+                raw = f.read(SLOT.size)
+                if len(raw) < SLOT.size or SLOT.unpack(raw)[0] == 0:
+                    f.seek(HEADER_SIZE + n * SLOT.size)
+                    f.write(SLOT.pack(offset + 1))
+                if n < last_day:
+                    in_order = False
+                last_day = max(last_day, n)
+            f.seek(0)
+            f.write(HEADER.pack(INDEX_MAGIC, INDEX_VERSION, entries[-1][2], last_day, int(in_order)))
+
+    def days_present(self, lo: int, hi: int) -> set:
+        """Day numbers in lo..hi that have at least one record."""
+        lo = max(lo, 0)
+        if hi < lo:
+            return set()
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(HEADER_SIZE + lo * SLOT.size)
+                raw = f.read((hi - lo + 1) * SLOT.size)
+        except FileNotFoundError:
+            return set()
+        raw = raw[:len(raw) - len(raw) % SLOT.size]
+        return {lo + i for i, (value,) in enumerate(SLOT.iter_unpack(raw)) if value}
+
+class StorageBackend:
+    """
+    Interface every storage backend implements. Writes go through self.lock
+    (an advisory lock on <path>.lock), which callers can also hold around a
+    check-then-write such as "append unless this date is already logged".
+    """
+    name = None
+
+    def __init__(self, path: str, fsync: Optional[str] = None):
+        self.path = path
+        self.fsync = fsync or os.environ.get('CLAISEN_FSYNC') or DEFAULT_FSYNC
+        if self.fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {self.fsync} (choose from {', '.join(FSYNC_POLICIES)})")
+        self.lock = WriteLock(path + '.lock')
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def iter_records(self, expand: bool = True) -> Iterator[Dict]:
+        """
+        Yield records in log order. With expand=False, backends that store
+        records packed may leave them packed; pass them to _expand before
+        reading anything but dates, profiles or symptoms.
+        """
+        raise NotImplementedError
+
+    def _expand(self, record: Optional[Dict]) -> Optional[Dict]:
+        """A record read with expand=False, as expand=True would have yielded it."""
+        return record
+
+    def tail(self, n: int) -> List[Dict]:
+        raise NotImplementedError
+
+    def iter_reverse(self, expand: bool = True) -> Iterator[Dict]:
+        """Yield records newest first (expand as in iter_records)."""
+        return reversed(self.load_all())
+
+    def append(self, record: Dict):
+        raise NotImplementedError
+
+    def append_many(self, records: List[Dict]):
+        with self.lock:
+            for record in records:
+                self.append(record)
+
+    def merge_many(self, records: List[Dict]) -> bool:
+        """
+        Add records sorted by date. Backends that do not keep the log in date
+        order just append them. Returns True if existing records were moved.
+        """
+        self.append_many(records)
+        return False
+
+    def newest_date(self) -> Optional[str]:
+        """The latest date in the log, if any."""
+        return max((r['date'] for r in self.iter_records() if day_number(r.get('date')) is not None), default=None)
+
+    def save_all(self, records: List[Dict]):
+        raise NotImplementedError
+
+    def load_all(self) -> List[Dict]:
+        return list(self.iter_records())
+
+    def iter_range(self, since: Optional[str] = None, until: Optional[str] = None,
+                   expand: bool = True) -> Iterator[Dict]:
+        """
+        Yield records dated since..until (inclusive ISO dates; either may be None)
+        in log order. With any bound given, records without a valid date are
+        skipped. expand is as in iter_records.
+        """
+        if since is None and until is None:
+            yield from self.iter_records(expand=expand)
+            return
+        lo, hi = day_bounds(since, until)
+        for record in self.iter_records(expand=expand):
+            n = day_number(record.get('date'))
+            if n is not None and n >= lo and (hi is None or n <= hi):
+                yield record
+
+    def has_date(self, day: str) -> bool:
+        return any(record.get('date') == day for record in self.iter_records())
+
+    def dates_present(self, days: List[str]) -> set:
+        """The subset of days that already have an entry."""
+        wanted = set(days)
+        return {r.get('date') for r in self.iter_records() if r.get('date') in wanted}
+
+class JsonArrayStorage(StorageBackend):
+    """The original format: the whole log as one pretty-printed JSON array."""
+    name = 'json'
+
+    def load_all(self) -> List[Dict]:
+        if not self.exists():
+            return []
+        with open(self.path, 'r') as f:
+            return json.load(f)
+
+    def iter_records(self, expand: bool = True) -> Iterator[Dict]:
+        # Nothing is stored packed, so expand makes no difference
+        return iter(self.load_all())
+
+    def tail(self, n: int) -> List[Dict]:
+        return self.load_all()[-n:] if n else []
+
+    def append(self, record: Dict):
+        self.append_many([record])
+
+    def append_many(self, records: List[Dict]):
+        with self.lock:
+            data = self.load_all()
+            data.extend(records)
+            self.save_all(data)
+
+    def save_all(self, records: List[Dict]):
+        # Replaced, not truncated in place, so a crash mid-write keeps the old log
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self.lock:
+            _replace_file(self.path, json.dumps(records, indent=2).encode('utf-8'), sync_dir=self.fsync == 'full')
+
+class JsonLinesStorage(StorageBackend):
+    """
+    Append-only JSON Lines log. Adding a record writes one line at the end of
+    the file plus two fixed-size index slots; nothing already on disk is rewritten.
+    Triage answers and recommendations are written packed (claisen_data.codec)
+    unless compact is off ($CLAISEN_COMPACT=0); readers unpack them, unless
+    asked not to with expand=False.
+    """
+    name = 'jsonl'
+
+    def __init__(self, path: str, fsync: Optional[str] = None, compact: Optional[bool] = None):
+        super().__init__(path, fsync)
+        self.index = DateIndex(path + '.idx')
+        self.compact = compact if compact is not None else os.environ.get('CLAISEN_COMPACT', '1') != '0'
+        self._codec = None
+        # Schemas the log will carry once the records being appended are written
+        self._carrying = None
+
+    @property
+    def codec(self):
+        if self._codec is None:
+            from .codec import Codec
+            self._codec = Codec(self.path)
+        return self._codec
+
+    def _expand(self, record: Optional[Dict]) -> Optional[Dict]:
+        """record unpacked; None (with a warning) if it uses a schema the log does not carry."""
+        if not _packed(record):
+            return record
+        try:
+            return self.codec.unpack(record)
+        except (LookupError, TypeError, ValueError) as e:
+            warnings.warn(f"Skipping a log entry dated {record.get('date')} that cannot be decoded: {e}")
+            return None
+
+    def _decode_expanded(self, line: bytes) -> Optional[Dict]:
+        return self._expand(_decode(line))
+
+    def _write_schemas(self, path: str, payload: bytes):
+        _replace_file(path, payload, sync_dir=self.fsync == 'full')
+
+    def _encode_all(self, records: List[Dict], in_log: Optional[set] = None) -> List[bytes]:
+        """
+        Encode records for writing, packed where possible. Call under the write
+        lock: the current schema is added to <path>.schemas before any record
+        uses it. in_log holds the ids of the schemas the file being written
+        already carries (default: what the log carries); the first packed record
+        carries the rest, and their ids are added to in_log. Once the file is
+        written, call _note_carried() (with the same in_log, if one was given).
+        """
+        if in_log is None:
+            self._carrying = None
+        if not self.compact:
+            return [_encode(r) for r in records]
+        payloads = []
+        first = None
+        for record in records:
+            if 'triage_answers' in record or 'recommendation' in record:
+                plain = json.dumps(record)
+                packed = self.codec.pack(record, plain)
+                if packed is not record and first is None:
+                    first = (len(payloads), packed)
+                payloads.append(((json.dumps(packed) if packed is not record else plain) + '\n').encode('utf-8'))
+            else:
+                payloads.append(_encode(record))
+        if first is not None:
+            from .codec import SCHEMAS_KEY
+            self.codec.ensure_current(self._write_schemas)
+            if in_log is None:
+                in_log = self._carrying = self.codec.in_log()
+            carried = self.codec.carry(in_log)
+            if carried:
+                index, packed = first
+                payloads[index] = _encode({**packed, SCHEMAS_KEY: carried})
+        return payloads
+
+    def _note_carried(self, in_log: Optional[set] = None):
+        """After a write: note in <path>.schemas which schemas the log now carries."""
+        if in_log is None:
+            in_log, self._carrying = self._carrying, None
+        if in_log is not None:
+            self.codec.set_in_log(in_log, self._write_schemas)
+
+    def is_legacy(self) -> bool:
+        """True if the file at path is still in the old JSON array format."""
+        try:
+            with open(self.path, 'rb') as f:
+                head = f.read(64).lstrip()
+        except FileNotFoundError:
+            return False
+        return head.startswith(b'[')
+
+    def migrate_legacy(self) -> Optional[int]:
+        """
+        Convert a legacy JSON array file to JSON Lines in place.
+        The original is kept as <path>.json.bak. Returns the number of records
+        migrated, or None if the file did not need migrating.
+        """
+        if not self.is_legacy():
+            return None
+        with self.lock:
+            # Another process may have migrated it while we waited
+            if not self.is_legacy():
+                return None
+            legacy = JsonArrayStorage(self.path).load_all()
+            backup = self.path + '.json.bak'
+            if not os.path.exists(backup):
+                shutil.copyfile(self.path, backup)
+            in_log = set()
+            _replace_file(self.path, b''.join(self._encode_all(legacy, in_log)), sync_dir=self.fsync == 'full')
+            self._note_carried(in_log)
+            self.rebuild_index()
+        return len(legacy)
+
+    def iter_with_offsets(self, start: int = 0, expand: bool = True) -> Iterator[Tuple[int, int, Dict]]:
+        """
+        Yield (offset, end, record) for every readable record from byte start.
+        With expand=False packed triage fields are left packed, for readers that
+        only need dates, profiles or symptoms.
+        """
+        if not self.exists():
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            offset = start
+            for line in f:
+                end = offset + len(line)
+                record = _decode(line) if line.endswith(b'\n') else None
+                if record is not None and expand:
+                    record = self._expand(record)
+                if record is not None:
+                    yield offset, end, record
+                offset = end
+
+    def iter_records(self, expand: bool = True) -> Iterator[Dict]:
+        for _, _, record in self.iter_with_offsets(expand=expand):
+            yield record
+
+    def iter_reverse(self, expand: bool = True) -> Iterator[Dict]:
+        """Yield records newest first, reading the file backwards in blocks."""
+        decode = self._decode_expanded if expand else _decode
+        if not self.exists():
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            pos = f.tell()
+            buf = b''
+            while pos > 0:
+                step = min(BLOCK_SIZE, pos)
+                pos -= step
+                f.seek(pos)
+                buf = f.read(step) + buf
+                lines = buf.split(b'\n')
+                buf = lines[0]
+                for line in reversed(lines[1:]):
+                    record = decode(line)
+                    if record is not None:
+                        yield record
+            record = decode(buf)
+            if record is not None:
+                yield record
+
+    def tail(self, n: int) -> List[Dict]:
+        out = []
+        if n <= 0:
+            return out
+        for record in self.iter_reverse():
+            out.append(record)
+            if len(out) == n:
+                break
+        out.reverse()
+        return out
+
+    def append(self, record: Dict):
+        self.append_many([record])
+
+    def append_many(self, records: List[Dict]):
+        """
+        Append records with one write, then index them with one pass over the
+        index, all under the write lock so the offsets indexed are the ones written.
+        The index is caught up with the log first: indexing the new records
+        moves its covered size past everything before them.
+        """
+        if not records:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self.lock:
+            self._sync_index()
+            payloads = self._encode_all(records)
+            with open(self.path, 'ab+') as f:
+                f.seek(0, os.SEEK_END)
+                offset = f.tell()
+                # Terminate a torn line left by an interrupted write
+                if offset:
+                    f.seek(offset - 1)
+                    if f.read(1) != b'\n':
+                        f.write(b'\n')
+                        offset += 1
+                f.write(b''.join(payloads))
+                f.flush()
+                if self.fsync != 'none':
+                    os.fsync(f.fileno())
+            self._note_carried()
+            entries = []
+            for record, payload in zip(records, payloads):
+                entries.append((record.get('date'), offset, offset + len(payload)))
+                offset += len(payload)
+            self.index.add_many(entries)
+
+    def merge_many(self, records: List[Dict]) -> bool:
+        """
+        Add records sorted by date, keeping a log that is in date order in
+        date order. Records no older than the newest logged day are appended.
+        Otherwise the log is rewritten from the first record dated after the
+        oldest new one, with the new records merged in; the lines before that
+        point and the lines moved are copied byte for byte. Returns True if
+        the log was rewritten: the index is rebuilt, but rollups must be too.
+        """
+        if not records:
+            return False
+        with self.lock:
+            self._sync_index()
+            header = self.index.header()
+            days = [day_number(r.get('date')) for r in records]
+            if not self.exists() or not header[2] or None in days or days[0] >= header[1]:
+                self.append_many(records)
+                return False
+            start = self.index.first_on_or_after(days[0] + 1, header[1])
+            pending = list(zip(days, self._encode_all(records)))
+            pending.reverse()
+            tmp = self.path + '.tmp'
+            with open(self.path, 'rb') as src, open(tmp, 'wb') as dst:
+                dst.write(src.read(start))
+                for line in src:
+                    # A torn last line is terminated, as append_many does
+                    if not line.endswith(b'\n'):
+                        line += b'\n'
+                    record = _decode(line)
+                    n = day_number(record.get('date')) if record is not None else None
+                    while pending and n is not None and pending[-1][0] < n:
+                        dst.write(pending.pop()[1])
+                    dst.write(line)
+                dst.write(b''.join(payload for _, payload in reversed(pending)))
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.replace(tmp, self.path)
+            if self.fsync == 'full':
+                _sync_dir(self.path)
+            self._note_carried()
+            self.rebuild_index()
+        return True
+
+    def save_all(self, records: List[Dict]):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self.lock:
+            in_log = set()
+            _replace_file(self.path, b''.join(self._encode_all(records, in_log)), sync_dir=self.fsync == 'full')
+            self._note_carried(in_log)
+            self.rebuild_index()
+
+    def newest_date(self) -> Optional[str]:
+        """The latest date in the log, from the index header."""
+        if not self.exists():
+            return None
+        self.sync_index()
+        header = self.index.header()
+        return None if header is None or header[1] < 0 else date.fromordinal(INDEX_EPOCH + header[1]).isoformat()
+
+    def rebuild_index(self):
+        with self.lock:
+            self.index.rebuild(self.iter_with_offsets(expand=False))
+
+    def sync_index(self):
+        """
+        Bring the date index in line with the log. A missing or corrupt index,
+        or one that claims more bytes than the log has, is rebuilt from scratch;
+        one that is merely behind (e.g. the log was appended by an older
+        version) is caught up from where it stopped. Only an index that needs
+        work takes the write lock.
+        """
+        size = os.path.getsize(self.path) if self.exists() else 0
+        header = self.index.header()
+        if header is not None and header[0] == size and self._at_line_start(size):
+            return
+        with self.lock:
+            self._sync_index()
+
+    def _sync_index(self):
+        size = os.path.getsize(self.path) if self.exists() else 0
+        header = self.index.header()
+        if header is None or header[0] > size or not self._at_line_start(header[0]):
+            self.rebuild_index()
+            return
+        if header[0] < size:
+            self.index.add_many([(record.get('date'), offset, end)
+                                 for offset, end, record in self.iter_with_offsets(header[0], expand=False)])
+
+    def iter_range(self, since: Optional[str] = None, until: Optional[str] = None,
+                   expand: bool = True) -> Iterator[Dict]:
+        """
+        As StorageBackend.iter_range, but when the log is in date order the
+        index is used to start at the first record on or after since, and
+        reading stops at the first record after until.
+        """
+        if not self.exists():
+            return
+        if since is None and until is None:
+            yield from self.iter_records(expand=expand)
+            return
+        self.sync_index()
+        header = self.index.header()
+        if header is None or not header[2]:
+            yield from super().iter_range(since, until, expand=expand)
+            return
+        lo, hi = day_bounds(since, until)
+        start = self.index.first_on_or_after(lo, header[1])
+        if start is None:
+            return
+        for _, _, record in self.iter_with_offsets(start, expand=expand):
+            n = day_number(record.get('date'))
+            if n is None:
+                continue
+            if hi is not None and n > hi:
+                break
+            if n >= lo:
+                yield record
+
+    def _at_line_start(self, offset: int) -> bool:
+        if offset == 0:
+            return True
+        with open(self.path, 'rb') as f:
+            f.seek(offset - 1)
+            return f.read(1) == b'\n'
+
+    def _read_at(self, offset: int) -> Optional[Dict]:
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return _decode(f.readline())
+
+    def read_ending_at(self, end: int) -> Optional[Dict]:
+        """The record whose line ends (newline included) at byte end, reading backwards from there."""
+        if not self.exists() or end <= 0:
+            return None
+        with open(self.path, 'rb') as f:
+            pos = end - 1
+            f.seek(pos)
+            if f.read(1) != b'\n':
+                return None
+            # buf holds the bytes from pos up to (not including) the record's newline
+            buf = b''
+            while pos > 0:
+                step = min(BLOCK_SIZE, pos)
+                pos -= step
+                f.seek(pos)
+                buf = f.read(step) + buf
+                start = buf.rfind(b'\n')
+                if start >= 0:
+                    return self._expand(_decode(buf[start + 1:]))
+            return self._expand(_decode(buf))
+
+    def dates_present(self, days: List[str]) -> set:
+        """The subset of days that already have an entry, from one read of the index."""
+        numbers = {day_number(d): d for d in days}
+        numbers.pop(None, None)
+        if not numbers or not self.exists():
+            return set()
+        self.sync_index()
+        present = self.index.days_present(min(numbers), max(numbers))
+        return {d for n, d in numbers.items() if n in present}
+
+    def has_date(self, day: str) -> bool:
+        """Check for an entry on day with one index lookup and one line read."""
+        if not self.exists():
+            return False
+        if day_number(day) is None:
+            return super().has_date(day)
+        self.sync_index()
+        offset = self.index.lookup(day)
+        if offset is None:
+            return False
+        record = self._read_at(offset)
+        if record is not None and record.get('date') == day:
+            return True
+        # The slot points at the wrong line: the log was edited behind our back
+        self.rebuild_index()
+        return self.index.lookup(day) is not None
+
+BACKENDS = {
+    JsonLinesStorage.name: JsonLinesStorage,
+    JsonArrayStorage.name: JsonArrayStorage,
+}
+
+def open_storage(path: str, backend: Optional[str] = None) -> StorageBackend:
+    """
+    Open the log at path with the named backend (default: $CLAISEN_STORAGE or 'jsonl').
+    """
+    backend = backend or os.environ.get('CLAISEN_STORAGE') or DEFAULT_BACKEND
+    try:
+        cls = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown storage backend: {backend} (choose from {', '.join(BACKENDS)})")
+    return cls(path)
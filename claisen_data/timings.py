@@ -0,0 +1,143 @@
+# Lightweight timing spans for the triage hot path
+# Stages of extraction, urgency scoring, rule evaluation and storage I/O are
+# wrapped in `with span('stage'):` blocks. While timing is off (the default)
+# span() returns a shared no-op context manager, so the instrumentation costs
+# one function call per stage. When on, each stage's durations go into a
+# log-bucketed histogram (about 5% resolution) that can be merged across
+# worker processes and reported as p50/p95/p99.
+#
+# Timing is switched on with `triage --profile-timings`, `serve --profile-timings`
+# or CLAISEN_TIMINGS=1; worker processes inherit the environment variable.
+import os
+import math
+import time
+from typing import Dict
+
+TIMINGS_ENV = 'CLAISEN_TIMINGS'
+# Histogram bucket i holds durations in (GROWTH**(i-1), GROWTH**i] nanoseconds
+GROWTH = 1.05
+_LOG_GROWTH = math.log(GROWTH)
+PERCENTILES = (50, 95, 99)
+
+class Histogram:
+    """Count, total and max of a stage's durations plus log-scale buckets."""
+    __slots__ = ('count', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = {}
+
+    def record(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        ns = seconds * 1e9
+        i = math.ceil(math.log(ns) / _LOG_GROWTH) if ns > 1 else 0
+        self.buckets[i] = self.buckets.get(i, 0) + 1
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th percentile, in seconds (capped at max)."""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * q / 100))
+        seen = 0
+        for i in sorted(self.buckets):
+            seen += self.buckets[i]
+            if seen >= rank:
+                return min(GROWTH ** i / 1e9, self.max)
+        return self.max
+
+    def merge(self, other: 'Histogram'):
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        for i, n in other.buckets.items():
+            self.buckets[i] = self.buckets.get(i, 0) + n
+
+    def to_dict(self) -> Dict:
+        out = {'count': self.count, 'total_ms': self.total * 1000,
+               'mean_ms': self.total * 1000 / self.count if self.count else 0.0}
+        for q in PERCENTILES:
+            out[f'p{q}_ms'] = self.percentile(q) * 1000
+        out['max_ms'] = self.max * 1000
+        # JSON object keys are strings; from_dict converts them back
+        out['buckets'] = {str(i): n for i, n in sorted(self.buckets.items())}
+        return out
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> 'Histogram':
+        h = cls()
+        h.count = d['count']
+        h.total = d['total_ms'] / 1000
+        h.max = d['max_ms'] / 1000
+        h.buckets = {int(i): n for i, n in d['buckets'].items()}
+        return h
+
+class _Span:
+    __slots__ = ('timings', 'name', 'start')
+
+    def __init__(self, timings: 'Timings', name: str):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timings.record(self.name, time.perf_counter() - self.start)
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class Timings:
+    """Per-stage histograms. snapshot()/merge() move them between processes as plain dicts."""
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.stages = {}
+
+    def span(self, name: str):
+        return _Span(self, name) if self.enabled else _NULL_SPAN
+
+    def record(self, name: str, seconds: float):
+        h = self.stages.get(name)
+        if h is None:
+            h = self.stages[name] = Histogram()
+        h.record(seconds)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        return {name: h.to_dict() for name, h in sorted(self.stages.items())}
+
+    def drain(self) -> Dict[str, Dict]:
+        """snapshot() and reset, for handing a worker's timings back to its parent."""
+        out = self.snapshot()
+        self.stages = {}
+        return out
+
+    def merge(self, snapshot: Dict[str, Dict]):
+        for name, d in snapshot.items():
+            h = self.stages.get(name)
+            if h is None:
+                h = self.stages[name] = Histogram()
+            h.merge(Histogram.from_dict(d))
+
+TIMINGS = Timings(enabled=os.environ.get(TIMINGS_ENV, '') not in ('', '0'))
+
+def enable():
+    """Turn timing on in this process and in worker processes started from it."""
+    os.environ[TIMINGS_ENV] = '1'
+    TIMINGS.enabled = True
+
+# Bound method rather than a wrapper function, to save a call per span
+span = TIMINGS.span
@@ -1,46 +1,101 @@
-from typing import Dict
+import os
+import warnings
+from typing import Dict, Iterable, Iterator, List, Tuple
 from .triage_questions import TRIAGE_QUESTIONS
-import spacy
-import re
-from spacy.pipeline import EntityRuler
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
-import numpy as np
+from .triage_rules import COMPILED_RULES, NLP_URGENT_RULE, NLP_NOCTURNAL_RULE
+from .nlp_cache import ExtractionCache, extraction_fingerprint
+from .keyword_matcher import keyword_findings
+from .timings import TIMINGS, span
 
-# Load spaCy English model
-try:
-    nlp = spacy.load("en_core_web_sm")
-    # Add custom EntityRuler for medical/symptom entities
-    ruler = EntityRuler(nlp, overwrite_ents=True)
-    patterns = [
-        {"label": "SYMPTOM", "pattern": "bloating"},
-        {"label": "SYMPTOM", "pattern": "gas"},
-        {"label": "SYMPTOM", "pattern": "heartburn"},
-        {"label": "SYMPTOM", "pattern": "burning pain"},
-        {"label": "SYMPTOM", "pattern": "nausea"},
-        {"label": "SYMPTOM", "pattern": "vomiting"},
-        {"label": "SYMPTOM", "pattern": "cough"},
-        {"label": "SYMPTOM", "pattern": "choking"},
-        {"label": "SYMPTOM", "pattern": "burping"},
-        {"label": "SYMPTOM", "pattern": "hiccups"},
-        {"label": "SYMPTOM", "pattern": "sour taste"},
-        {"label": "SYMPTOM", "pattern": "fullness"},
-        {"label": "SYMPTOM", "pattern": "tightness"},
-        {"label": "SYMPTOM", "pattern": "pressure"},
-        {"label": "TRIGGER", "pattern": "spicy food"},
-        {"label": "TRIGGER", "pattern": "fatty food"},
-        {"label": "TRIGGER", "pattern": "alcohol"},
-        {"label": "TRIGGER", "pattern": "caffeine"},
-        {"label": "TRIGGER", "pattern": "stress"},
-        {"label": "TRIGGER", "pattern": "anxiety"},
-        {"label": "TRIGGER", "pattern": "night"},
-        {"label": "TRIGGER", "pattern": "lying down"},
-        {"label": "TRIGGER", "pattern": "after eating"},
-    ]
-    ruler.add_patterns(patterns)
-    nlp.add_pipe(ruler, before="ner")
-except Exception:
-    nlp = None
+# spaCy and scikit-learn are heavy imports, so the NLP pipeline and the urgency
+# classifier are only built the first time a note actually needs them. Commands
+# like `add` and `show` never touch either.
+_nlp = None
+_nlp_loaded = False
+_urgency_model = None
+
+PATTERNS = [
+    {"label": "SYMPTOM", "pattern": "bloating"},
+    {"label": "SYMPTOM", "pattern": "gas"},
+    {"label": "SYMPTOM", "pattern": "heartburn"},
+    {"label": "SYMPTOM", "pattern": "burning pain"},
+    {"label": "SYMPTOM", "pattern": "nausea"},
+    {"label": "SYMPTOM", "pattern": "vomiting"},
+    {"label": "SYMPTOM", "pattern": "cough"},
+    {"label": "SYMPTOM", "pattern": "choking"},
+    {"label": "SYMPTOM", "pattern": "burping"},
+    {"label": "SYMPTOM", "pattern": "hiccups"},
+    {"label": "SYMPTOM", "pattern": "sour taste"},
+    {"label": "SYMPTOM", "pattern": "fullness"},
+    {"label": "SYMPTOM", "pattern": "tightness"},
+    {"label": "SYMPTOM", "pattern": "pressure"},
+    {"label": "TRIGGER", "pattern": "spicy food"},
+    {"label": "TRIGGER", "pattern": "fatty food"},
+    {"label": "TRIGGER", "pattern": "alcohol"},
+    {"label": "TRIGGER", "pattern": "caffeine"},
+    {"label": "TRIGGER", "pattern": "stress"},
+    {"label": "TRIGGER", "pattern": "anxiety"},
+    {"label": "TRIGGER", "pattern": "night"},
+    {"label": "TRIGGER", "pattern": "lying down"},
+    {"label": "TRIGGER", "pattern": "after eating"},
+]
+
+# Which spaCy pipeline finds entities in notes ($CLAISEN_NLP_MODE):
+#   full   en_core_web_sm with the EntityRuler in front of its NER. Only
+#          doc.ents is read, so the tagger, parser, lemmatizer and the rest are
+#          not loaded (UNUSED_COMPONENTS); findings are the same as with them.
+#   rules  a blank English tokenizer plus the EntityRuler: SYMPTOM and TRIGGER
+#          entities only, no statistical NER and no en_core_web_sm needed.
+NLP_MODE_ENV = 'CLAISEN_NLP_MODE'
+NLP_MODES = ['full', 'rules']
+DEFAULT_NLP_MODE = 'full'
+UNUSED_COMPONENTS = ['tagger', 'parser', 'senter', 'attribute_ruler', 'lemmatizer']
+
+def nlp_mode() -> str:
+    mode = os.environ.get(NLP_MODE_ENV) or DEFAULT_NLP_MODE
+    if mode not in NLP_MODES:
+        warnings.warn(f"Ignoring {NLP_MODE_ENV}={mode!r}; expected one of {', '.join(NLP_MODES)}")
+        return DEFAULT_NLP_MODE
+    return mode
+
+def get_nlp():
+    """
+    Return the spaCy pipeline for nlp_mode(), loading it on first call.
+    Returns None if spaCy (or, in full mode, the English model) is unavailable.
+    """
+    global _nlp, _nlp_loaded
+    if not _nlp_loaded:
+        _nlp_loaded = True
+        with span('load.nlp'):
+            _nlp = load_nlp(nlp_mode())
+    return _nlp
+
+def load_nlp(mode: str = DEFAULT_NLP_MODE, exclude: List[str] = UNUSED_COMPONENTS):
+    """Build a pipeline for mode (uncached; see get_nlp). Returns None if it cannot be built."""
+    try:
+        import spacy
+        v3 = int(spacy.__version__.split('.')[0]) >= 3
+        if mode == 'rules':
+            nlp = spacy.blank("en")
+        else:
+            # spaCy 2 has no exclude; disable skips running the components instead
+            nlp = spacy.load("en_core_web_sm", **({'exclude' if v3 else 'disable': exclude} if exclude else {}))
+            # tok2vec only feeds the excluded components unless ner listens to it
+            tok2vec = nlp.get_pipe("tok2vec") if "tok2vec" in nlp.pipe_names else None
+            if tok2vec is not None and exclude and "ner" not in getattr(tok2vec, "listening_components", []):
+                nlp.remove_pipe("tok2vec")
+        # Add custom EntityRuler for medical/symptom entities
+        before = "ner" if "ner" in nlp.pipe_names else None
+        if v3:
+            ruler = nlp.add_pipe("entity_ruler", before=before, config={"overwrite_ents": True})
+        else:
+            from spacy.pipeline import EntityRuler
+            ruler = EntityRuler(nlp, overwrite_ents=True)
+            nlp.add_pipe(ruler, before=before)
+        ruler.add_patterns(PATTERNS)
+        return nlp
+    except Exception:
+        return None
 
 # Simple urgency classifier (demo)
 # In practice, you would train this on real labeled data
@@ -53,54 +108,194 @@ URGENCY_EXAMPLES = [
     "I have some heartburn after meals",   # not urgent
 ]
 URGENCY_LABELS = [1, 1, 0, 0, 1, 0]
-vectorizer = TfidfVectorizer()
-X = vectorizer.fit_transform(URGENCY_EXAMPLES)
-clf = LogisticRegression().fit(X, URGENCY_LABELS)
+
+# A model trained with `claisen_log.py train-urgency` is loaded from here if present
+URGENCY_MODEL_ENV = 'CLAISEN_URGENCY_MODEL'
+# Default cut-off for urgency_scores(); 0.5 is the classifier's own predict()
+URGENCY_THRESHOLD = 0.5
+
+URGENCY_MODEL_NAME = 'urgency_model'
+
+def urgency_model_dir() -> str:
+    """$CLAISEN_URGENCY_MODEL, or urgency_model under the data home ($CLAISEN_HOME or ~/.claisen)."""
+    from .storage import data_home
+    return os.environ.get(URGENCY_MODEL_ENV) or os.path.join(data_home(), URGENCY_MODEL_NAME)
+
+def urgency_model_version() -> str:
+    """Version of the saved model artifact, or 'builtin' if there is none."""
+    from .urgency_model import read_manifest
+    manifest = read_manifest(urgency_model_dir())
+    return manifest.get('model_version', 'builtin') if manifest else 'builtin'
+
+def get_urgency_model():
+    """
+    Return the urgency model, loading it on first call: the saved artifact
+    if one exists, otherwise a model fitted on URGENCY_EXAMPLES.
+    """
+    global _urgency_model
+    if _urgency_model is None:
+        with span('load.urgency_model'):
+            _urgency_model = _load_urgency_model()
+    return _urgency_model
+
+def _load_urgency_model():
+    from . import urgency_model
+    path = urgency_model_dir()
+    if urgency_model.read_manifest(path) is not None:
+        try:
+            return urgency_model.load_artifact(path)
+        except urgency_model.ArtifactError as e:
+            warnings.warn(f"Ignoring urgency model artifact: {e}")
+    return urgency_model.train(URGENCY_EXAMPLES, URGENCY_LABELS)
+
+def __getattr__(name):
+    # Keep `triage_engine.nlp`, `.vectorizer` and `.clf` working for callers
+    # that used the old eagerly-built module globals. The sklearn objects are
+    # only available when the model was fitted in this process (no artifact).
+    if name == "nlp":
+        return get_nlp()
+    if name == "vectorizer":
+        return get_urgency_model().vectorizer
+    if name == "clf":
+        return get_urgency_model().clf
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def urgency_predict(text: str) -> bool:
     if not text:
         return False
-    X_test = vectorizer.transform([text])
-    pred = clf.predict(X_test)
-    return bool(pred[0])
+    model = get_urgency_model()
+    with span('urgency.predict'):
+        return model.predict([text])[0]
+
+def urgency_predict_many(texts: List[str]) -> List[bool]:
+    """
+    Batch form of urgency_predict.
+    """
+    out = [False] * len(texts)
+    idx = [i for i, t in enumerate(texts) if t]
+    if not idx:
+        return out
+    model = get_urgency_model()
+    with span('urgency.predict'):
+        preds = model.predict([texts[i] for i in idx])
+    for i, p in zip(idx, preds):
+        out[i] = bool(p)
+    return out
+
+def urgency_scores(texts: Iterable[str], threshold: float = URGENCY_THRESHOLD, batch_size: int = 1024,
+                   fast: bool = True) -> Iterator[Tuple[float, bool]]:
+    """
+    Bulk urgency scoring. Yields (probability urgent, probability > threshold)
+    per text, in order. Texts are scored in chunks of batch_size, each
+    vectorized into one sparse TF-IDF matrix and dotted with the classifier
+    coefficients in NumPy. With fast=False each chunk goes through the fitted
+    vectorizer.transform() and clf.predict_proba() instead, which needs the
+    model to have been fitted in this process (no saved artifact).
+    At the default threshold the flag is exactly urgency_predict(text).
+    Empty texts are not scored: (0.0, False).
+    """
+    from .urgency_model import decision_threshold
+    cutoff = decision_threshold(threshold)
+    model = get_urgency_model()
+    chunk = []
+    for text in texts:
+        chunk.append(text)
+        if len(chunk) >= batch_size:
+            yield from _score_chunk(model, chunk, threshold, cutoff, fast)
+            chunk = []
+    if chunk:
+        yield from _score_chunk(model, chunk, threshold, cutoff, fast)
+
+def _score_chunk(model, texts: List[str], threshold: float, cutoff: float, fast: bool) -> Iterator[Tuple[float, bool]]:
+    from .urgency_model import probability
+    present = [t for t in texts if t]
+    with span('urgency.predict'):
+        if fast:
+            decisions = model.decisions(present)
+            proba, urgent = probability(decisions), decisions > cutoff
+        else:
+            proba = model.sklearn_proba(present) if present else probability(model.decisions([]))
+            urgent = proba > threshold
+    scored = iter(zip(proba.tolist(), urgent.tolist()))
+    for text in texts:
+        yield next(scored) if text else (0.0, False)
+
+def _findings_from_doc(doc, text: str, urgent: bool) -> Dict:
+    with span('extract.keywords'):
+        return keyword_findings(text, urgent, [(ent.text, ent.label_) for ent in doc.ents])
+
+def _run_pipeline(nlp, text: str):
+    """nlp(text), timing the tokenizer and each pipeline component separately when timing is on."""
+    if not TIMINGS.enabled:
+        return nlp(text)
+    with span('spacy.tokenizer'):
+        doc = nlp.make_doc(text)
+    for name, proc in nlp.pipeline:
+        with span(f'spacy.{name}'):
+            doc = proc(doc)
+    return doc
+
+# Extraction results, keyed on normalized text + patterns/training data/versions
+EXTRACTION_CACHE = ExtractionCache(lambda: extraction_fingerprint(PATTERNS, URGENCY_EXAMPLES, URGENCY_LABELS, urgency_model_version(), nlp_mode()))
+
+def _extract_uncached(text: str) -> Dict:
+    nlp = get_nlp()
+    if not nlp:
+        # No spaCy: severity/trigger/timing keywords and the classifier only
+        urgent = urgency_predict(text)
+        with span('extract.keywords'):
+            return keyword_findings(text, urgent)
+    doc = _run_pipeline(nlp, text)
+    return _findings_from_doc(doc, text, urgency_predict(text))
+
+def _extract_uncached_many(texts: List[str], batch_size: int, n_process: int = 1) -> List[Dict]:
+    nlp = get_nlp()
+    if not nlp:
+        urgent = urgency_predict_many(texts)
+        with span('extract.keywords'):
+            return [keyword_findings(t, u) for t, u in zip(texts, urgent)]
+    with span('spacy.pipe'):
+        docs = list(nlp.pipe(texts, batch_size=batch_size, n_process=n_process))
+    urgent = urgency_predict_many(texts)
+    return [_findings_from_doc(doc, text, u) for doc, text, u in zip(docs, texts, urgent)]
 
 def extract_symptoms_from_text(text: str) -> Dict:
     """
     Use spaCy to extract symptoms, severity, and triggers from free-text notes.
     Returns a dict of structured findings.
+    Notes are whitespace-normalized first and results are memoized in EXTRACTION_CACHE.
+    Without spaCy, only the keyword matcher and urgency classifier contribute.
     """
-    if not text or not nlp:
+    if not text:
         return {}
-    doc = nlp(text)
-    findings = {"symptoms": [], "severity": None, "triggers": [], "timing": [], "sentiment": None, "entities": []}
-    # Use custom entities
-    for ent in doc.ents:
-        if ent.label_ == "SYMPTOM" and ent.text not in findings["symptoms"]:
-            findings["symptoms"].append(ent.text)
-        if ent.label_ == "TRIGGER" and ent.text not in findings["triggers"]:
-            findings["triggers"].append(ent.text)
-        findings["entities"].append((ent.text, ent.label_))
-    # Severity (look for numbers or adjectives)
-    if re.search(r"severe|unbearable|can't sleep|awful|worst|disabling", text, re.I):
-        findings["severity"] = "severe"
-    elif re.search(r"mild|slight|occasional|manageable|better", text, re.I):
-        findings["severity"] = "mild"
-    elif re.search(r"moderate|bothersome|often|frequent", text, re.I):
-        findings["severity"] = "moderate"
-    # Triggers (fallback)
-    for trigger in ["night", "lying down", "after eating", "spicy", "fatty", "stress", "anxiety", "exercise", "alcohol", "caffeine"]:
-        if trigger in text.lower() and trigger not in findings["triggers"]:
-            findings["triggers"].append(trigger)
-    # Timing
-    for timing in ["night", "morning", "after meals", "bedtime", "daily", "weekly"]:
-        if timing in text.lower():
-            findings["timing"].append(timing)
-    # Sentiment (very basic)
-    if urgency_predict(text):
-        findings["sentiment"] = "urgent"
-    elif re.search(r"coping|ok|fine|improving|better", text, re.I):
-        findings["sentiment"] = "stable"
-    return findings
+    with span('extract'):
+        return EXTRACTION_CACHE.get_or_compute(text, _extract_uncached)
+
+def extract_many(texts: Iterable[str], batch_size: int = 256, n_process: int = 1) -> Iterator[Dict]:
+    """
+    Streaming form of extract_symptoms_from_text. Texts are processed in
+    chunks of batch_size: notes not already in the cache go through spaCy with
+    nlp.pipe() and the urgency classifier makes one predict call per chunk.
+    With n_process > 1 nlp.pipe() splits each chunk over that many processes,
+    which only pays off for large chunks (batch_size in the thousands).
+    Yields one findings dict per input text, in order.
+    """
+    chunk = []
+    for text in texts:
+        chunk.append(text)
+        if len(chunk) >= batch_size:
+            yield from _extract_chunk(chunk, batch_size, n_process)
+            chunk = []
+    if chunk:
+        yield from _extract_chunk(chunk, batch_size, n_process)
+
+def _extract_chunk(texts: List[str], batch_size: int, n_process: int = 1) -> Iterator[Dict]:
+    present = [t for t in texts if t]
+    with span('extract.chunk'):
+        found = iter(EXTRACTION_CACHE.get_or_compute_many(
+            present, lambda missing: _extract_uncached_many(missing, batch_size, n_process)))
+    for text in texts:
+        yield next(found) if text else {}
 
 def assign_profile(answers: Dict, notes: str = None) -> Dict:
     """
@@ -108,7 +303,15 @@ def assign_profile(answers: Dict, notes: str = None) -> Dict:
     Returns dict with profile, reason, and detailed recommendation.
     Uses NLP on notes if provided.
     """
-    nlp_extracted = extract_symptoms_from_text(notes) if notes else {}
+    with span('assign_profile'):
+        nlp_extracted = extract_symptoms_from_text(notes) if notes else {}
+        return assign_profile_from_findings(answers, nlp_extracted)
+
+def assign_profile_from_findings(answers: Dict, nlp_extracted: Dict) -> Dict:
+    """
+    Rule evaluation half of assign_profile, for callers that have already run
+    NLP extraction on the notes (e.g. batch triage).
+    """
     nlp_severity = nlp_extracted.get("severity")
     nlp_symptoms = nlp_extracted.get("symptoms", [])
     nlp_triggers = nlp_extracted.get("triggers", [])
@@ -116,212 +319,37 @@ def assign_profile(answers: Dict, notes: str = None) -> Dict:
     # If classifier or NLP finds urgent sentiment, escalate
     if nlp_sentiment == "urgent":
         return {
-            "profile": 5,
-            "reason": "AI/NLP detected urgent sentiment in notes.",
-            "recommendation": (
-                "[bold red]URGENT: Your notes suggest you may need immediate medical attention.[/bold red]\n"
-                "- Please seek emergency care or contact your doctor immediately.\n"
-            ),
+            "profile": NLP_URGENT_RULE["profile"],
+            "reason": NLP_URGENT_RULE["reason"],
+            "recommendation": NLP_URGENT_RULE["recommendation"],
             "nlp_extracted": nlp_extracted
         }
     # If NLP finds severe symptoms at night, suggest nocturnal GERD
     if nlp_severity == "severe" and ("night" in nlp_triggers or "night" in nlp_extracted.get("timing", [])):
         return {
-            "profile": 3,
-            "reason": "AI/NLP detected severe nocturnal symptoms in notes.",
-            "recommendation": (
-                "[bold magenta]Severe night-time symptoms detected.[/bold magenta]\n"
-                "- Start omeprazole 20 mg AM + famotidine 10–20 mg at bedtime for 14 days.\n"
-                "- Elevate head of bed, avoid late meals, and sleep on left side.\n"
-                "- [cyan]Reassess in 7–14 days. If persistent, escalate to Profile 4.[/cyan]"
-            ),
+            "profile": NLP_NOCTURNAL_RULE["profile"],
+            "reason": NLP_NOCTURNAL_RULE["reason"],
+            "recommendation": NLP_NOCTURNAL_RULE["recommendation"],
             "nlp_extracted": nlp_extracted
         }
     # If NLP finds stress/anxiety as trigger, add to recommendations
     stress_nlp = any(t in nlp_triggers for t in ["stress", "anxiety"])
-    # Continue with main triage logic, but add NLP findings to recommendations
-    # Profile 5: Alarm features (Q19–Q27)
-    alarm_keys = [
-        'weight_change', 'vomiting_blood', 'dysphagia', 'odynophagia',
-        'family_gi_cancer', 'symptom_change', 'immunocompromised',
-        'anaemia', 'persistent_nausea', 'followup_alarm_features'
-    ]
-    for k in alarm_keys:
-        v = answers.get(k, '')
-        if v and (v.startswith('Yes') or v.startswith('Lost') or v.startswith('Gained')) and v not in ['No', 'No pain swallowing', 'No family history', 'No change', 'No or unknown']:
-            return {
-                "profile": 5,
-                "reason": f"Alarm feature detected: {k.replace('_',' ')}",
-                "recommendation": (
-                    "[bold red]URGENT: Alarm features detected.[/bold red]\n"
-                    "- Immediate GI referral for upper endoscopy (EGD) within 2 weeks.\n"
-                    "- Lab tests: CBC, LFTs, ferritin, BUN/Cr.\n"
-                    "- Stop all OTC PPI/H2RA until workup complete.\n"
-                    "- If haematemesis/melena: ED or urgent EGD within 48 hrs.\n"
-                    "- Progressive dysphagia: Urgent endoscopy + biopsy.\n"
-                    "- 5% weight loss + alarm: 14-day cancer pathway.\n"
-                    "- Family history of GI cancer: expedited scope.\n"
-                    "- Document alarm features and duration clearly.\n"
-                ),
-                "nlp_extracted": nlp_extracted
-            }
-
-    # Profile 1: Mild, infrequent GERD (with subtypes)
-    if (
-        answers.get('symptom_type') in ['Burning sensation', 'Fullness or bloating', 'No discomfort'] and
-        answers.get('symptom_intensity') in ['1–3: Mild', '4–6: Moderate'] and
-        answers.get('symptom_frequency') in ['Less than once a week', '1–2 times per week'] and
-        answers.get('symptom_duration') in ['Less than 10 minutes', '10–30 minutes'] and
-        answers.get('relief_attempts') in ['Antacids (Tums, Maalox) worked', 'Eating bland food'] and
-        answers.get('symptom_free_period') in ['Within the past month', '1–3 months ago'] and
-        answers.get('meal_portion_size') != 'Large' and
-        answers.get('meal_bedtime_interval') in ['>3 hours before bed', '2–3 hours before bed'] and
-        answers.get('alcohol_use') in ['Never', 'Socially, <1x/week'] and
-        answers.get('tobacco_use') in ['Never', 'Former smoker (quit >6 months ago)']
-    ):
-        # Subtype: If stress is a trigger
-        if answers.get('stress_worsen') in ['Yes, significantly and predictably', 'Yes, but not always']:
-            stress_note = "- [yellow]Stress appears to be a trigger. Consider stress management techniques (mindfulness, CBT, relaxation).[/yellow]\n"
-        else:
-            stress_note = ""
-        return {
-            "profile": 1,
-            "reason": "Mild, infrequent symptoms, good response to antacids, no red flags, healthy lifestyle.",
-            "recommendation": (
-                "[bold green]Lifestyle modifications + on-demand antacids.[/bold green]\n"
-                "- Avoid large meals and late eating.\n"
-                "- Maintain upright posture after meals.\n"
-                "- Limit trigger foods/drinks.\n"
-                "- Use calcium carbonate antacids as needed.\n"
-                f"{stress_note}"
-                "- No need for daily acid suppression.\n"
-                "- [cyan]Follow up in 7 days to reassess control.[/cyan]"
-            ),
-            "nlp_extracted": nlp_extracted
-        }
-
-    # Profile 2: Moderate classic GERD (with subtypes)
-    if (
-        answers.get('symptom_type') in ['Burning sensation', 'Sour or bitter taste in the mouth'] and
-        answers.get('symptom_intensity') in ['4–6: Moderate', '7–8: Severe'] and
-        answers.get('symptom_frequency') in ['3–5 times per week', 'Daily'] and
-        answers.get('symptom_postprandial') in ['Immediately (<10 min)', '10–30 minutes', '30–60 minutes'] and
-        answers.get('sour_taste') in ['Often (more than 3 days/week)', 'Daily, especially in the morning'] and
-        answers.get('recent_ppi') == 'No' and
-        answers.get('meal_portion_size') == 'Large'
-    ):
-        # Subtype: If caffeine or NSAIDs present
-        med_note = ""
-        if 'NSAIDs' in answers.get('meds_reflux', ''):
-            med_note += "- [yellow]NSAIDs may worsen symptoms. Minimize or discuss alternatives with your doctor.[/yellow]\n"
-        if answers.get('caffeine_intake') == '>3 cups/day':
-            med_note += "- [yellow]High caffeine intake may contribute. Reduce to <2 cups/day.[/yellow]\n"
-        return {
-            "profile": 2,
-            "reason": "Moderate, classic GERD symptoms, daily or near-daily, sleep disturbance, known triggers, no recent PPI use.",
-            "recommendation": (
-                "[bold yellow]Start omeprazole 20 mg every morning for 14 days (FDA OTC limit).[/bold yellow]\n"
-                "- Continue lifestyle modifications as in Profile 1.\n"
-                "- Keep a symptom diary.\n"
-                f"{med_note}"
-                "- [cyan]Reassess at Day 7 and Day 14. If improved, stop PPI and continue PRN antacids. If not, escalate to Profile 3 or 4.[/cyan]"
-            ),
-            "nlp_extracted": nlp_extracted
-        }
-
-    # Profile 3: Nocturnal/positional GERD (with subtypes)
-    if (
-        answers.get('symptom_type') in ['Burning sensation', 'Sour or bitter taste in the mouth'] and
-        answers.get('symptom_lying_down') in ['Yes, shortly after lying down', 'Yes, I wake up at night with symptoms'] and
-        answers.get('night_choking', '').startswith('Yes') and
-        answers.get('sleep_position') in ['Flat on back', 'On right side']
-    ):
-        return {
-            "profile": 3,
-            "reason": "Nocturnal or positional GERD: night symptoms, lying-down reflux, choking/regurgitation at night, suboptimal sleep posture.",
-            "recommendation": (
-                "[bold magenta]Start omeprazole 20 mg AM + famotidine 10–20 mg at bedtime for 14 days.[/bold magenta]\n"
-                "- Strict head-of-bed elevation (wedge or risers).\n"
-                "- Avoid late meals and alcohol.\n"
-                "- Sleep on left side if possible.\n"
-                "- [cyan]Reassess at Day 7 and Day 14. If persistent, consider Profile 4.[/cyan]"
-            ),
-            "nlp_extracted": nlp_extracted
-        }
-    # Profile 3 (alternate): High-risk lifestyle triggers
-    if (
-        answers.get('meal_portion_size') == 'Large' and
-        answers.get('meal_bedtime_interval') == '<1 hour before bed' and
-        answers.get('alcohol_use') == 'Daily' and
-        answers.get('tobacco_use') == 'Yes, daily'
-    ):
-        return {
-            "profile": 3,
-            "reason": "Nocturnal/positional GERD with high-risk lifestyle triggers (large meals, late eating, daily alcohol/tobacco).",
-            "recommendation": (
-                "[bold magenta]Intensive lifestyle modification required.[/bold magenta]\n"
-                "- Reduce meal size and avoid eating <3 hours before bed.\n"
-                "- Eliminate or reduce alcohol and tobacco.\n"
-                "- Elevate head of bed.\n"
-                "- Consider short-term dual therapy (omeprazole + famotidine) if symptoms persist.\n"
-            ),
-            "nlp_extracted": nlp_extracted
-        }
-
-    # Profile 4: Suspected functional/refractory GERD (with subtypes)
-    if (
-        answers.get('symptom_type') in ['Burning sensation', 'Pressure or tightness'] and
-        answers.get('symptom_intensity') in ['7–8: Severe', '9–10: Disabling'] and
-        answers.get('relief_attempts') in ['Nothing provides consistent relief', 'Proton pump inhibitors (omeprazole) worked', 'Not tried anything'] and
-        answers.get('symptom_free_period') == 'Can’t recall being symptom-free' and
-        (answers.get('recent_ppi') == 'Yes' or answers.get('meds_reflux', '') != 'None of the above')
-    ):
-        # Subtype: If IBS or stress
-        ibs_note = ""
-        if answers.get('bowel_pattern') == 'Yes, alternating diarrhoea and constipation':
-            ibs_note = "- [yellow]IBS/functional overlap suspected. Consider low-FODMAP diet and GI referral.[/yellow]\n"
-        if answers.get('stress_worsen') in ['Yes, significantly and predictably', 'Yes, but not always']:
-            ibs_note += "- [yellow]Stress may be a major factor. Consider psychological support or therapy.[/yellow]\n"
-        return {
-            "profile": 4,
-            "reason": "Persistent symptoms despite correct PPI use, poor response, or overlapping dyspepsia/IBS traits, or medication triggers.",
-            "recommendation": (
-                "[bold blue]Discontinue PPI/H2RA (FDA OTC limit reached). Refer to gastroenterology for pH monitoring, impedance testing, and functional workup.[/bold blue]\n"
-                "- Consider simethicone or alginate-based agents for interim relief.\n"
-                f"{ibs_note}"
-                "- [cyan]Continue symptom diary and dietary reprogramming.[/cyan]"
-            ),
-            "nlp_extracted": nlp_extracted
-        }
-
-    # Profile 2 (alternate): Moderate symptoms with some lifestyle risk
-    if (
-        answers.get('symptom_intensity') in ['4–6: Moderate', '7–8: Severe'] and
-        answers.get('symptom_frequency') in ['3–5 times per week', 'Daily'] and
-        (answers.get('meal_portion_size') == 'Large' or answers.get('alcohol_use') == '2–3 times/week')
-    ):
-        return {
-            "profile": 2,
-            "reason": "Moderate symptoms with some lifestyle risk factors.",
-            "recommendation": (
-                "[bold yellow]Lifestyle modification + consider short PPI course.[/bold yellow]\n"
-                "- Reduce meal size, avoid late eating, limit alcohol.\n"
-                "- Reassess in 7–14 days.\n"
-            ),
-            "nlp_extracted": nlp_extracted
-        }
-
-    # Default: Profile 2 (moderate)
+    # Continue with main triage logic (alarm features, Profiles 1-4, default),
+    # compiled from the rule table in triage_rules
+    with span('rules.match'):
+        rule, alarm_key, notes_text = COMPILED_RULES.match(answers)
+    if alarm_key is not None:
+        reason = rule["reason"].format(feature=alarm_key.replace('_', ' '))
+    else:
+        reason = rule["reason"]
     result = {
-        "profile": 2,
-        "reason": "Default: moderate symptoms (expand logic as needed)",
-        "recommendation": (
-            "[bold yellow]Lifestyle modification + consider short PPI course.[/bold yellow]\n"
-            "- Reduce meal size, avoid late eating, limit alcohol.\n"
-            "- Reassess in 7–14 days.\n"
-        ),
+        "profile": rule["profile"],
+        "reason": reason,
+        "recommendation": rule["recommendation"].replace("{notes}", notes_text),
         "nlp_extracted": nlp_extracted
     }
+    if not rule.get("append_nlp_findings"):
+        return result
     # If NLP found stress/anxiety, add to recommendation
     if stress_nlp:
         result["recommendation"] += "- [yellow]Your notes suggest stress/anxiety as a trigger. Consider stress management or psychological support.[/yellow]\n"
@@ -332,4 +360,4 @@ def assign_profile(answers: Dict, notes: str = None) -> Dict:
     if nlp_extracted.get("entities"):
         ents = ", ".join([f"{text} ({label})" for text, label in nlp_extracted["entities"]])
         result["recommendation"] += f"- [green]AI/NLP entities: {ents}[/green]\n"
-    return result 
\ No newline at end of file
+    return result
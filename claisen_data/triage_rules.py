@@ -0,0 +1,387 @@
+# Dosing profile rules for assign_profile, expressed as data
+# Rules are checked against TRIAGE_QUESTIONS when this module is imported and
+# compiled once into bitmasks over the questions' options (see CompiledRules).
+#
+# A rule's "when" is a list of clauses that must all hold. A clause is either one
+# condition (question_id, op, arg) or a list of conditions of which any may hold.
+# Ops: 'in' (arg is a list of options), '==', '!=', 'startswith', 'contains'.
+# "notes" are optional sub-type lines spliced into the recommendation at {notes}.
+from typing import Dict, List, Optional, Tuple
+from .triage_questions import TRIAGE_QUESTIONS
+
+STRESS_TRIGGER = ['Yes, significantly and predictably', 'Yes, but not always']
+
+# Profile 5: Alarm features (Q19–Q27), checked in this order before any profile rule
+ALARM_KEYS = [
+    'weight_change', 'vomiting_blood', 'dysphagia', 'odynophagia',
+    'family_gi_cancer', 'symptom_change', 'immunocompromised',
+    'anaemia', 'persistent_nausea', 'followup_alarm_features'
+]
+ALARM_PREFIXES = ('Yes', 'Lost', 'Gained')
+ALARM_NEGATIVES = ['No', 'No pain swallowing', 'No family history', 'No change', 'No or unknown']
+ALARM_RULE = {
+    "name": "alarm",
+    "profile": 5,
+    "reason": "Alarm feature detected: {feature}",
+    "recommendation": (
+        "[bold red]URGENT: Alarm features detected.[/bold red]\n"
+        "- Immediate GI referral for upper endoscopy (EGD) within 2 weeks.\n"
+        "- Lab tests: CBC, LFTs, ferritin, BUN/Cr.\n"
+        "- Stop all OTC PPI/H2RA until workup complete.\n"
+        "- If haematemesis/melena: ED or urgent EGD within 48 hrs.\n"
+        "- Progressive dysphagia: Urgent endoscopy + biopsy.\n"
+        "- 5% weight loss + alarm: 14-day cancer pathway.\n"
+        "- Family history of GI cancer: expedited scope.\n"
+        "- Document alarm features and duration clearly.\n"
+    ),
+}
+
+# Results assign_profile gives from the notes alone, before any rule is checked
+NLP_URGENT_RULE = {
+    "name": "nlp_urgent",
+    "profile": 5,
+    "reason": "AI/NLP detected urgent sentiment in notes.",
+    "recommendation": (
+        "[bold red]URGENT: Your notes suggest you may need immediate medical attention.[/bold red]\n"
+        "- Please seek emergency care or contact your doctor immediately.\n"
+    ),
+}
+NLP_NOCTURNAL_RULE = {
+    "name": "nlp_nocturnal",
+    "profile": 3,
+    "reason": "AI/NLP detected severe nocturnal symptoms in notes.",
+    "recommendation": (
+        "[bold magenta]Severe night-time symptoms detected.[/bold magenta]\n"
+        "- Start omeprazole 20 mg AM + famotidine 10–20 mg at bedtime for 14 days.\n"
+        "- Elevate head of bed, avoid late meals, and sleep on left side.\n"
+        "- [cyan]Reassess in 7–14 days. If persistent, escalate to Profile 4.[/cyan]"
+    ),
+}
+
+PROFILE_RULES = [
+    # Profile 1: Mild, infrequent GERD (with subtypes)
+    {
+        "name": "profile_1",
+        "profile": 1,
+        "when": [
+            ('symptom_type', 'in', ['Burning sensation', 'Fullness or bloating', 'No discomfort']),
+            ('symptom_intensity', 'in', ['1–3: Mild', '4–6: Moderate']),
+            ('symptom_frequency', 'in', ['Less than once a week', '1–2 times per week']),
+            ('symptom_duration', 'in', ['Less than 10 minutes', '10–30 minutes']),
+            ('relief_attempts', 'in', ['Antacids (Tums, Maalox) worked', 'Eating bland food']),
+            ('symptom_free_period', 'in', ['Within the past month', '1–3 months ago']),
+            ('meal_portion_size', '!=', 'Large'),
+            ('meal_bedtime_interval', 'in', ['>3 hours before bed', '2–3 hours before bed']),
+            ('alcohol_use', 'in', ['Never', 'Socially, <1x/week']),
+            ('tobacco_use', 'in', ['Never', 'Former smoker (quit >6 months ago)']),
+        ],
+        "notes": [
+            # Subtype: If stress is a trigger
+            {"when": [('stress_worsen', 'in', STRESS_TRIGGER)],
+             "text": "- [yellow]Stress appears to be a trigger. Consider stress management techniques (mindfulness, CBT, relaxation).[/yellow]\n"},
+        ],
+        "reason": "Mild, infrequent symptoms, good response to antacids, no red flags, healthy lifestyle.",
+        "recommendation": (
+            "[bold green]Lifestyle modifications + on-demand antacids.[/bold green]\n"
+            "- Avoid large meals and late eating.\n"
+            "- Maintain upright posture after meals.\n"
+            "- Limit trigger foods/drinks.\n"
+            "- Use calcium carbonate antacids as needed.\n"
+            "{notes}"
+            "- No need for daily acid suppression.\n"
+            "- [cyan]Follow up in 7 days to reassess control.[/cyan]"
+        ),
+    },
+    # Profile 2: Moderate classic GERD (with subtypes)
+    {
+        "name": "profile_2",
+        "profile": 2,
+        "when": [
+            ('symptom_type', 'in', ['Burning sensation', 'Sour or bitter taste in the mouth']),
+            ('symptom_intensity', 'in', ['4–6: Moderate', '7–8: Severe']),
+            ('symptom_frequency', 'in', ['3–5 times per week', 'Daily']),
+            ('symptom_postprandial', 'in', ['Immediately (<10 min)', '10–30 minutes', '30–60 minutes']),
+            ('sour_taste', 'in', ['Often (more than 3 days/week)', 'Daily, especially in the morning']),
+            ('recent_ppi', '==', 'No'),
+            ('meal_portion_size', '==', 'Large'),
+        ],
+        "notes": [
+            # Subtype: If caffeine or NSAIDs present
+            {"when": [('meds_reflux', 'contains', 'NSAIDs')],
+             "text": "- [yellow]NSAIDs may worsen symptoms. Minimize or discuss alternatives with your doctor.[/yellow]\n"},
+            {"when": [('caffeine_intake', '==', '>3 cups/day')],
+             "text": "- [yellow]High caffeine intake may contribute. Reduce to <2 cups/day.[/yellow]\n"},
+        ],
+        "reason": "Moderate, classic GERD symptoms, daily or near-daily, sleep disturbance, known triggers, no recent PPI use.",
+        "recommendation": (
+            "[bold yellow]Start omeprazole 20 mg every morning for 14 days (FDA OTC limit).[/bold yellow]\n"
+            "- Continue lifestyle modifications as in Profile 1.\n"
+            "- Keep a symptom diary.\n"
+            "{notes}"
+            "- [cyan]Reassess at Day 7 and Day 14. If improved, stop PPI and continue PRN antacids. If not, escalate to Profile 3 or 4.[/cyan]"
+        ),
+    },
+    # Profile 3: Nocturnal/positional GERD (with subtypes)
+    {
+        "name": "profile_3",
+        "profile": 3,
+        "when": [
+            ('symptom_type', 'in', ['Burning sensation', 'Sour or bitter taste in the mouth']),
+            ('symptom_lying_down', 'in', ['Yes, shortly after lying down', 'Yes, I wake up at night with symptoms']),
+            ('night_choking', 'startswith', 'Yes'),
+            ('sleep_position', 'in', ['Flat on back', 'On right side']),
+        ],
+        "reason": "Nocturnal or positional GERD: night symptoms, lying-down reflux, choking/regurgitation at night, suboptimal sleep posture.",
+        "recommendation": (
+            "[bold magenta]Start omeprazole 20 mg AM + famotidine 10–20 mg at bedtime for 14 days.[/bold magenta]\n"
+            "- Strict head-of-bed elevation (wedge or risers).\n"
+            "- Avoid late meals and alcohol.\n"
+            "- Sleep on left side if possible.\n"
+            "- [cyan]Reassess at Day 7 and Day 14. If persistent, consider Profile 4.[/cyan]"
+        ),
+    },
+    # Profile 3 (alternate): High-risk lifestyle triggers
+    {
+        "name": "profile_3_lifestyle",
+        "profile": 3,
+        "when": [
+            ('meal_portion_size', '==', 'Large'),
+            ('meal_bedtime_interval', '==', '<1 hour before bed'),
+            ('alcohol_use', '==', 'Daily'),
+            ('tobacco_use', '==', 'Yes, daily'),
+        ],
+        "reason": "Nocturnal/positional GERD with high-risk lifestyle triggers (large meals, late eating, daily alcohol/tobacco).",
+        "recommendation": (
+            "[bold magenta]Intensive lifestyle modification required.[/bold magenta]\n"
+            "- Reduce meal size and avoid eating <3 hours before bed.\n"
+            "- Eliminate or reduce alcohol and tobacco.\n"
+            "- Elevate head of bed.\n"
+            "- Consider short-term dual therapy (omeprazole + famotidine) if symptoms persist.\n"
+        ),
+    },
+    # Profile 4: Suspected functional/refractory GERD (with subtypes)
+    {
+        "name": "profile_4",
+        "profile": 4,
+        "when": [
+            ('symptom_type', 'in', ['Burning sensation', 'Pressure or tightness']),
+            ('symptom_intensity', 'in', ['7–8: Severe', '9–10: Disabling']),
+            ('relief_attempts', 'in', ['Nothing provides consistent relief', 'Proton pump inhibitors (omeprazole) worked', 'Not tried anything']),
+            ('symptom_free_period', '==', 'Can’t recall being symptom-free'),
+            [('recent_ppi', '==', 'Yes'), ('meds_reflux', '!=', 'None of the above')],
+        ],
+        "notes": [
+            # Subtype: If IBS or stress
+            {"when": [('bowel_pattern', '==', 'Yes, alternating diarrhoea and constipation')],
+             "text": "- [yellow]IBS/functional overlap suspected. Consider low-FODMAP diet and GI referral.[/yellow]\n"},
+            {"when": [('stress_worsen', 'in', STRESS_TRIGGER)],
+             "text": "- [yellow]Stress may be a major factor. Consider psychological support or therapy.[/yellow]\n"},
+        ],
+        "reason": "Persistent symptoms despite correct PPI use, poor response, or overlapping dyspepsia/IBS traits, or medication triggers.",
+        "recommendation": (
+            "[bold blue]Discontinue PPI/H2RA (FDA OTC limit reached). Refer to gastroenterology for pH monitoring, impedance testing, and functional workup.[/bold blue]\n"
+            "- Consider simethicone or alginate-based agents for interim relief.\n"
+            "{notes}"
+            "- [cyan]Continue symptom diary and dietary reprogramming.[/cyan]"
+        ),
+    },
+    # Profile 2 (alternate): Moderate symptoms with some lifestyle risk
+    {
+        "name": "profile_2_lifestyle",
+        "profile": 2,
+        "when": [
+            ('symptom_intensity', 'in', ['4–6: Moderate', '7–8: Severe']),
+            ('symptom_frequency', 'in', ['3–5 times per week', 'Daily']),
+            [('meal_portion_size', '==', 'Large'), ('alcohol_use', '==', '2–3 times/week')],
+        ],
+        "reason": "Moderate symptoms with some lifestyle risk factors.",
+        "recommendation": (
+            "[bold yellow]Lifestyle modification + consider short PPI course.[/bold yellow]\n"
+            "- Reduce meal size, avoid late eating, limit alcohol.\n"
+            "- Reassess in 7–14 days.\n"
+        ),
+    },
+    # Default: Profile 2 (moderate); the only rule that also reports NLP findings
+    {
+        "name": "default",
+        "profile": 2,
+        "when": [],
+        "append_nlp_findings": True,
+        "reason": "Default: moderate symptoms (expand logic as needed)",
+        "recommendation": (
+            "[bold yellow]Lifestyle modification + consider short PPI course.[/bold yellow]\n"
+            "- Reduce meal size, avoid late eating, limit alcohol.\n"
+            "- Reassess in 7–14 days.\n"
+        ),
+    },
+]
+
+_STR_OPS = ('startswith', 'contains')
+
+def _test(op: str, arg, value) -> bool:
+    if op == 'in':
+        return value in arg
+    if op == '==':
+        return value == arg
+    if op == '!=':
+        return value != arg
+    if op == 'startswith':
+        return value.startswith(arg)
+    if op == 'contains':
+        return arg in value
+    if op == 'alarm':
+        return bool(value) and value.startswith(ALARM_PREFIXES) and value not in ALARM_NEGATIVES
+    raise ValueError(f"Unknown rule op: {op}")
+
+def _missing_value(op: str):
+    # The original rules read absent answers as None, except string tests which used ''
+    return '' if op in _STR_OPS or op == 'alarm' else None
+
+def validate_rules(rules: List[Dict] = PROFILE_RULES, questions: List[Dict] = TRIAGE_QUESTIONS):
+    """
+    Check every condition against the question bank: the question must exist
+    and every option string it names must be one of that question's options.
+    Raises ValueError listing all problems found.
+    """
+    by_id = {q['id']: q for q in questions}
+    problems = []
+    def check(cond, where):
+        key, op, arg = cond
+        q = by_id.get(key)
+        if q is None:
+            problems.append(f"{where}: unknown question '{key}'")
+            return
+        options = q.get('options')
+        if options is None:
+            problems.append(f"{where}: question '{key}' has no options")
+            return
+        if op == 'in':
+            for a in arg:
+                if a not in options:
+                    problems.append(f"{where}: '{a}' is not an option of '{key}'")
+        elif op in ('==', '!='):
+            if arg not in options:
+                problems.append(f"{where}: '{arg}' is not an option of '{key}'")
+        elif op in _STR_OPS:
+            if not any(_test(op, arg, o) for o in options):
+                problems.append(f"{where}: no option of '{key}' matches {op} '{arg}'")
+        else:
+            problems.append(f"{where}: unknown op '{op}'")
+    for rule in rules:
+        for clause in rule['when']:
+            for cond in (clause if isinstance(clause, list) else [clause]):
+                check(cond, rule['name'])
+        for note in rule.get('notes', []):
+            for clause in note['when']:
+                for cond in (clause if isinstance(clause, list) else [clause]):
+                    check(cond, rule['name'] + ' note')
+    for key in ALARM_KEYS:
+        if key not in by_id:
+            problems.append(f"alarm: unknown question '{key}'")
+    if problems:
+        raise ValueError("Invalid triage rules:\n" + "\n".join(problems))
+
+def _clauses(when):
+    for clause in when:
+        yield clause if isinstance(clause, list) else [clause]
+
+def _holds(when, answers: Dict) -> bool:
+    # Reads answers the way the original if-chain did, so it raises and
+    # short-circuits in exactly the same places
+    for clause in _clauses(when):
+        if not any(_test(op, arg, answers.get(key, _missing_value(op))) for key, op, arg in clause):
+            return False
+    return True
+
+def profile_rule(profile: int, answers: Dict, rules: List[Dict] = PROFILE_RULES) -> Tuple[Dict, str]:
+    """
+    The first rule that assigns profile, with its notes for these answers, for
+    callers that decide the profile themselves (follow-up re-assessment).
+    """
+    if profile == ALARM_RULE['profile']:
+        return ALARM_RULE, ''
+    for rule in rules:
+        if rule['profile'] == profile:
+            return rule, ''.join(n['text'] for n in rule.get('notes', []) if _holds(n['when'], answers))
+    raise ValueError(f"No triage rule assigns profile {profile}")
+
+# Stands in for the answer to a question that was not answered
+_UNANSWERED = object()
+
+def _first(conditions: List[Tuple], get) -> Optional[Tuple]:
+    """
+    The first compiled condition that holds, reading answers through get. A
+    condition is (question id, option index, mask, op, arg): the answer's
+    position in the question's option index picks a bit of the mask, and an
+    answer with no position (not one of the options) is tested with op and
+    arg instead.
+    """
+    for cond in conditions:
+        key, index, mask, op, arg = cond
+        value = get(key, _UNANSWERED)
+        try:
+            position = index.get(value)
+        except TypeError:
+            position = None
+        if mask >> position & 1 if position is not None else _test(op, arg, value):
+            return cond
+    return None
+
+def _satisfied(when: List[List[Tuple]], get) -> bool:
+    """Whether every clause of a compiled "when" has a condition that holds."""
+    for clause in when:
+        if _first(clause, get) is None:
+            return False
+    return True
+
+class CompiledRules:
+    """
+    The rule table compiled to lookup tables, with no code generated. Each
+    question the rules read gets an option index ({option: position}, with
+    "not answered" after the last option), and each condition a bitmask of
+    the positions it accepts, so a condition costs one dict lookup and one
+    bit test. The alarm keys are checked first, then the rules in order, and
+    clauses stop at the first condition that holds, as the table reads.
+    Answers that are not one of their question's options (free text, or a
+    list passed through --answers) are tested directly.
+    """
+    def __init__(self, rules: List[Dict] = PROFILE_RULES, questions: List[Dict] = TRIAGE_QUESTIONS):
+        self.rules = rules
+        options = {q['id']: q.get('options', []) for q in questions}
+        # question id -> {option: position}
+        self.index = {}
+        def condition(key, op, arg) -> Tuple:
+            index = self.index.get(key)
+            if index is None:
+                index = self.index[key] = {}
+                for option in options.get(key, []) + [_UNANSWERED]:
+                    index.setdefault(option, len(index))
+            mask = 0
+            for option, position in index.items():
+                # An unanswered question reads as _missing_value, as in profile_rule
+                if _test(op, arg, _missing_value(op) if option is _UNANSWERED else option):
+                    mask |= 1 << position
+            return key, index, mask, op, arg
+        def compile_when(when) -> List[List[Tuple]]:
+            return [[condition(*cond) for cond in clause] for clause in _clauses(when)]
+        self._alarms = [condition(key, 'alarm', None) for key in ALARM_KEYS]
+        self._rules = [(rule, compile_when(rule['when']),
+                        [(note['text'], compile_when(note['when'])) for note in rule.get('notes', [])])
+                       for rule in rules]
+
+    def match(self, answers: Dict) -> Tuple[Dict, Optional[str], str]:
+        """
+        Return (rule, alarm_key, notes) for the first rule the answers satisfy.
+        alarm_key is set (and rule is ALARM_RULE) when an alarm feature fired.
+        """
+        get = answers.get
+        alarm = _first(self._alarms, get)
+        if alarm is not None:
+            return ALARM_RULE, alarm[0], ''
+        for rule, when, notes in self._rules:
+            if _satisfied(when, get):
+                return rule, None, ''.join([text for text, note in notes if _satisfied(note, get)])
+        raise ValueError("No triage rule matched (the rule list needs a default rule)")
+
+validate_rules()
+COMPILED_RULES = CompiledRules()
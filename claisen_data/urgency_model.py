@@ -0,0 +1,240 @@
+# Urgency model artifacts
+# The classifier is a TF-IDF + logistic regression model. scikit-learn is only
+# needed to fit it; a fitted model is stored as a small directory of NumPy arrays
+# plus a checksummed manifest and scored here with plain NumPy, so loading it
+# costs a few memory maps instead of an sklearn import and a refit.
+#
+#   <dir>/manifest.json   format, model version, training summary, sha256 per file
+#   <dir>/vocab.npy       sorted vocabulary terms (fixed-width unicode)
+#   <dir>/idf.npy         idf weight per term
+#   <dir>/coef.npy        classifier coefficient per term
+#   <dir>/intercept.npy   classifier intercept
+import os
+import re
+import csv
+import math
+import json
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from .timings import TIMINGS, span
+
+ARTIFACT_FORMAT = 1
+ARRAY_FILES = ['vocab.npy', 'idf.npy', 'coef.npy', 'intercept.npy']
+# Tokenization must match TfidfVectorizer's defaults, which train() always uses
+TOKEN_PATTERN = r"(?u)\b\w\w+\b"
+_token_re = re.compile(TOKEN_PATTERN)
+
+class ArtifactError(Exception):
+    pass
+
+class LinearUrgencyModel:
+    """
+    TF-IDF (l2-normalized, smooth idf) followed by a linear decision function.
+    decision(text) > 0 is exactly LogisticRegression.predict for the positive class.
+    """
+    def __init__(self, vocab: np.ndarray, idf: np.ndarray, coef: np.ndarray, intercept: float,
+                 version: str = 'builtin'):
+        self.vocab = vocab
+        self.idf = idf
+        self.coef = coef
+        self.intercept = float(intercept)
+        self.version = version
+        # Set when the model was fitted in this process (kept for callers of the
+        # old triage_engine.vectorizer / triage_engine.clf globals)
+        self.vectorizer = None
+        self.clf = None
+
+    def _columns(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (vocabulary columns, term counts) for the known terms in text."""
+        tokens = _token_re.findall(text.lower())
+        if not tokens or not len(self.vocab):
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        terms, counts = np.unique(np.array(tokens), return_counts=True)
+        cols = np.searchsorted(self.vocab, terms)
+        cols[cols == len(self.vocab)] = 0
+        known = self.vocab[cols] == terms
+        return cols[known], counts[known].astype(np.float64)
+
+    def decision(self, text: str) -> float:
+        cols, counts = self._columns(text)
+        return self._score(cols, counts)
+
+    def _score(self, cols: np.ndarray, counts: np.ndarray) -> float:
+        if not len(cols):
+            return self.intercept
+        weights = counts * self.idf[cols]
+        norm = np.sqrt(np.dot(weights, weights))
+        return float(np.dot(weights, self.coef[cols]) / norm) + self.intercept
+
+    def _timed_decision(self, text: str) -> float:
+        with span('urgency.tfidf'):
+            cols, counts = self._columns(text)
+        with span('urgency.score'):
+            return self._score(cols, counts)
+
+    def transform(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        The TF-IDF matrix of texts as sparse (row, column, value) arrays, one
+        entry per known term of each text, rows l2-normalized as TfidfVectorizer does.
+        """
+        docs = [_token_re.findall(t.lower()) for t in texts]
+        tokens = np.array([token for doc in docs for token in doc])
+        if not len(tokens) or not len(self.vocab):
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty(0)
+        rows = np.repeat(np.arange(len(texts)), [len(doc) for doc in docs])
+        cols = np.searchsorted(self.vocab, tokens)
+        cols[cols == len(self.vocab)] = 0
+        known = self.vocab[cols] == tokens
+        cells, counts = np.unique(rows[known] * len(self.vocab) + cols[known], return_counts=True)
+        rows, cols = np.divmod(cells, len(self.vocab))
+        values = counts * self.idf[cols]
+        norms = np.sqrt(np.bincount(rows, values * values, minlength=len(texts)))
+        return rows, cols, values / norms[rows]
+
+    def decisions(self, texts: List[str]) -> np.ndarray:
+        """decision() for every text, from one sparse TF-IDF matrix and one weighted sum over it."""
+        if len(texts) == 1 and not TIMINGS.enabled:
+            return np.array([self.decision(texts[0])])
+        with span('urgency.tfidf'):
+            rows, cols, values = self.transform(texts)
+        with span('urgency.score'):
+            return np.bincount(rows, values * self.coef[cols], minlength=len(texts)) + self.intercept
+
+    def predict(self, texts: List[str]) -> List[bool]:
+        if len(texts) > 1:
+            return (self.decisions(texts) > 0).tolist()
+        if TIMINGS.enabled:
+            return [self._timed_decision(t) > 0 for t in texts]
+        return [self.decision(t) > 0 for t in texts]
+
+    def predict_proba(self, texts: List[str]) -> np.ndarray:
+        """Probability of the urgent class per text, as LogisticRegression.predict_proba gives it."""
+        return probability(self.decisions(texts))
+
+    def sklearn_proba(self, texts: List[str]) -> np.ndarray:
+        """
+        predict_proba through the fitted vectorizer and classifier: the
+        reference the NumPy path is checked against. Only available when the
+        model was fitted in this process.
+        """
+        if self.clf is None:
+            raise ValueError("No scikit-learn model: this urgency model was loaded from an artifact")
+        proba = self.clf.predict_proba(self.vectorizer.transform(texts))
+        return proba[:, list(self.clf.classes_).index(1)]
+
+def probability(decisions: np.ndarray) -> np.ndarray:
+    """Logistic function of decision values (the positive-class probability)."""
+    return 1.0 / (1.0 + np.exp(-decisions))
+
+def decision_threshold(threshold: float) -> float:
+    """The decision value at which the urgent probability equals threshold (0 for 0.5)."""
+    if not 0.0 < threshold < 1.0:
+        raise ValueError(f"Urgency threshold must be between 0 and 1, got {threshold}")
+    return math.log(threshold / (1.0 - threshold))
+
+def train(texts: List[str], labels: List[int], version: str = 'builtin') -> LinearUrgencyModel:
+    """Fit TfidfVectorizer + LogisticRegression and return the equivalent LinearUrgencyModel."""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    vectorizer = TfidfVectorizer()
+    X = vectorizer.fit_transform(texts)
+    clf = LogisticRegression().fit(X, labels)
+    if len(clf.classes_) != 2:
+        raise ValueError("Urgency training data needs both urgent (1) and non-urgent (0) examples")
+    # Re-order columns by term so the vocabulary can be binary-searched
+    terms = sorted(vectorizer.vocabulary_)
+    order = np.array([vectorizer.vocabulary_[t] for t in terms], dtype=np.intp)
+    vocab = np.array(terms) if terms else np.array([], dtype='<U1')
+    coef = clf.coef_[0][order]
+    # Positive decision means classes_[1]; flip if the positive class is 0
+    sign = 1.0 if clf.classes_[1] == 1 else -1.0
+    model = LinearUrgencyModel(vocab, vectorizer.idf_[order], sign * coef, sign * clf.intercept_[0], version)
+    model.vectorizer, model.clf = vectorizer, clf
+    return model
+
+def read_labeled_file(path: str) -> Tuple[List[str], List[int]]:
+    """
+    Read training examples from a CSV with 'text' and 'label' columns, or from
+    JSON Lines objects with the same keys. Labels are 1 (urgent) or 0.
+    """
+    texts, labels = [], []
+    with open(path, 'r', newline='') as f:
+        if path.endswith('.csv'):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for n, row in enumerate(rows, 1):
+            try:
+                label = int(row['label'])
+                if label not in (0, 1):
+                    raise ValueError("label must be 0 or 1")
+                texts.append(str(row['text']))
+                labels.append(label)
+            except (KeyError, ValueError, TypeError) as e:
+                raise ValueError(f"{path}: example {n}: {e}")
+    return texts, labels
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def save_artifact(model: LinearUrgencyModel, path: str, n_examples: int, source: Optional[str] = None) -> Dict:
+    """
+    Write model to directory path. Arrays are written first and the manifest
+    last (via rename), so a reader never sees a manifest for missing arrays.
+    Returns the manifest, whose 'model_version' is a hash of the array files.
+    """
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, 'vocab.npy'), model.vocab)
+    np.save(os.path.join(path, 'idf.npy'), np.asarray(model.idf, dtype=np.float64))
+    np.save(os.path.join(path, 'coef.npy'), np.asarray(model.coef, dtype=np.float64))
+    np.save(os.path.join(path, 'intercept.npy'), np.array([model.intercept], dtype=np.float64))
+    checksums = {name: _sha256(os.path.join(path, name)) for name in ARRAY_FILES}
+    version = hashlib.sha256(''.join(checksums[n] for n in ARRAY_FILES).encode()).hexdigest()[:16]
+    manifest = {
+        'format': ARTIFACT_FORMAT,
+        'model_version': version,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'n_examples': n_examples,
+        'n_terms': int(len(model.vocab)),
+        'source': source,
+        'token_pattern': TOKEN_PATTERN,
+        'checksums': checksums,
+    }
+    tmp = os.path.join(path, 'manifest.json.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(path, 'manifest.json'))
+    return manifest
+
+def read_manifest(path: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(path, 'manifest.json'), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def load_artifact(path: str, verify: bool = True) -> LinearUrgencyModel:
+    """
+    Load a model saved by save_artifact, memory-mapping its arrays.
+    Raises ArtifactError if the manifest is missing, from another format
+    version, or (with verify) if any file fails its checksum.
+    """
+    manifest = read_manifest(path)
+    if manifest is None:
+        raise ArtifactError(f"No urgency model manifest in {path}")
+    if manifest.get('format') != ARTIFACT_FORMAT or manifest.get('token_pattern') != TOKEN_PATTERN:
+        raise ArtifactError(f"Unsupported urgency model format in {path}")
+    if verify:
+        for name in ARRAY_FILES:
+            expected = manifest.get('checksums', {}).get(name)
+            if not os.path.exists(os.path.join(path, name)) or _sha256(os.path.join(path, name)) != expected:
+                raise ArtifactError(f"Checksum mismatch for {name} in {path}")
+    arrays = {name: np.load(os.path.join(path, name), mmap_mode='r') for name in ARRAY_FILES}
+    return LinearUrgencyModel(arrays['vocab.npy'], arrays['idf.npy'], arrays['coef.npy'],
+                              arrays['intercept.npy'][0], manifest['model_version'])
@@ -0,0 +1,57 @@
+# Validation rules for symptom log entries
+# The pydantic models used by `add` and the bulk checks used by `import` both
+# call the rule functions below, so interactive and bulk input accept exactly
+# the same values.
+from datetime import date
+from typing import List, Optional
+from pydantic import BaseModel, ValidationError, validator
+
+SYMPTOMS = ['bloating', 'gas', 'heartburn']
+SYMPTOM_SET = frozenset(SYMPTOMS)
+SEVERITY_MIN = 1
+SEVERITY_MAX = 5
+
+def check_symptom(name: str) -> str:
+    if name not in SYMPTOM_SET:
+        raise ValueError(f"Invalid symptom: {name}")
+    return name
+
+def check_severity(value: int) -> int:
+    if not (SEVERITY_MIN <= value <= SEVERITY_MAX):
+        raise ValueError(f"Severity must be between {SEVERITY_MIN} and {SEVERITY_MAX}")
+    return value
+
+def check_date(value: str) -> str:
+    try:
+        ok = date.fromisoformat(value).isoformat() == value
+    except (TypeError, ValueError):
+        ok = False
+    if not ok:
+        raise ValueError(f"Invalid date: {value} (expected YYYY-MM-DD)")
+    return value
+
+class SymptomEntry(BaseModel):
+    name: str
+    severity: int
+
+    @validator('name')
+    def name_must_be_valid(cls, v):
+        return check_symptom(v)
+
+    @validator('severity')
+    def severity_must_be_1_5(cls, v):
+        return check_severity(v)
+
+class DayLog(BaseModel):
+    date: str
+    symptoms: List[SymptomEntry]
+    notes: Optional[str] = ''
+
+    @validator('date')
+    def date_must_be_iso(cls, v):
+        return check_date(v)
+
+def error_message(e: ValidationError) -> str:
+    """The first error of a ValidationError, without pydantic's 'Value error, ' prefix."""
+    msg = e.errors()[0]['msg']
+    return msg[len('Value error, '):] if msg.startswith('Value error, ') else msg
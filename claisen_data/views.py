@@ -0,0 +1,65 @@
+# Windowed reads of the symptom log for `show`
+# Every query reads only as much of the log as its window needs: --last and
+# --page walk the log backwards from the end, and --from/--to start at the
+# first indexed day of the range (see StorageBackend.iter_range). Records are
+# read with expand=False, since paging and --profile only look at dates and
+# profiles; only the records that are shown have their answers unpacked.
+from collections import deque
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+from .storage import StorageBackend
+
+DEFAULT_PAGE_SIZE = 20
+
+def matches_profile(record: Dict, profile: Optional[int]) -> bool:
+    return profile is None or record.get('profile') == profile
+
+def filtered(records: Iterable[Dict], profile: Optional[int]) -> Iterator[Dict]:
+    if profile is None:
+        return iter(records)
+    return (r for r in records if matches_profile(r, profile))
+
+def expanded(storage: StorageBackend, records: Iterable[Dict]) -> Iterator[Dict]:
+    """records (read with expand=False) unpacked, skipping any that cannot be decoded."""
+    for record in records:
+        record = storage._expand(record)
+        if record is not None:
+            yield record
+
+def newest_page(records_newest_first: Iterable[Dict], page: int, page_size: int) -> List[Dict]:
+    """Page 1 is the newest page_size records; returned oldest first."""
+    skip = (page - 1) * page_size
+    out = list(islice(records_newest_first, skip, skip + page_size))
+    out.reverse()
+    return out
+
+def oldest_first_page(records: Iterable[Dict], page: int, page_size: int) -> List[Dict]:
+    """The same page as newest_page, from records read oldest first."""
+    window = deque(records, maxlen=page * page_size)
+    # Fewer than page * page_size records: the page is whatever precedes the newer pages
+    keep = len(window) - (page - 1) * page_size
+    return list(islice(window, 0, max(keep, 0)))
+
+def select(storage: StorageBackend, since: Optional[str] = None, until: Optional[str] = None,
+           profile: Optional[int] = None, last: Optional[int] = None,
+           page: Optional[int] = None, page_size: Optional[int] = None) -> Iterator[Dict]:
+    """
+    Yield the records `show` should display, oldest first.
+    --last N is page 1 with N records per page. Without a page or --last (or
+    with --last 0, as before paging existed), every record in the date range
+    is streamed.
+    """
+    if last:
+        page, page_size = 1, last
+    elif page is not None or page_size is not None:
+        page, page_size = page or 1, page_size or DEFAULT_PAGE_SIZE
+    if page is None:
+        yield from expanded(storage, filtered(storage.iter_range(since, until, expand=False), profile))
+        return
+    if page_size <= 0 or page <= 0:
+        return
+    if since is None and until is None:
+        records = newest_page(filtered(storage.iter_reverse(expand=False), profile), page, page_size)
+    else:
+        records = oldest_first_page(filtered(storage.iter_range(since, until, expand=False), profile), page, page_size)
+    yield from expanded(storage, records)
@@ -4,52 +4,79 @@ import json
 import argparse
 from datetime import date, datetime
 from typing import List, Dict, Optional
-from pydantic import BaseModel, ValidationError, validator
+from pydantic import ValidationError
 from rich.console import Console
 from rich.table import Table
-from claisen_data.triage_questions import TRIAGE_QUESTIONS
-from claisen_data.triage_engine import assign_profile
+from claisen_data.triage_engine import assign_profile, urgency_model_dir
+from claisen_data.storage import open_storage, data_home, JsonLinesStorage
+from claisen_data.validation import SYMPTOMS, SymptomEntry, DayLog
+from claisen_data.timings import span
 
-SYMPTOMS = ['bloating', 'gas', 'heartburn']
-# Store data in the user's home directory
-DATA_DIR = os.path.expanduser('~/.claisen')
+# Store data in the user's home directory, or in $CLAISEN_HOME
+DATA_DIR = data_home()
 DATA_FILE = os.path.join(DATA_DIR, 'data.db')
+# Patient whose shard is in use (--user); None for the single-user log
+USER = None
 console = Console()
 
-class SymptomEntry(BaseModel):
-    name: str
-    severity: int
+def use_user(user):
+    """Point DATA_FILE at the patient's shard under DATA_DIR."""
+    global DATA_FILE, USER
+    from claisen_data.shards import log_path
+    DATA_FILE = log_path(DATA_DIR, user)
+    USER = user
 
-    @validator('name')
-    def name_must_be_valid(cls, v):
-        if v not in SYMPTOMS:
-            raise ValueError(f"Invalid symptom: {v}")
-        return v
+def ensure_data_dir():
+    os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
+    if USER is not None and not os.path.exists(DATA_FILE):
+        from claisen_data.shards import ShardManifest
+        ShardManifest(DATA_DIR).register(USER)
 
-    @validator('severity')
-    def severity_must_be_1_5(cls, v):
-        if not (1 <= v <= 5):
-            raise ValueError("Severity must be between 1 and 5")
-        return v
-
-class DayLog(BaseModel):
-    date: str
-    symptoms: List[SymptomEntry]
-    notes: Optional[str] = ''
+def get_storage():
+    storage = open_storage(DATA_FILE)
+    # Logs written before the JSON Lines backend are converted on first use
+    if isinstance(storage, JsonLinesStorage):
+        migrated = storage.migrate_legacy()
+        if migrated is not None:
+            console.print(f"[yellow]Migrated {migrated} entries to the append-only log format (backup: {DATA_FILE}.json.bak)")
+    return storage
 
 def load_data() -> List[Dict]:
-    if not os.path.exists(DATA_FILE):
-        return []
-    with open(DATA_FILE, 'r') as f:
-        return json.load(f)
+    with span('storage.load'):
+        return get_storage().load_all()
 
 def save_data(data: List[Dict]):
-    os.makedirs(DATA_DIR, exist_ok=True)
-    with open(DATA_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+    ensure_data_dir()
+    with span('storage.save'):
+        get_storage().save_all(data)
+
+def get_rollups(storage):
+    from claisen_data.rollups import Rollups
+    return Rollups(storage.path, SYMPTOMS)
+
+def append_entry(entry: Dict, once_per_day: bool = False) -> bool:
+    """
+    Append entry under the log's write lock. With once_per_day nothing is
+    written if the date already has an entry (checked under the same lock,
+    so two concurrent runs cannot both add one). Returns True if written.
+    """
+    from claisen_data.locking import LockTimeout
+    ensure_data_dir()
+    storage = get_storage()
+    try:
+        with span('storage.append'), storage.lock:
+            if once_per_day and storage.has_date(entry['date']):
+                return False
+            storage.append(entry)
+        # Fold the new entry into the trend rollups used by `stats`
+        with span('rollups.sync'):
+            get_rollups(storage).sync(storage)
+    except LockTimeout as e:
+        console.print(f"[red]{e}")
+        return False
+    return True
 
 def init_db():
-    os.makedirs(DATA_DIR, exist_ok=True)
     if not os.path.exists(DATA_FILE):
         save_data([])
         console.print(f"[green]Initialized new symptom log at {DATA_FILE}")
@@ -90,8 +117,7 @@ def triage(symptoms):
 
 def add_entry_cli(symptoms_arg, severity_arg, notes_arg):
     today = str(date.today())
-    data = load_data()
-    if any(entry['date'] == today for entry in data):
+    if get_storage().has_date(today):
         console.print(f"[yellow]You have already logged symptoms for today.")
         return
     symptoms = []
@@ -112,46 +138,189 @@ def add_entry_cli(symptoms_arg, severity_arg, notes_arg):
     except ValidationError as e:
         console.print(f"[red]{e}")
         return
-    data.append(entry.dict())
-    save_data(data)
+    if not append_entry(entry.dict(), once_per_day=True):
+        if get_storage().has_date(today):
+            console.print(f"[yellow]You have already logged symptoms for today.")
+        return
     console.print("\n[bold green]Triage:[/bold green]")
     console.print(triage(symptoms))
 
-def show_entries(last_n=None):
-    data = load_data()
-    if not data:
-        console.print("[yellow]No entries found.")
-        return
-    if last_n:
-        data = data[-last_n:]
-    table = Table(title="Symptom Log")
+# Rows per rendered table when streaming, so long ranges print as they are read
+SHOW_CHUNK_ROWS = 50
+
+def entry_row(entry):
+    if 'symptoms' in entry:
+        sym_str = ', '.join(f"{s['name']}({s['severity']})" for s in entry['symptoms'])
+    else:
+        # Triage entry: list what NLP picked out of the notes
+        sym_str = ', '.join((entry.get('nlp_extracted') or {}).get('symptoms', []))
+    profile = entry.get('profile')
+    return entry.get('date', ''), sym_str, '' if profile is None else str(profile), entry.get('notes') or ''
+
+def show_table(title=None):
+    table = Table(title=title, show_header=title is not None)
     table.add_column("Date", style="cyan")
     table.add_column("Symptoms (severity)", style="magenta")
+    table.add_column("Profile", style="green")
     table.add_column("Notes", style="white")
-    for entry in data:
-        sym_str = ', '.join(f"{s['name']}({s['severity']})" for s in entry['symptoms'])
-        table.add_row(entry['date'], sym_str, entry.get('notes',''))
-    console.print(table)
+    return table
 
-def export_entries(fmt, out):
-    data = load_data()
-    if fmt == 'json':
-        with open(out, 'w') as f:
-            json.dump(data, f, indent=2)
-        console.print(f"[green]Exported to {out} (JSON)")
-    elif fmt == 'csv':
-        import csv
-        with open(out, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['date', 'symptom', 'severity', 'notes'])
-            for entry in data:
-                for s in entry['symptoms']:
-                    writer.writerow([entry['date'], s['name'], s['severity'], entry.get('notes','')])
-        console.print(f"[green]Exported to {out} (CSV)")
-    else:
-        console.print("[red]Unknown format. Use 'json' or 'csv'.")
+def show_entries(last_n=None, since=None, until=None, page=None, page_size=None, profile=None):
+    from claisen_data.views import select
+    entries = select(get_storage(), since=since, until=until, profile=profile,
+                     last=last_n, page=page, page_size=page_size)
+    paged = page is not None or page_size is not None
+    title = f"Symptom Log (page {page or 1}, newest first)" if paged else "Symptom Log"
+    table = show_table(title)
+    shown = 0
+    for entry in entries:
+        table.add_row(*entry_row(entry))
+        shown += 1
+        if shown % SHOW_CHUNK_ROWS == 0:
+            console.print(table)
+            table = show_table()
+    if not shown:
+        console.print("[yellow]No entries found.")
+    elif shown % SHOW_CHUNK_ROWS:
+        console.print(table)
+
+def export_entries(fmt, out, since=None, until=None):
+    from claisen_data.export import export
+    try:
+        n = export(get_storage().iter_range(since, until), fmt, out)
+    except (OSError, RuntimeError) as e:
+        console.print(f"[red]Export failed: {e}")
+        return
+    unit = 'records' if fmt in ('json', 'jsonl') else 'rows'
+    console.print(f"[green]Exported {n} {unit} to {out} ({fmt.upper()})")
+
+# Row errors printed by `import`; --errors writes all of them
+IMPORT_ERRORS_SHOWN = 20
+
+def import_entries(path, fmt=None, dry_run=False, errors_out=None):
+    from claisen_data.ingest import import_file
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+    ensure_data_dir()
+    storage = get_storage()
+    try:
+        result = import_file(path, fmt, storage, dry_run=dry_run, rollups=get_rollups(storage))
+    except (OSError, ValueError) as e:
+        console.print(f"[red]Import failed: {e}")
+        return
+    errors = result['errors']
+    if errors:
+        table = Table(title=f"{len(errors)} rows rejected" + (f" (first {IMPORT_ERRORS_SHOWN})" if len(errors) > IMPORT_ERRORS_SHOWN else ''))
+        table.add_column("Line", style="cyan")
+        table.add_column("Error", style="red")
+        for line, message in errors[:IMPORT_ERRORS_SHOWN]:
+            table.add_row(str(line), message)
+        console.print(table)
+        if errors_out:
+            with open(errors_out, 'w') as f:
+                for line, message in errors:
+                    f.write(json.dumps({'line': line, 'error': message}) + '\n')
+            console.print(f"[yellow]Wrote all {len(errors)} row errors to {errors_out}")
+    if not dry_run and result['imported']:
+        get_rollups(storage).sync(storage)
+    verb = 'Would import' if dry_run else 'Imported'
+    console.print(f"[green]{verb} {result['imported']} entries from {result['rows']} rows ({fmt.upper()})")
+    if result['already_logged']:
+        console.print(f"[yellow]{result['already_logged']} entries were for dates already in the log and were left out")
+    if result['skipped']:
+        console.print(f"[yellow]{result['skipped']} triage rows skipped (only symptom entries are imported)")
+
+def retriage_log(workers=1, chunk=None, batch_size=256, dry_run=False, changes=None, restart=False, as_json=False):
+    from claisen_data.retriage import Retriage, LogReplaced, DEFAULT_CHUNK
+    from claisen_data.locking import LockTimeout
+    storage = get_storage()
+    if not storage.exists():
+        console.print("[yellow]No entries found.")
+        return
+    if not isinstance(storage, JsonLinesStorage):
+        console.print("[red]retriage needs the JSON Lines log (unset CLAISEN_STORAGE=json)[/red]")
+        return
+    run = Retriage(storage, get_rollups(storage), chunk=chunk or DEFAULT_CHUNK, workers=workers,
+                   batch_size=batch_size, dry_run=dry_run, changes_path=changes)
+    if restart:
+        run.discard()
+    size = os.path.getsize(storage.path)
+    def progress(summary, offset):
+        if not as_json:
+            console.print(f"[cyan]{offset * 100 // max(size, 1):3d}%  {summary['triage']} triage entries, "
+                          f"{summary['profile_changed']} profile changes[/cyan]", end='\r')
+    try:
+        with span('retriage'):
+            summary = run.run(progress=progress)
+    except KeyboardInterrupt:
+        console.print(f"\n[yellow]Interrupted after {run.summary['triage']} triage entries; "
+                      f"run `retriage` again to resume{' (dry runs start over)' if dry_run else ''}.[/yellow]")
+        return
+    except LockTimeout as e:
+        console.print(f"\n[red]{e}; run `retriage` again to resume.[/red]")
+        return
+    except LogReplaced as e:
+        console.print(f"\n[red]{e}; run `retriage` again.[/red]")
+        return
+    if as_json:
+        console.print_json(json.dumps({**summary, 'dry_run': dry_run, 'resumed_from': run.resumed_from}))
+        return
+    console.print()
+    if run.resumed_from:
+        console.print(f"[cyan]Resumed from byte {run.resumed_from} of the log[/cyan]")
+    verb = 'Would update' if dry_run else 'Updated'
+    console.print(f"[green]{verb} {summary['updated']} of {summary['triage']} triage entries "
+                  f"({summary['entries']} entries in the log); {summary['profile_changed']} changed profile[/green]")
+    if summary['transitions']:
+        table = Table(title="Profile changes")
+        table.add_column("Old", style="cyan", justify="right")
+        table.add_column("New", style="cyan", justify="right")
+        table.add_column("Entries", style="white", justify="right")
+        for key, count in sorted(summary['transitions'].items(), key=lambda kv: -kv[1]):
+            old, new = key.split('->')
+            table.add_row(old, new, str(count))
+        console.print(table)
+    if summary['errors']:
+        console.print(f"[yellow]{summary['errors']} triage entries have answers the current questions reject; left as they were[/yellow]")
+    if changes:
+        console.print(f"[green]Wrote the changed fields of each updated entry to {changes}[/green]")
+
+def iso_date(value):
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a YYYY-MM-DD date: {value}")
+
+def daemon_assign_profile(answers, notes):
+    """assign_profile via the triage daemon, or None if none is answering."""
+    from claisen_data.daemon import TriageClient, DaemonError, default_address
+    try:
+        return TriageClient(default_address(DATA_DIR)).assign_profile(answers, notes)
+    except DaemonError as e:
+        console.print(f"[yellow]Triage daemon error ({e}); running triage in-process[/yellow]")
+        return None
+
+def prompt_answer(q):
+    """Ask one compiled question at the terminal until it gets a valid answer."""
+    if q.type == 'choice':
+        console.print(f"[bold]{q.text}[/bold]")
+        for idx, opt in enumerate(q.options, 1):
+            console.print(f"  {idx}. {opt}")
+        while True:
+            resp = input("Enter number: ").strip()
+            if resp.isdigit() and 1 <= int(resp) <= len(q.options):
+                return q.options[int(resp)-1]
+            else:
+                console.print("[red]Invalid choice. Try again.[/red]")
+    elif q.type == 'int':
+        while True:
+            resp = input(f"{q.text} ").strip()
+            try:
+                return int(resp)
+            except ValueError:
+                console.print("[red]Please enter a valid number.[/red]")
+    return input(f"{q.text} ").strip()
 
-def run_advanced_triage(answers_arg=None, followup_day=None, notes=None):
+def run_advanced_triage(answers_arg=None, followup_day=None, notes=None, use_daemon=True):
     answers = {}
     # If answers_arg is provided, parse it (as JSON or key=value pairs)
     import json
@@ -166,44 +335,49 @@ def run_advanced_triage(answers_arg=None, followup_day=None, notes=None):
         except Exception as e:
             console.print(f"[red]Failed to parse --answers: {e}[/red]")
             return
-    # Interactive mode for missing answers
-    for q in TRIAGE_QUESTIONS:
-        if 'ask_if' in q:
-            cond = q['ask_if']
-            key, val = list(cond.items())[0]
-            if answers.get(key) != val:
-                continue
-        if q['id'] in answers:
-            continue
-        if q['type'] == 'choice':
-            console.print(f"[bold]{q['text']}[/bold]")
-            for idx, opt in enumerate(q['options'], 1):
-                console.print(f"  {idx}. {opt}")
-            while True:
-                resp = input("Enter number: ").strip()
-                if resp.isdigit() and 1 <= int(resp) <= len(q['options']):
-                    answers[q['id']] = q['options'][int(resp)-1]
-                    break
-                else:
-                    console.print("[red]Invalid choice. Try again.[/red]")
-        elif q['type'] == 'int':
-            while True:
-                resp = input(f"{q['text']} ").strip()
-                try:
-                    answers[q['id']] = int(resp)
-                    break
-                except ValueError:
-                    console.print("[red]Please enter a valid number.[/red]")
-        else:
-            answers[q['id']] = input(f"{q['text']} ").strip()
-    # Assign profile (now passes notes)
-    profile_result = assign_profile(answers, notes=notes)
+    from claisen_data.question_graph import QUESTION_GRAPH
+    answers, problems = QUESTION_GRAPH.validate(answers)
+    if problems:
+        console.print("[red]Invalid --answers:[/red]")
+        for problem in problems:
+            console.print(f"[red]  {problem}[/red]")
+        return
+    previous = None
+    if followup_day is not None:
+        from claisen_data.followup import latest_triage
+        storage = get_storage()
+        with span('followup.lookup'):
+            previous = latest_triage(storage, get_rollups(storage))
+        if previous is None:
+            console.print("[yellow]No earlier triage entry to follow up; asking the full questionnaire.[/yellow]")
+    if previous is not None:
+        from claisen_data.followup import followup_questions, carry_forward
+        for q in followup_questions(answers):
+            answers[q.id] = prompt_answer(q)
+        given = len(answers)
+        answers, reask = carry_forward(previous, answers)
+        console.print(f"[cyan]Following up on the {previous.get('date')} triage (profile {previous.get('profile')}): "
+                      f"carried forward {len(answers) - given} answers"
+                      + (f", asking again: {', '.join(reask)}" if reask else '') + "[/cyan]")
+    # Interactive mode for missing answers; `pending` sees each answer as it is given
+    for q in QUESTION_GRAPH.pending(answers):
+        answers[q.id] = prompt_answer(q)
+    if previous is not None:
+        answers = {q.id: answers[q.id] for q in QUESTION_GRAPH.questions if q.id in answers}
+    # Assign profile (now passes notes), through the triage daemon when one is running
+    profile_result = None
+    if use_daemon:
+        profile_result = daemon_assign_profile(answers, notes)
+    if profile_result is None:
+        profile_result = assign_profile(answers, notes=notes)
+    if previous is not None:
+        from claisen_data.followup import reassess
+        profile_result = reassess(previous, answers, profile_result)
     console.print(f"\n[bold cyan]Dosing Profile: {profile_result['profile']}[/bold cyan]")
     console.print(f"[green]{profile_result['reason']}[/green]")
     console.print(profile_result.get('recommendation', ''))
     # Store in data
     today = str(date.today())
-    data = load_data()
     entry = {
         'date': today,
         'triage_answers': answers,
@@ -214,12 +388,184 @@ def run_advanced_triage(answers_arg=None, followup_day=None, notes=None):
         'followup_day': followup_day,
         'notes': notes
     }
-    data.append(entry)
-    save_data(data)
-    console.print("[bold green]Triage result saved.[/bold green]")
+    if 'followup' in profile_result:
+        entry['followup'] = profile_result['followup']
+    if append_entry(entry):
+        console.print("[bold green]Triage result saved.[/bold green]")
+
+def show_stats(period='week', periods=12, as_json=False, since=None, until=None):
+    from claisen_data import rollups
+    storage = get_storage()
+    if not storage.exists():
+        console.print("[yellow]No entries found.")
+        return
+    store = get_rollups(storage)
+    store.sync(storage)
+    result = {
+        'summary': rollups.summary(store),
+        'trends': rollups.trends(store, period, last=periods),
+        'profile_transitions': rollups.transitions(store),
+    }
+    if since or until:
+        # Per-symptom figures for just the requested dates, read through the index
+        from claisen_data.logframe import LogFrame
+        frame = LogFrame.from_storage(storage, SYMPTOMS, since, until)
+        result['range'] = {'since': since, 'until': until, 'entries': len(frame),
+                           'symptoms': frame.symptom_summary(), 'profiles': frame.profile_counts()}
+    if as_json:
+        console.print_json(json.dumps(result))
+        return
+    summary = result['summary']
+    if not summary['days_logged'] and not result['profile_transitions']['recent']:
+        console.print("[yellow]No entries found.")
+        return
+    console.print(f"[bold]{summary['first_day']} to {summary['last_day']}[/bold]: {summary['days_logged']} days logged, "
+                  f"{summary['symptom_free_days']} symptom-free")
+    console.print(f"Symptom-free streak: {summary['symptom_free_streak']['current']} days "
+                  f"(longest {summary['symptom_free_streak']['longest']}); "
+                  f"logging streak: {summary['logging_streak']['current']} days "
+                  f"(longest {summary['logging_streak']['longest']})")
+    trends = result['trends']
+    table = Table(title=f"Severity by {period} (mean / max, days reported)")
+    table.add_column(period.capitalize(), style="cyan")
+    for name in SYMPTOMS:
+        table.add_column(name, style="magenta")
+    for i, label in enumerate(trends['periods']):
+        cells = []
+        for name in SYMPTOMS:
+            t = trends[name]
+            cells.append('-' if not t['days'][i] else f"{t['mean'][i]:.1f} / {t['max'][i]} ({t['days'][i]}d)")
+        table.add_row(label, *cells)
+    console.print(table)
+    streaks = Table(title="Symptom streaks (consecutive days)")
+    streaks.add_column("Symptom", style="magenta")
+    streaks.add_column("Current", style="yellow")
+    streaks.add_column("Longest", style="red")
+    for name, s in summary['symptom_streaks'].items():
+        streaks.add_row(name, str(s['current']), str(s['longest']))
+    console.print(streaks)
+    if 'range' in result:
+        r = result['range']
+        table = Table(title=f"{since or 'start'} to {until or 'end'}: {r['entries']} entries")
+        table.add_column("Symptom", style="magenta")
+        table.add_column("Reports", style="cyan")
+        table.add_column("Mean", style="yellow")
+        table.add_column("Max", style="red")
+        for name, s in r['symptoms'].items():
+            table.add_row(name, str(s['reports']), '-' if s['mean'] is None else f"{s['mean']:.1f}", str(s['max']))
+        console.print(table)
+        if r['profiles']:
+            console.print("Profiles assigned: " + ', '.join(f"{p}: {n}" for p, n in r['profiles'].items()))
+    moves = result['profile_transitions']
+    if moves['recent']:
+        table = Table(title=f"Profile transitions (current profile: {moves['current_profile']})")
+        table.add_column("Date", style="cyan")
+        table.add_column("From", style="yellow")
+        table.add_column("To", style="green")
+        for move in moves['recent']:
+            table.add_row(move['date'], str(move['from'] or '-'), str(move['to']))
+        console.print(table)
+        if moves['counts']:
+            console.print("Transition counts: " + ', '.join(f"{k}: {v}" for k, v in moves['counts'].items()))
+
+def serve_cli(socket_path=None, port=None, workers=1):
+    from claisen_data.daemon import serve, default_address
+    address = f"http://127.0.0.1:{port}" if port else (socket_path or default_address(DATA_DIR))
+    console.print("[cyan]Loading NLP pipeline and urgency model...[/cyan]")
+    try:
+        serve(address, workers, ready=lambda: console.print(f"[green]Triage daemon listening on {address} (Ctrl-C to stop)[/green]"))
+    except OSError as e:
+        console.print(f"[red]Could not start triage daemon: {e}[/red]")
+
+def show_patients(workers=1, as_json=False):
+    from claisen_data.shards import summarize
+    patients = summarize(DATA_DIR, workers)
+    if as_json:
+        console.print_json(json.dumps(patients))
+        return
+    if not patients:
+        console.print(f"[yellow]No patient shards under {DATA_DIR}")
+        return
+    table = Table(title=f"Patients ({len(patients)})")
+    table.add_column("Patient", style="cyan")
+    table.add_column("Entries", style="white")
+    table.add_column("First", style="white")
+    table.add_column("Last", style="white")
+    table.add_column("Profile", style="green")
+    for user, p in patients.items():
+        table.add_row(user, str(p['entries']), p['first_date'] or '-', p['last_date'] or '-',
+                      '-' if p['profile'] is None else str(p['profile']))
+    console.print(table)
+
+def user_id(value):
+    from claisen_data.shards import check_user_id
+    try:
+        return check_user_id(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def enable_nlp_cache():
+    # Workers started by batch triage inherit the environment variable
+    from claisen_data.nlp_cache import DISK_CACHE_ENV
+    os.makedirs(DATA_DIR, exist_ok=True)
+    os.environ[DISK_CACHE_ENV] = os.path.join(DATA_DIR, 'nlp_cache.db')
+
+def set_nlp_mode(mode):
+    # Read when the pipeline is first built, here or in batch/daemon workers
+    from claisen_data.triage_engine import NLP_MODE_ENV
+    os.environ[NLP_MODE_ENV] = mode
+
+def print_timings(out_path=None):
+    from claisen_data.timings import TIMINGS
+    if out_path:
+        with open(out_path, 'w') as f:
+            json.dump(TIMINGS.snapshot(), f, indent=2)
+        console.print(f"[green]Wrote stage timings to {out_path}[/green]")
+    table = Table(title="Triage stage timings (ms)")
+    table.add_column("Stage", style="cyan", no_wrap=True)
+    for name in ("Calls", "Total", "p50", "p95", "p99"):
+        table.add_column(name, style="white", justify="right")
+    for name, d in TIMINGS.snapshot().items():
+        table.add_row(name, str(d['count']), *(f"{d[k]:.3f}" for k in ('total_ms', 'p50_ms', 'p95_ms', 'p99_ms')))
+    console.print(table)
+
+def print_nlp_stats():
+    from claisen_data.triage_engine import EXTRACTION_CACHE
+    stats = EXTRACTION_CACHE.stats
+    table = Table(title="NLP extraction cache")
+    table.add_column("Memory hits", style="green")
+    table.add_column("Disk hits", style="cyan")
+    table.add_column("Misses", style="yellow")
+    table.add_row(str(stats['hits']), str(stats['disk_hits']), str(stats['misses']))
+    console.print(table)
+
+def run_batch_triage(in_path, out_path, batch_size, workers=1):
+    from claisen_data.batch import run_batch
+    try:
+        counts = run_batch(in_path, out_path, batch_size=batch_size, workers=workers)
+    except OSError as e:
+        console.print(f"[red]Batch triage failed: {e}[/red]")
+        return
+    console.print(f"[green]Scored {counts['scored']} records to {out_path}[/green]")
+    if counts['errors']:
+        console.print(f"[yellow]{counts['errors']} records could not be read (see 'error' lines in output)[/yellow]")
+
+def train_urgency_cli(data_path, out_dir):
+    from claisen_data import urgency_model
+    try:
+        texts, labels = urgency_model.read_labeled_file(data_path)
+        model = urgency_model.train(texts, labels)
+    except (OSError, ValueError) as e:
+        console.print(f"[red]Training failed: {e}[/red]")
+        return
+    manifest = urgency_model.save_artifact(model, out_dir, n_examples=len(texts), source=os.path.abspath(data_path))
+    accuracy = sum(p == bool(l) for p, l in zip(model.predict(texts), labels)) / len(labels)
+    console.print(f"[green]Saved urgency model {manifest['model_version']} to {out_dir}[/green]")
+    console.print(f"{len(texts)} examples, {manifest['n_terms']} terms, training accuracy {accuracy:.1%}")
 
 def main():
     parser = argparse.ArgumentParser(description="Claisen Symptom Logger")
+    parser.add_argument('--user', type=user_id, help="Patient id: use that patient's own log under $CLAISEN_HOME/users")
     subparsers = parser.add_subparsers(dest='command')
 
     # init
@@ -233,30 +579,128 @@ def main():
 
     # show
     show_parser = subparsers.add_parser('show', help='Show recent entries')
-    show_parser.add_argument('--last', type=int, default=None, help='Show only the last N entries')
+    show_parser.add_argument('--last', type=int, default=None, help='Show only the last N entries (0 shows all)')
+    show_parser.add_argument('--from', dest='since', type=iso_date, help='Only entries on or after this date (YYYY-MM-DD)')
+    show_parser.add_argument('--to', dest='until', type=iso_date, help='Only entries on or before this date (YYYY-MM-DD)')
+    show_parser.add_argument('--page', type=int, help='Page number, counting back from the newest entries (1 = newest)')
+    show_parser.add_argument('--page-size', type=int, help='Entries per page (default 20)')
+    show_parser.add_argument('--profile', type=int, choices=[1, 2, 3, 4, 5], help='Only triage entries assigned this dosing profile')
 
     # export
-    export_parser = subparsers.add_parser('export', help='Export entries to CSV or JSON')
-    export_parser.add_argument('--format', choices=['csv', 'json'], required=True, help='Export format')
+    export_parser = subparsers.add_parser('export', help='Export entries to CSV, JSON, JSON Lines, Parquet or Arrow')
+    export_parser.add_argument('--format', choices=['csv', 'json', 'jsonl', 'parquet', 'arrow'], required=True, help='Export format (parquet/arrow need pyarrow)')
     export_parser.add_argument('--out', required=True, help='Output file path')
+    export_parser.add_argument('--since', type=iso_date, help='Only entries on or after this date (YYYY-MM-DD)')
+    export_parser.add_argument('--until', type=iso_date, help='Only entries on or before this date (YYYY-MM-DD)')
+
+    # import
+    import_parser = subparsers.add_parser('import', help='Bulk import backfilled symptom entries from CSV or JSON Lines')
+    import_parser.add_argument('path', help='File to import (CSV as written by export, or one JSON entry per line)')
+    import_parser.add_argument('--format', choices=['csv', 'jsonl'], help='Input format (default: from the file extension)')
+    import_parser.add_argument('--dry-run', action='store_true', help='Validate and report without writing to the log')
+    import_parser.add_argument('--errors', type=str, help='Write every rejected row to this file as JSON Lines')
 
     triage_parser = subparsers.add_parser('triage', help='Run advanced triage and dosing profile assignment')
     triage_parser.add_argument('--answers', type=str, help='Non-interactive: JSON or comma-separated key=value pairs for answers')
-    triage_parser.add_argument('--followup', type=int, choices=[7, 14, 28], help='Day of follow-up session (7, 14, 28)')
+    triage_parser.add_argument('--followup', type=int, choices=[7, 14, 28], help='Day of follow-up session (7, 14, 28): carries forward your last triage answers and asks only the follow-up questions')
     triage_parser.add_argument('--notes', type=str, help='Free-text notes or symptom description for NLP extraction')
+    triage_parser.add_argument('--batch', type=str, help='Batch mode: JSONL file of {"id", "answers", "notes"} records to score')
+    triage_parser.add_argument('--out', type=str, help='Batch mode: JSONL file to write results to')
+    triage_parser.add_argument('--batch-size', type=int, default=256, help='Batch mode: records per NLP/classifier batch')
+    triage_parser.add_argument('--workers', type=int, default=1, help='Batch mode: number of worker processes')
+    triage_parser.add_argument('--nlp-cache', action='store_true', help=f'Keep NLP extraction results in {DATA_DIR}/nlp_cache.db across runs')
+    triage_parser.add_argument('--stats', action='store_true', help='Print NLP cache hit/miss counters after the run')
+    triage_parser.add_argument('--nlp-mode', choices=['full', 'rules'], help='spaCy pipeline for notes: full (en_core_web_sm NER + rules, default) or rules (EntityRuler only, faster); runs in-process')
+    triage_parser.add_argument('--no-daemon', action='store_true', help='Run NLP in this process even if a triage daemon is running')
+    triage_parser.add_argument('--profile-timings', action='store_true', help='Print time spent in each triage stage (runs in-process)')
+    triage_parser.add_argument('--timings-out', type=str, help='With --profile-timings: also write the stage histograms to this JSON file')
+
+    serve_parser = subparsers.add_parser('serve', help='Run a triage daemon that keeps the NLP pipeline and model loaded')
+    serve_parser.add_argument('--socket', type=str, help=f'Unix socket to listen on (default: $CLAISEN_DAEMON or {DATA_DIR}/triage.sock)')
+    serve_parser.add_argument('--port', type=int, help='Listen on http://127.0.0.1:PORT instead of a Unix socket')
+    serve_parser.add_argument('--workers', type=int, default=1, help='Worker processes for NLP (default: one thread)')
+    serve_parser.add_argument('--profile-timings', action='store_true', help='Record stage timings, served as histograms on GET /timings')
+    serve_parser.add_argument('--nlp-mode', choices=['full', 'rules'], help='spaCy pipeline for notes (default: $CLAISEN_NLP_MODE or full)')
+
+    stats_parser = subparsers.add_parser('stats', help='Show severity trends, streaks and profile transitions')
+    stats_parser.add_argument('--period', choices=['week', 'month'], default='week', help='Trend granularity')
+    stats_parser.add_argument('--periods', type=int, default=12, help='Number of most recent periods to show')
+    stats_parser.add_argument('--from', dest='since', type=iso_date, help='Also summarize entries on or after this date (YYYY-MM-DD)')
+    stats_parser.add_argument('--to', dest='until', type=iso_date, help='Also summarize entries on or before this date (YYYY-MM-DD)')
+    stats_parser.add_argument('--json', action='store_true', help='Print the statistics as JSON')
+
+    train_parser = subparsers.add_parser('train-urgency', help='Train the urgency classifier from a labeled file')
+    train_parser.add_argument('--data', required=True, help='CSV or JSONL file with "text" and "label" (1 = urgent, 0 = not) fields')
+    train_parser.add_argument('--out', default=urgency_model_dir(), help='Directory to write the model artifact to (default: where triage loads it from)')
+
+    retriage_parser = subparsers.add_parser('retriage', help='Re-derive profile, reason and recommendation of every stored triage entry with the current rules')
+    retriage_parser.add_argument('--workers', type=int, default=1, help='Number of worker processes for NLP and scoring')
+    retriage_parser.add_argument('--chunk', type=int, help='Log lines per chunk; progress is checkpointed after each (default: 2000)')
+    retriage_parser.add_argument('--batch-size', type=int, default=256, help='Notes per NLP/classifier batch')
+    retriage_parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing the log')
+    retriage_parser.add_argument('--changes', type=str, help='Write the old and new values of every updated entry to this JSONL file')
+    retriage_parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint of an interrupted run and start over')
+    retriage_parser.add_argument('--json', action='store_true', help='Print the summary as JSON')
+
+    patients_parser = subparsers.add_parser('patients', help='Summarize every patient log (reads the shards in parallel)')
+    patients_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Number of worker processes')
+    patients_parser.add_argument('--json', action='store_true', help='Print the summaries as JSON')
 
     args = parser.parse_args()
+    if args.user is not None:
+        use_user(args.user)
 
     if args.command == 'init':
         init_db()
     elif args.command == 'add':
         add_entry_cli(args.symptoms, args.severity, args.notes)
     elif args.command == 'show':
-        show_entries(args.last)
+        if args.last is not None and args.last < 0:
+            parser.error('--last must be 0 or more')
+        if args.last and (args.page is not None or args.page_size is not None):
+            parser.error('--last cannot be combined with --page/--page-size')
+        show_entries(args.last, args.since, args.until, args.page, args.page_size, args.profile)
     elif args.command == 'export':
-        export_entries(args.format, args.out)
+        export_entries(args.format, args.out, args.since, args.until)
+    elif args.command == 'import':
+        import_entries(args.path, args.format, args.dry_run, args.errors)
     elif args.command == 'triage':
-        run_advanced_triage(answers_arg=args.answers, followup_day=args.followup, notes=args.notes)
+        if args.batch and not args.out:
+            parser.error('--batch requires --out')
+        if args.timings_out and not args.profile_timings:
+            parser.error('--timings-out requires --profile-timings')
+        if args.nlp_cache:
+            enable_nlp_cache()
+        if args.nlp_mode:
+            set_nlp_mode(args.nlp_mode)
+        if args.profile_timings:
+            from claisen_data import timings
+            timings.enable()
+        if args.batch:
+            run_batch_triage(args.batch, args.out, args.batch_size, args.workers)
+        else:
+            run_advanced_triage(answers_arg=args.answers, followup_day=args.followup, notes=args.notes,
+                                use_daemon=not (args.no_daemon or args.nlp_cache or args.nlp_mode or args.stats
+                                                or args.profile_timings))
+        if args.stats:
+            print_nlp_stats()
+        if args.profile_timings:
+            print_timings(args.timings_out)
+    elif args.command == 'stats':
+        show_stats(args.period, args.periods, args.json, args.since, args.until)
+    elif args.command == 'serve':
+        if args.nlp_mode:
+            set_nlp_mode(args.nlp_mode)
+        if args.profile_timings:
+            from claisen_data import timings
+            timings.enable()
+        serve_cli(args.socket, args.port, args.workers)
+    elif args.command == 'retriage':
+        retriage_log(args.workers, args.chunk, args.batch_size, args.dry_run, args.changes, args.restart, args.json)
+    elif args.command == 'patients':
+        show_patients(args.workers, args.json)
+    elif args.command == 'train-urgency':
+        train_urgency_cli(args.data, args.out)
     else:
         parser.print_help()
 
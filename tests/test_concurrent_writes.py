@@ -0,0 +1,42 @@
+"""
+Writer processes appending to one log at the same time, as concurrent `add`
+and `triage` runs do: every entry must land exactly once. The stress version
+with throughput and latency is benchmarks/bench_concurrent_writes.py.
+"""
+import multiprocessing as mp
+from datetime import date, timedelta
+import pytest
+from claisen_data.storage import open_storage
+
+WRITERS = 6
+RECORDS = 40
+
+def writer(path, backend, writer_id, records, barrier):
+    storage = open_storage(path, backend)
+    start = date(2020, 1, 1)
+    barrier.wait()
+    for i in range(records):
+        day = str(start + timedelta(days=(writer_id * records + i) % 1000))
+        storage.append({'date': day, 'notes': f'{writer_id}:{i}', 'symptoms': []})
+
+@pytest.mark.parametrize('backend,records', [('jsonl', RECORDS), ('json', RECORDS // 4)])
+def test_no_lost_or_duplicated_records(tmp_path, backend, records):
+    path = str(tmp_path / 'data.db')
+    ctx = mp.get_context('spawn')
+    barrier = ctx.Barrier(WRITERS)
+    procs = [ctx.Process(target=writer, args=(path, backend, w, records, barrier)) for w in range(WRITERS)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(timeout=120)
+        assert p.exitcode == 0
+    storage = open_storage(path, backend)
+    notes = [r['notes'] for r in storage.iter_records()]
+    assert len(notes) == WRITERS * records
+    assert set(notes) == {f'{w}:{i}' for w in range(WRITERS) for i in range(records)}
+    if backend == 'jsonl':
+        with open(path + '.idx', 'rb') as f:
+            index = f.read()
+        storage.rebuild_index()
+        with open(path + '.idx', 'rb') as f:
+            assert f.read() == index
@@ -0,0 +1,58 @@
+"""
+spaCy pipeline modes (see NLP_MODES in claisen_data.triage_engine).
+
+`rules` (blank tokenizer + EntityRuler) is checked against findings stored
+here for a few fixed notes, so it runs wherever spaCy is installed. `full`
+needs en_core_web_sm: with it, `full` must find exactly what the whole
+pipeline finds, and `rules` the same apart from the statistical NER labels.
+Timings and memory are in benchmarks/bench_nlp_modes.py.
+"""
+import pytest
+
+pytest.importorskip('spacy')
+
+from claisen_data.triage_engine import PATTERNS, load_nlp, _findings_from_doc
+
+NOTES = [
+    "Terrible heartburn at night after spicy food, and some burping.",
+    "Mild bloating and gas after eating, worse with stress.",
+    "Severe burning pain and a sour taste when lying down; had caffeine and alcohol.",
+    "Felt fine today, nothing to report.",
+    "Some nausea and vomiting since Monday, constant chest tightness and pressure.",
+]
+
+RULES_FINDINGS = [
+    {'symptoms': ['heartburn', 'burping'], 'severity': None, 'triggers': ['night', 'spicy food', 'spicy'],
+     'timing': ['night'], 'sentiment': None,
+     'entities': [('heartburn', 'SYMPTOM'), ('night', 'TRIGGER'), ('spicy food', 'TRIGGER'), ('burping', 'SYMPTOM')]},
+    {'symptoms': ['bloating', 'gas'], 'severity': 'mild', 'triggers': ['after eating', 'stress'], 'timing': [],
+     'sentiment': None,
+     'entities': [('bloating', 'SYMPTOM'), ('gas', 'SYMPTOM'), ('after eating', 'TRIGGER'), ('stress', 'TRIGGER')]},
+    {'symptoms': ['burning pain', 'sour taste'], 'severity': 'severe', 'triggers': ['lying down', 'caffeine', 'alcohol'],
+     'timing': [], 'sentiment': None,
+     'entities': [('burning pain', 'SYMPTOM'), ('sour taste', 'SYMPTOM'), ('lying down', 'TRIGGER'),
+                  ('caffeine', 'TRIGGER'), ('alcohol', 'TRIGGER')]},
+    {'symptoms': [], 'severity': None, 'triggers': [], 'timing': [], 'sentiment': 'stable', 'entities': []},
+    {'symptoms': ['nausea', 'vomiting', 'tightness', 'pressure'], 'severity': None, 'triggers': [], 'timing': [],
+     'sentiment': None,
+     'entities': [('nausea', 'SYMPTOM'), ('vomiting', 'SYMPTOM'), ('tightness', 'SYMPTOM'), ('pressure', 'SYMPTOM')]},
+]
+
+def findings(nlp):
+    return [_findings_from_doc(doc, text, False) for doc, text in zip(nlp.pipe(NOTES), NOTES)]
+
+def ruler_only(found):
+    labels = {p['label'] for p in PATTERNS}
+    return [{**f, 'entities': [e for e in f['entities'] if e[1] in labels]} for f in found]
+
+def test_rules_mode_findings():
+    nlp = load_nlp('rules')
+    assert nlp is not None and nlp.pipe_names == ['entity_ruler']
+    assert findings(nlp) == RULES_FINDINGS
+
+def test_full_mode_matches_whole_pipeline():
+    pytest.importorskip('en_core_web_sm')
+    whole, full = load_nlp('full', exclude=[]), load_nlp('full')
+    assert whole is not None and full is not None
+    assert findings(full) == findings(whole)
+    assert ruler_only(findings(load_nlp('rules'))) == ruler_only(findings(whole))
@@ -0,0 +1,356 @@
+"""
+The profile rule table (claisen_data.triage_rules) against a frozen copy of
+the if-chain it replaced: assign_profile_from_findings must give the same
+result for
+  - every pair of rule questions, over all their options plus "missing" and
+    an off-list value, on top of a base answer set that satisfies each rule;
+  - a random sample of full answer sets.
+"""
+import json
+import random
+from itertools import combinations
+import pytest
+from claisen_data.triage_questions import TRIAGE_QUESTIONS
+from claisen_data.triage_rules import PROFILE_RULES, ALARM_KEYS, CompiledRules
+from claisen_data.triage_engine import assign_profile_from_findings
+
+MISSING = object()
+OFF_LIST = 'zzz not an option'
+FINDINGS = [
+    {},
+    {"symptoms": ["gas"], "severity": "mild", "triggers": ["stress"], "timing": [], "sentiment": "stable",
+     "entities": [("gas", "SYMPTOM"), ("stress", "TRIGGER")]},
+    {"symptoms": [], "severity": "severe", "triggers": [], "timing": ["night"], "sentiment": None, "entities": []},
+    {"symptoms": [], "severity": None, "triggers": [], "timing": [], "sentiment": "urgent", "entities": []},
+]
+
+def reference_profile(answers, nlp_extracted):
+    # Verbatim copy of the if-chain that predates triage_rules
+    nlp_severity = nlp_extracted.get("severity")
+    nlp_symptoms = nlp_extracted.get("symptoms", [])
+    nlp_triggers = nlp_extracted.get("triggers", [])
+    nlp_sentiment = nlp_extracted.get("sentiment")
+    # If classifier or NLP finds urgent sentiment, escalate
+    if nlp_sentiment == "urgent":
+        return {
+            "profile": 5,
+            "reason": "AI/NLP detected urgent sentiment in notes.",
+            "recommendation": (
+                "[bold red]URGENT: Your notes suggest you may need immediate medical attention.[/bold red]\n"
+                "- Please seek emergency care or contact your doctor immediately.\n"
+            ),
+            "nlp_extracted": nlp_extracted
+        }
+    # If NLP finds severe symptoms at night, suggest nocturnal GERD
+    if nlp_severity == "severe" and ("night" in nlp_triggers or "night" in nlp_extracted.get("timing", [])):
+        return {
+            "profile": 3,
+            "reason": "AI/NLP detected severe nocturnal symptoms in notes.",
+            "recommendation": (
+                "[bold magenta]Severe night-time symptoms detected.[/bold magenta]\n"
+                "- Start omeprazole 20 mg AM + famotidine 10–20 mg at bedtime for 14 days.\n"
+                "- Elevate head of bed, avoid late meals, and sleep on left side.\n"
+                "- [cyan]Reassess in 7–14 days. If persistent, escalate to Profile 4.[/cyan]"
+            ),
+            "nlp_extracted": nlp_extracted
+        }
+    # If NLP finds stress/anxiety as trigger, add to recommendations
+    stress_nlp = any(t in nlp_triggers for t in ["stress", "anxiety"])
+    # Continue with main triage logic, but add NLP findings to recommendations
+    # Profile 5: Alarm features (Q19–Q27)
+    alarm_keys = [
+        'weight_change', 'vomiting_blood', 'dysphagia', 'odynophagia',
+        'family_gi_cancer', 'symptom_change', 'immunocompromised',
+        'anaemia', 'persistent_nausea', 'followup_alarm_features'
+    ]
+    for k in alarm_keys:
+        v = answers.get(k, '')
+        if v and (v.startswith('Yes') or v.startswith('Lost') or v.startswith('Gained')) and v not in ['No', 'No pain swallowing', 'No family history', 'No change', 'No or unknown']:
+            return {
+                "profile": 5,
+                "reason": f"Alarm feature detected: {k.replace('_',' ')}",
+                "recommendation": (
+                    "[bold red]URGENT: Alarm features detected.[/bold red]\n"
+                    "- Immediate GI referral for upper endoscopy (EGD) within 2 weeks.\n"
+                    "- Lab tests: CBC, LFTs, ferritin, BUN/Cr.\n"
+                    "- Stop all OTC PPI/H2RA until workup complete.\n"
+                    "- If haematemesis/melena: ED or urgent EGD within 48 hrs.\n"
+                    "- Progressive dysphagia: Urgent endoscopy + biopsy.\n"
+                    "- 5% weight loss + alarm: 14-day cancer pathway.\n"
+                    "- Family history of GI cancer: expedited scope.\n"
+                    "- Document alarm features and duration clearly.\n"
+                ),
+                "nlp_extracted": nlp_extracted
+            }
+
+    # Profile 1: Mild, infrequent GERD (with subtypes)
+    if (
+        answers.get('symptom_type') in ['Burning sensation', 'Fullness or bloating', 'No discomfort'] and
+        answers.get('symptom_intensity') in ['1–3: Mild', '4–6: Moderate'] and
+        answers.get('symptom_frequency') in ['Less than once a week', '1–2 times per week'] and
+        answers.get('symptom_duration') in ['Less than 10 minutes', '10–30 minutes'] and
+        answers.get('relief_attempts') in ['Antacids (Tums, Maalox) worked', 'Eating bland food'] and
+        answers.get('symptom_free_period') in ['Within the past month', '1–3 months ago'] and
+        answers.get('meal_portion_size') != 'Large' and
+        answers.get('meal_bedtime_interval') in ['>3 hours before bed', '2–3 hours before bed'] and
+        answers.get('alcohol_use') in ['Never', 'Socially, <1x/week'] and
+        answers.get('tobacco_use') in ['Never', 'Former smoker (quit >6 months ago)']
+    ):
+        # Subtype: If stress is a trigger
+        if answers.get('stress_worsen') in ['Yes, significantly and predictably', 'Yes, but not always']:
+            stress_note = "- [yellow]Stress appears to be a trigger. Consider stress management techniques (mindfulness, CBT, relaxation).[/yellow]\n"
+        else:
+            stress_note = ""
+        return {
+            "profile": 1,
+            "reason": "Mild, infrequent symptoms, good response to antacids, no red flags, healthy lifestyle.",
+            "recommendation": (
+                "[bold green]Lifestyle modifications + on-demand antacids.[/bold green]\n"
+                "- Avoid large meals and late eating.\n"
+                "- Maintain upright posture after meals.\n"
+                "- Limit trigger foods/drinks.\n"
+                "- Use calcium carbonate antacids as needed.\n"
+                f"{stress_note}"
+                "- No need for daily acid suppression.\n"
+                "- [cyan]Follow up in 7 days to reassess control.[/cyan]"
+            ),
+            "nlp_extracted": nlp_extracted
+        }
+
+    # Profile 2: Moderate classic GERD (with subtypes)
+    if (
+        answers.get('symptom_type') in ['Burning sensation', 'Sour or bitter taste in the mouth'] and
+        answers.get('symptom_intensity') in ['4–6: Moderate', '7–8: Severe'] and
+        answers.get('symptom_frequency') in ['3–5 times per week', 'Daily'] and
+        answers.get('symptom_postprandial') in ['Immediately (<10 min)', '10–30 minutes', '30–60 minutes'] and
+        answers.get('sour_taste') in ['Often (more than 3 days/week)', 'Daily, especially in the morning'] and
+        answers.get('recent_ppi') == 'No' and
+        answers.get('meal_portion_size') == 'Large'
+    ):
+        # Subtype: If caffeine or NSAIDs present
+        med_note = ""
+        if 'NSAIDs' in answers.get('meds_reflux', ''):
+            med_note += "- [yellow]NSAIDs may worsen symptoms. Minimize or discuss alternatives with your doctor.[/yellow]\n"
+        if answers.get('caffeine_intake') == '>3 cups/day':
+            med_note += "- [yellow]High caffeine intake may contribute. Reduce to <2 cups/day.[/yellow]\n"
+        return {
+            "profile": 2,
+            "reason": "Moderate, classic GERD symptoms, daily or near-daily, sleep disturbance, known triggers, no recent PPI use.",
+            "recommendation": (
+                "[bold yellow]Start omeprazole 20 mg every morning for 14 days (FDA OTC limit).[/bold yellow]\n"
+                "- Continue lifestyle modifications as in Profile 1.\n"
+                "- Keep a symptom diary.\n"
+                f"{med_note}"
+                "- [cyan]Reassess at Day 7 and Day 14. If improved, stop PPI and continue PRN antacids. If not, escalate to Profile 3 or 4.[/cyan]"
+            ),
+            "nlp_extracted": nlp_extracted
+        }
+
+    # Profile 3: Nocturnal/positional GERD (with subtypes)
+    if (
+        answers.get('symptom_type') in ['Burning sensation', 'Sour or bitter taste in the mouth'] and
+        answers.get('symptom_lying_down') in ['Yes, shortly after lying down', 'Yes, I wake up at night with symptoms'] and
+        answers.get('night_choking', '').startswith('Yes') and
+        answers.get('sleep_position') in ['Flat on back', 'On right side']
+    ):
+        return {
+            "profile": 3,
+            "reason": "Nocturnal or positional GERD: night symptoms, lying-down reflux, choking/regurgitation at night, suboptimal sleep posture.",
+            "recommendation": (
+                "[bold magenta]Start omeprazole 20 mg AM + famotidine 10–20 mg at bedtime for 14 days.[/bold magenta]\n"
+                "- Strict head-of-bed elevation (wedge or risers).\n"
+                "- Avoid late meals and alcohol.\n"
+                "- Sleep on left side if possible.\n"
+                "- [cyan]Reassess at Day 7 and Day 14. If persistent, consider Profile 4.[/cyan]"
+            ),
+            "nlp_extracted": nlp_extracted
+        }
+    # Profile 3 (alternate): High-risk lifestyle triggers
+    if (
+        answers.get('meal_portion_size') == 'Large' and
+        answers.get('meal_bedtime_interval') == '<1 hour before bed' and
+        answers.get('alcohol_use') == 'Daily' and
+        answers.get('tobacco_use') == 'Yes, daily'
+    ):
+        return {
+            "profile": 3,
+            "reason": "Nocturnal/positional GERD with high-risk lifestyle triggers (large meals, late eating, daily alcohol/tobacco).",
+            "recommendation": (
+                "[bold magenta]Intensive lifestyle modification required.[/bold magenta]\n"
+                "- Reduce meal size and avoid eating <3 hours before bed.\n"
+                "- Eliminate or reduce alcohol and tobacco.\n"
+                "- Elevate head of bed.\n"
+                "- Consider short-term dual therapy (omeprazole + famotidine) if symptoms persist.\n"
+            ),
+            "nlp_extracted": nlp_extracted
+        }
+
+    # Profile 4: Suspected functional/refractory GERD (with subtypes)
+    if (
+        answers.get('symptom_type') in ['Burning sensation', 'Pressure or tightness'] and
+        answers.get('symptom_intensity') in ['7–8: Severe', '9–10: Disabling'] and
+        answers.get('relief_attempts') in ['Nothing provides consistent relief', 'Proton pump inhibitors (omeprazole) worked', 'Not tried anything'] and
+        answers.get('symptom_free_period') == 'Can’t recall being symptom-free' and
+        (answers.get('recent_ppi') == 'Yes' or answers.get('meds_reflux', '') != 'None of the above')
+    ):
+        # Subtype: If IBS or stress
+        ibs_note = ""
+        if answers.get('bowel_pattern') == 'Yes, alternating diarrhoea and constipation':
+            ibs_note = "- [yellow]IBS/functional overlap suspected. Consider low-FODMAP diet and GI referral.[/yellow]\n"
+        if answers.get('stress_worsen') in ['Yes, significantly and predictably', 'Yes, but not always']:
+            ibs_note += "- [yellow]Stress may be a major factor. Consider psychological support or therapy.[/yellow]\n"
+        return {
+            "profile": 4,
+            "reason": "Persistent symptoms despite correct PPI use, poor response, or overlapping dyspepsia/IBS traits, or medication triggers.",
+            "recommendation": (
+                "[bold blue]Discontinue PPI/H2RA (FDA OTC limit reached). Refer to gastroenterology for pH monitoring, impedance testing, and functional workup.[/bold blue]\n"
+                "- Consider simethicone or alginate-based agents for interim relief.\n"
+                f"{ibs_note}"
+                "- [cyan]Continue symptom diary and dietary reprogramming.[/cyan]"
+            ),
+            "nlp_extracted": nlp_extracted
+        }
+
+    # Profile 2 (alternate): Moderate symptoms with some lifestyle risk
+    if (
+        answers.get('symptom_intensity') in ['4–6: Moderate', '7–8: Severe'] and
+        answers.get('symptom_frequency') in ['3–5 times per week', 'Daily'] and
+        (answers.get('meal_portion_size') == 'Large' or answers.get('alcohol_use') == '2–3 times/week')
+    ):
+        return {
+            "profile": 2,
+            "reason": "Moderate symptoms with some lifestyle risk factors.",
+            "recommendation": (
+                "[bold yellow]Lifestyle modification + consider short PPI course.[/bold yellow]\n"
+                "- Reduce meal size, avoid late eating, limit alcohol.\n"
+                "- Reassess in 7–14 days.\n"
+            ),
+            "nlp_extracted": nlp_extracted
+        }
+
+    # Default: Profile 2 (moderate)
+    result = {
+        "profile": 2,
+        "reason": "Default: moderate symptoms (expand logic as needed)",
+        "recommendation": (
+            "[bold yellow]Lifestyle modification + consider short PPI course.[/bold yellow]\n"
+            "- Reduce meal size, avoid late eating, limit alcohol.\n"
+            "- Reassess in 7–14 days.\n"
+        ),
+        "nlp_extracted": nlp_extracted
+    }
+    # If NLP found stress/anxiety, add to recommendation
+    if stress_nlp:
+        result["recommendation"] += "- [yellow]Your notes suggest stress/anxiety as a trigger. Consider stress management or psychological support.[/yellow]\n"
+    # If NLP found specific symptoms, add to recommendation
+    if nlp_symptoms:
+        result["recommendation"] += f"- [cyan]AI/NLP extracted symptoms: {', '.join(nlp_symptoms)}[/cyan]\n"
+    # If custom entities found, add to recommendation
+    if nlp_extracted.get("entities"):
+        ents = ", ".join([f"{text} ({label})" for text, label in nlp_extracted["entities"]])
+        result["recommendation"] += f"- [green]AI/NLP entities: {ents}[/green]\n"
+    return result 
+def domains():
+    options = {q['id']: q.get('options', []) for q in TRIAGE_QUESTIONS}
+    keys = set(ALARM_KEYS)
+    for rule in PROFILE_RULES:
+        for when in [rule['when']] + [n['when'] for n in rule.get('notes', [])]:
+            for clause in when:
+                keys.update(c[0] for c in (clause if isinstance(clause, list) else [clause]))
+    keys = sorted(keys)
+    out = {k: list(options[k]) + [MISSING, OFF_LIST] for k in keys}
+    # meds_reflux is free text in the walker; add a multi-select style answer
+    out['meds_reflux'].append(', '.join(options['meds_reflux'][:2]))
+    return out
+
+def satisfying_base(rule):
+    by_id = {q['id']: q for q in TRIAGE_QUESTIONS}
+    base = {}
+    for clause in rule['when']:
+        key, op, arg = clause[0] if isinstance(clause, list) else clause
+        opts = by_id[key]['options']
+        if op == 'in':
+            base[key] = arg[0]
+        elif op == '==':
+            base[key] = arg
+        elif op == '!=':
+            base[key] = next(o for o in opts if o != arg)
+        elif op == 'startswith':
+            base[key] = next(o for o in opts if o.startswith(arg))
+        elif op == 'contains':
+            base[key] = next(o for o in opts if arg in o)
+    return base
+
+def with_value(answers, key, value):
+    if value is MISSING:
+        answers.pop(key, None)
+    else:
+        answers[key] = value
+
+def pairwise_cases(doms):
+    bases = [{}] + [satisfying_base(r) for r in PROFILE_RULES]
+    keys = sorted(doms)
+    for base in bases:
+        for k1, k2 in combinations(keys, 2):
+            for v1 in doms[k1]:
+                for v2 in doms[k2]:
+                    answers = dict(base)
+                    with_value(answers, k1, v1)
+                    with_value(answers, k2, v2)
+                    yield answers
+
+def random_cases(doms, n, seed=0):
+    # Full questionnaires, as the walker produces them. Alarm questions mostly
+    # get their negative answer, and the rest lean towards one rule's answers
+    # so that every rule in the cascade gets reached.
+    rng = random.Random(seed)
+    bases = [satisfying_base(r) for r in PROFILE_RULES]
+    choice_qs = [q for q in TRIAGE_QUESTIONS if q['type'] == 'choice']
+    out = []
+    for _ in range(n):
+        base = rng.choice(bases)
+        answers = {}
+        for q in choice_qs:
+            key, opts = q['id'], q['options']
+            if key in ALARM_KEYS and rng.random() < 0.95:
+                answers[key] = next((o for o in opts if not o.startswith(('Yes', 'Lost', 'Gained'))), opts[-1])
+            elif key in base and rng.random() < 0.7:
+                answers[key] = base[key]
+            else:
+                answers[key] = rng.choice(opts)
+        if rng.random() < 0.05:
+            with_value(answers, rng.choice(sorted(doms)), rng.choice([MISSING, OFF_LIST]))
+        out.append((answers, rng.choice(FINDINGS)))
+    return out
+
+def canonical(result):
+    return json.dumps(result, sort_keys=True)
+
+def assert_same(answers, findings):
+    assert canonical(assign_profile_from_findings(answers, findings)) == canonical(reference_profile(answers, findings)), \
+        (answers, findings)
+
+def test_pairwise_matches_if_chain():
+    for answers in pairwise_cases(domains()):
+        for findings in (FINDINGS[0], FINDINGS[1]):
+            assert_same(answers, findings)
+
+def test_random_answer_sets_match_if_chain():
+    for answers, findings in random_cases(domains(), 5000):
+        assert_same(answers, findings)
+
+def test_unhashable_answer_is_tested_directly():
+    # A list (e.g. from --answers) has no position in the option index
+    base = satisfying_base(PROFILE_RULES[0])
+    for key in domains():
+        answers = dict(base, **{key: ['a', 'list']})
+        try:
+            expected = reference_profile(answers, {})
+        except (AttributeError, TypeError):
+            continue
+        assert canonical(assign_profile_from_findings(answers, {})) == canonical(expected), key
+
+def test_needs_a_default_rule():
+    rules = CompiledRules([r for r in PROFILE_RULES if r['when']])
+    with pytest.raises(ValueError):
+        rules.match({})